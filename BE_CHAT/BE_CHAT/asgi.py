@@ -3,10 +3,11 @@ ASGI config for BE_CHAT project - Django Channels용 비동기 설정
 HTTP와 WebSocket 프로토콜을 모두 처리할 수 있도록 구성
 """
 
+import atexit
 import os
 import django
+from django.urls import re_path
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from django.core.asgi import get_asgi_application
 
 # Django 설정 모듈 지정 및 초기화
@@ -14,18 +15,28 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'BE_CHAT.settings')
 django.setup()
 
 # Django 초기화 후 import
-from chat.routing import websocket_urlpatterns
+from chat.routing import http_urlpatterns, websocket_urlpatterns
+from chat.auth import TokenAuthMiddleware
+from chat.db_pool import close_pools, warm_up_pools
 
 # HTTP 애플리케이션 먼저 초기화
 django_asgi_app = get_asgi_application()
 
+# DB 연결 풀 미리 채우기 (첫 WebSocket 연결에서 연결 수립 비용이 안 생기도록)
+warm_up_pools()
+atexit.register(close_pools)
+
 # 프로토콜별 라우터 설정
 application = ProtocolTypeRouter({
     # 일반 HTTP 요청 처리 (REST API)
-    "http": django_asgi_app,
+    # SSE 스트림은 channels 소비자가 처리하고 나머지는 Django로
+    "http": URLRouter(
+        http_urlpatterns + [re_path(r'', django_asgi_app)]
+    ),
     
     # WebSocket 요청 처리 (실시간 채팅)
-    "websocket": AuthMiddlewareStack(  # 인증 미들웨어 적용
+    # 세션 저장소 조회 없이 서명 토큰을 로컬에서 검증 (chat/auth.py)
+    "websocket": TokenAuthMiddleware(
         URLRouter(
             websocket_urlpatterns  # chat/routing.py의 WebSocket URL 패턴들
         )
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 from decouple import config
 
@@ -54,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'chat.middleware.ReplicaStickinessMiddleware',  # 쓰기 직후 primary 읽기 고정
 ]
 
 ROOT_URLCONF = 'BE_CHAT.urls'
@@ -79,17 +82,111 @@ ASGI_APPLICATION = 'BE_CHAT.asgi.application'
 # Channels 설정
 # Redis 서버가 없으면 InMemoryChannelLayer로 폴백
 # 실제 배포에서는 Redis 필수
+# 여러 Redis 노드로 샤딩하려면 CHANNEL_REDIS_HOSTS=redis://r1:6379,redis://r2:6379 형태로 지정
+# 노드 구성을 바꿀 때는 CHANNEL_REDIS_PREVIOUS_HOSTS에 기존 목록을 넣고 배포 (chat/layers.py 참고)
+CHANNEL_REDIS_HOSTS = [h.strip() for h in config(
+    'CHANNEL_REDIS_HOSTS',
+    default=f"redis://{config('REDIS_HOST', default='127.0.0.1')}:{config('REDIS_PORT', default=6379, cast=int)}",
+).split(',') if h.strip()]
+CHANNEL_REDIS_PREVIOUS_HOSTS = [h.strip() for h in config('CHANNEL_REDIS_PREVIOUS_HOSTS', default='').split(',') if h.strip()]
+
+# 같은 프로세스의 그룹 멤버에게는 Redis를 거치지 않고 직접 전달 (chat.layers.LocalFanoutChannelLayer)
+CHANNEL_LOCAL_FANOUT = config('CHANNEL_LOCAL_FANOUT', default=True, cast=bool)
+
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'BACKEND': 'chat.layers.LocalFanoutChannelLayer' if CHANNEL_LOCAL_FANOUT else 'chat.layers.ShardedRedisChannelLayer',
         'CONFIG': {
-            "hosts": [(config('REDIS_HOST', default='127.0.0.1'), config('REDIS_PORT', default=6379, cast=int))],
+            "hosts": CHANNEL_REDIS_HOSTS,
+            "previous_hosts": CHANNEL_REDIS_PREVIOUS_HOSTS,  # 리샤딩 중에만 사용
             "capacity": 1500,  # 메시지 큐 용량
             "expiry": 60,      # 메시지 만료 시간
         },
     },
 }
 
+# consumer에서 이벤트 루프 밖으로 보내는 동기 작업(이벤트 발행 등)용 스레드 수
+# DB 쿼리는 async ORM 경로를 사용하고, asgiref 기본 실행기 크기는 ASGI_THREADS 환경변수로 조절
+CHAT_SYNC_EXECUTOR_WORKERS = config('CHAT_SYNC_EXECUTOR_WORKERS', default=4, cast=int)
+
+# client_msg_id 중복 전송 캐시 (chat/idempotency.py) - 이 시간 안의 재전송은 DB 조회 없이 ack
+CHAT_DEDUPE_TTL = config('CHAT_DEDUPE_TTL', default=300, cast=int)
+CHAT_DEDUPE_MAX_ENTRIES = config('CHAT_DEDUPE_MAX_ENTRIES', default=50000, cast=int)
+
+# 재접속 복구 (chat/replay.py) - 대화방별로 최근 메시지를 프로세스 메모리에 보관
+CHAT_REPLAY_BUFFER_SIZE = config('CHAT_REPLAY_BUFFER_SIZE', default=200, cast=int)
+# 놓친 메시지가 이보다 많으면 재전송하지 않고 resync_required (클라이언트가 REST로 전체 동기화)
+CHAT_RESUME_MAX_MESSAGES = config('CHAT_RESUME_MAX_MESSAGES', default=500, cast=int)
+
+# Server-Sent Events 스트림 (WebSocket이 막힌 클라이언트용, chat.consumers.ChatEventStreamConsumer)
+SSE_HEARTBEAT_INTERVAL = config('SSE_HEARTBEAT_INTERVAL', default=15, cast=int)  # 프록시 유휴 타임아웃보다 짧게 (초)
+SSE_RETRY_MS = config('SSE_RETRY_MS', default=3000, cast=int)  # 끊겼을 때 브라우저 재연결 대기 (ms)
+
+# WebSocket 하트비트/유휴 연결 정리 (chat/heartbeat.py) - 끊긴 연결이 그룹 만료까지 메시지를 받지 않도록
+# 이 시간 동안 프레임이 없으면 {"type": "ping"} 전송 (0이면 하트비트/정리 끔)
+CHAT_WS_HEARTBEAT_INTERVAL = config('CHAT_WS_HEARTBEAT_INTERVAL', default=30, cast=int)
+# 이 시간 동안 pong을 포함해 아무 프레임도 없으면 그룹에서 빼고 닫음 (하트비트 간격의 2배보다 길게)
+CHAT_WS_IDLE_TIMEOUT = config('CHAT_WS_IDLE_TIMEOUT', default=75, cast=int)
+CHAT_WS_SWEEP_INTERVAL = config('CHAT_WS_SWEEP_INTERVAL', default=5, cast=int)  # 확인 주기 (초)
+
+# 오프라인 수신자 알림 다이제스트 (chat/notifications.py)
+# 상대방이 대화방에 연결되어 있지 않을 때만 사용자별로 모아서 NOTIFY_DIGEST_WINDOW초 뒤 한 번에 전송
+NOTIFY_ENABLED = config('NOTIFY_ENABLED', default=True, cast=bool)
+# local: 프로세스별 접속 상태 (단일 노드), redis: 노드 전체 공유 (연결 정보는 NOTIFY_PRESENCE_TTL 동안 유지, 연결 중에는 갱신)
+NOTIFY_PRESENCE_BACKEND = config('NOTIFY_PRESENCE_BACKEND', default='local')
+NOTIFY_PRESENCE_REDIS_URL = config('NOTIFY_PRESENCE_REDIS_URL', default='redis://127.0.0.1:6379/3')
+NOTIFY_PRESENCE_TTL = config('NOTIFY_PRESENCE_TTL', default=900, cast=int)
+NOTIFY_DIGEST_WINDOW = config('NOTIFY_DIGEST_WINDOW', default=60, cast=int)
+NOTIFY_DIGEST_MAX_USERS = config('NOTIFY_DIGEST_MAX_USERS', default=100000, cast=int)  # 넘치면 새 사용자 알림은 버림
+# 전송 대상 - 푸시 서비스 연동 전까지 로컬 파일(JSON 줄)에 기록
+NOTIFY_SINK = config('NOTIFY_SINK', default='chat.notifications.LocalNotificationSink')
+NOTIFY_SINK_OPTIONS = {'path': config('NOTIFY_SINK_FILE', default='') or None}
+
+# 금칙어/금지 링크 필터 (chat/moderation.py) - 메시지 저장/브로드캐스트 전에 검사
+MODERATION_ENABLED = config('MODERATION_ENABLED', default=True, cast=bool)
+# 한 줄에 하나, '#' 주석, 'link:도메인'은 금지 도메인 (비어 있으면 검사하지 않음)
+MODERATION_TERMS_FILE = config('MODERATION_TERMS_FILE', default='')
+MODERATION_RELOAD_INTERVAL = config('MODERATION_RELOAD_INTERVAL', default=5, cast=int)  # 파일 변경 확인 간격 (초)
+MODERATION_TIMEOUT_MS = config('MODERATION_TIMEOUT_MS', default=50, cast=int)  # 메시지당 검사 시간 제한
+# 시간 제한을 넘으면 통과(True) / 차단(False)
+MODERATION_FAIL_OPEN = config('MODERATION_FAIL_OPEN', default=True, cast=bool)
+
+# 대화방 활동 집계 (chat/rollups.py) - 분석 질의는 messages/conversations 대신 activity_rollups에서 읽음
+ROLLUPS_ENABLED = config('ROLLUPS_ENABLED', default=True, cast=bool)
+ROLLUP_FLUSH_INTERVAL = config('ROLLUP_FLUSH_INTERVAL', default=10, cast=int)  # 메모리에 모은 건수를 DB에 반영하는 주기 (초)
+ROLLUP_MAX_PENDING = config('ROLLUP_MAX_PENDING', default=50000, cast=int)  # 대기 행이 이보다 많으면 주기 전에 반영
+ROLLUP_QUERY_MAX_ROWS = config('ROLLUP_QUERY_MAX_ROWS', default=5000, cast=int)  # 조회 API 한 번에 돌려주는 최대 행 수
+
+# 보낸 사람/대화방 단위 rate limit (chat/ratelimit.py)
+# local: 프로세스별 한도, redis: 노드 전체 공유 한도 (로컬 버킷으로 먼저 거르고 Redis 확인)
+RATE_LIMIT_BACKEND = config('RATE_LIMIT_BACKEND', default='local')
+RATE_LIMIT_REDIS_URL = config('RATE_LIMIT_REDIS_URL', default='redis://127.0.0.1:6379/2')
+# 동작별 예산 - rate: 초당 충전되는 개수, burst: 한 번에 쓸 수 있는 최대 개수
+RATE_LIMITS = {
+    'chat': {
+        'sender': {'rate': config('RATE_LIMIT_CHAT_RATE', default=5, cast=float), 'burst': config('RATE_LIMIT_CHAT_BURST', default=20, cast=int)},
+        'conversation': {'rate': 20, 'burst': 60},
+    },
+    'typing': {
+        'sender': {'rate': 2, 'burst': 5},
+        'conversation': {'rate': 10, 'burst': 20},
+    },
+    'read': {
+        'sender': {'rate': 20, 'burst': 100},  # 대화방 입장 시 한꺼번에 읽음 처리
+        'conversation': {'rate': 50, 'burst': 200},
+    },
+}
+
+# WebSocket 서명 토큰 인증 (chat/auth.py) - 세션 조회 없이 프로세스 안에서 검증
+# 'kid:secret,kid:secret' 형식, 첫 번째 키로 발급하고 나머지는 검증만 (키 교체 중 이전 토큰 허용)
+CHAT_TOKEN_KEYS = dict(
+    item.split(':', 1) for item in config('CHAT_TOKEN_KEYS', default='').split(',') if item
+) or {'default': SECRET_KEY}
+CHAT_TOKEN_TTL = config('CHAT_TOKEN_TTL', default=3600, cast=int)
+CHAT_TOKEN_CACHE_SIZE = config('CHAT_TOKEN_CACHE_SIZE', default=10000, cast=int)
+# False면 토큰 없는 연결도 허용하고 payload의 sender_id/user_id를 사용 (개발용)
+CHAT_WS_AUTH_REQUIRED = config('CHAT_WS_AUTH_REQUIRED', default=not DEBUG, cast=bool)
+
 # Redis 연결 실패 시 폴백 (개발용만)
 # CHANNEL_LAYERS = {
 #     "default": {
@@ -116,6 +213,9 @@ REST_FRAMEWORK = {
     # ],
 }
 
+# 대화방 일괄 조회 API(conversations/batch/)에서 한 번에 받는 최대 id 수
+CONVERSATION_BATCH_MAX_IDS = config('CONVERSATION_BATCH_MAX_IDS', default=100, cast=int)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -135,6 +235,48 @@ DATABASES = {
     }
 }
 
+# SQLite 테스트 DB는 기본이 메모리 DB(shared cache)인데, 여기서는 동시 쓰기가 잠금을 기다리지 않고 바로
+# "database table is locked"로 실패해서 스레드 동시 저장 테스트를 할 수 없음 → 임시 파일 DB 사용 (잠금 대기 5초)
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {'NAME': os.path.join(tempfile.gettempdir(), 'be_chat_test.sqlite3')}
+
+# MySQL 연결 풀 (chat/db_pool.py)
+# 요청/스레드마다 연결을 새로 맺지 않고 프로세스 단위 풀에서 재사용
+# DB_POOL_ENABLED=False면 Django 기본 연결 방식 사용
+if DATABASES['default']['ENGINE'] == 'django.db.backends.mysql' and config('DB_POOL_ENABLED', default=True, cast=bool):
+    DATABASES['default']['ENGINE'] = 'chat.backends.mysql_pool'
+    DATABASES['default']['POOL'] = {
+        'MAX_SIZE': config('DB_POOL_MAX_SIZE', default=10, cast=int),   # 프로세스당 최대 연결 수
+        'MIN_SIZE': config('DB_POOL_MIN_SIZE', default=2, cast=int),    # 시작 시 미리 만들어둘 연결 수
+        'RECYCLE': config('DB_POOL_RECYCLE', default=1800, cast=int),   # MySQL wait_timeout보다 짧게
+        'PING_AFTER': config('DB_POOL_PING_AFTER', default=5, cast=int),  # 이 이상 놀던 연결은 ping 후 사용
+        'TIMEOUT': config('DB_POOL_TIMEOUT', default=10, cast=int),     # 풀이 꽉 찼을 때 대기 시간
+    }
+
+# 읽기 전용 레플리카 설정
+# DB_REPLICA_HOSTS=host1:3306,host2:3306 형태로 지정하면 replica_0, replica_1... 로 등록됨
+# 지정하지 않으면 모든 쿼리가 primary(default)로 감
+for _index, _replica in enumerate(h.strip() for h in config('DB_REPLICA_HOSTS', default='').split(',') if h.strip()):
+    _replica_host, _, _replica_port = _replica.partition(':')
+    DATABASES[f'replica_{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _replica_host,
+        'PORT': _replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},  # 테스트에서는 primary를 그대로 사용
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['chat.db_routers.ReplicaRouter']
+
+# 쓰기 후 primary에서 읽는 시간 (read-your-writes)
+DATABASE_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=5, cast=int)
+# 이 이상 복제가 밀린 레플리카는 사용하지 않음 (초)
+DATABASE_REPLICA_MAX_LAG = config('DB_REPLICA_MAX_LAG', default=3, cast=int)
+# 레플리카 상태 확인 주기 (초)
+DATABASE_REPLICA_CHECK_INTERVAL = config('DB_REPLICA_CHECK_INTERVAL', default=10, cast=int)
+# 상태 확인 쿼리의 접속/읽기 제한 시간 (초, 넘으면 unhealthy)
+DATABASE_REPLICA_CHECK_TIMEOUT = config('DB_REPLICA_CHECK_TIMEOUT', default=2, cast=int)
+
 # MySQL 설정 (배포시 활성화)
 # 환경변수로 관리하도록 수정 예정
 # DATABASES = {
@@ -224,12 +366,14 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'x-user-id',  # 레플리카 sticky 읽기용 사용자 식별
 ]
 
 # 웹소켓 CORS 설정
 CORS_ALLOW_CREDENTIALS = True
 
 # 로깅 설정
+# 호출한 스레드는 큐에 넣기만 하고 리스너 스레드가 한 줄 JSON으로 기록 (chat/structured_logging.py)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -246,9 +390,10 @@ LOGGING = {
     'handlers': {
         'file': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
+            '()': 'chat.structured_logging.QueueLogHandler',
             'filename': 'chat_service.log',
-            'formatter': 'verbose',
+            'console': DEBUG,  # 개발 중에는 콘솔에도 같은 JSON 출력
+            'queue_size': config('LOG_QUEUE_SIZE', default=10000, cast=int),  # 가득 차면 버림 (기다리지 않음)
         },
         'console': {
             'level': 'DEBUG',
@@ -258,7 +403,7 @@ LOGGING = {
     },
     'loggers': {
         'chat': {
-            'handlers': ['file', 'console'],
+            'handlers': ['file'],
             'level': 'INFO',
             'propagate': True,
         },
@@ -270,6 +415,13 @@ LOGGING = {
     },
 }
 
+# 많이 발생하는 이벤트는 일부만 기록 (이벤트 이름 -> 비율), 경고 이상은 항상 기록
+LOG_SAMPLE_RATES = {
+    'message.created': config('LOG_SAMPLE_MESSAGE_CREATED', default=0.1, cast=float),
+}
+# 로그에서 값을 가리는 키 (메시지 본문/인증 정보)
+LOG_REDACT_KEYS = ['content', 'token', 'password', 'authorization']
+
 # 캐시 설정 (Redis 사용)
 CACHES = {
     'default': {
@@ -315,6 +467,49 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# 첨부파일 설정 (chat/attachments.py)
+# 업로드는 청크 단위로 디스크에 바로 기록하므로 DATA_UPLOAD_MAX_MEMORY_SIZE와 무관
+ATTACHMENT_MAX_SIZE = config('ATTACHMENT_MAX_SIZE', default=1024 * 1024 * 1024, cast=int)  # 1GB
+ATTACHMENT_CHUNK_SIZE = config('ATTACHMENT_CHUNK_SIZE', default=5 * 1024 * 1024, cast=int)  # 청크당 최대 5MB
+# nginx 뒤에서 실행할 때 내부 경로 지정 (예: /protected-media/) - 파일 전송을 nginx가 sendfile로 처리
+ATTACHMENT_ACCEL_REDIRECT_PREFIX = config('ATTACHMENT_ACCEL_REDIRECT_PREFIX', default='')
+# 업로드할 수 있는 content_type (HTML/SVG/스크립트처럼 브라우저가 실행하는 형식은 받지 않음)
+ATTACHMENT_ALLOWED_CONTENT_TYPES = [
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'image/heic', 'image/heif',
+    'video/mp4', 'video/webm', 'video/quicktime',
+    'audio/mpeg', 'audio/mp4', 'audio/aac', 'audio/ogg', 'audio/wav', 'audio/webm',
+    'application/pdf', 'application/zip', 'application/octet-stream', 'text/plain', 'text/csv',
+    'application/msword', 'application/vnd.ms-excel', 'application/vnd.ms-powerpoint',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'application/x-hwp', 'application/haansofthwp',  # 한글 문서
+]
+# 다운로드 시 그 형식 그대로 inline으로 보내는 content_type (래스터 이미지/동영상만)
+# 나머지는 application/octet-stream + Content-Disposition: attachment
+ATTACHMENT_INLINE_CONTENT_TYPES = [
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'video/mp4', 'video/webm',
+]
+
+# 이미지 미리보기 생성 (chat/previews.py) - 이벤트 루프 밖 프로세스 풀에서 실행
+PREVIEW_WORKERS = config('PREVIEW_WORKERS', default=2, cast=int)  # 프로세스 수
+PREVIEW_QUEUE_SIZE = config('PREVIEW_QUEUE_SIZE', default=1000, cast=int)  # 넘치면 generate_previews로 백필
+PREVIEW_MAX_RETRIES = config('PREVIEW_MAX_RETRIES', default=3, cast=int)
+PREVIEW_TIMEOUT = config('PREVIEW_TIMEOUT', default=30, cast=int)  # 이미지 1장당 초
+PREVIEW_THUMBNAIL_SIZE = config('PREVIEW_THUMBNAIL_SIZE', default=320, cast=int)  # 긴 변 기준 px
+PREVIEW_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp']
+
+# 메시지 보관 기간 (chat/retention.py, python manage.py purge_expired_messages)
+# 대화방 유형별 - max_age_days: 이보다 오래된 메시지 삭제, deleted_grace_days: 소프트 삭제 후 실제 삭제까지 (None이면 보관)
+RETENTION_POLICIES = {
+    'user_to_user': {'max_age_days': config('RETENTION_USER_DAYS', default=365, cast=int), 'deleted_grace_days': 30},
+    'user_to_brand': {'max_age_days': config('RETENTION_BRAND_DAYS', default=1095, cast=int), 'deleted_grace_days': 90},  # 상담 기록은 더 오래
+    'group': {'max_age_days': config('RETENTION_GROUP_DAYS', default=365, cast=int), 'deleted_grace_days': 30},
+}
+RETENTION_BATCH_SIZE = config('RETENTION_BATCH_SIZE', default=500, cast=int)  # 트랜잭션 하나에서 지우는 메시지 수
+RETENTION_BATCH_PAUSE = config('RETENTION_BATCH_PAUSE', default=0.1, cast=float)  # 배치 사이 대기 (초)
+RETENTION_CHECKPOINT_FILE = config('RETENTION_CHECKPOINT_FILE', default=str(BASE_DIR / 'retention_checkpoint.json'))
+
 # 환경별 설정 분리 준비
 import os
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
@@ -322,6 +517,7 @@ ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
 if ENVIRONMENT == 'production':
     # 프로덕션 설정들을 여기에 추가
     DEBUG = False
+    CHAT_WS_AUTH_REQUIRED = True
     ALLOWED_HOSTS = ['your-domain.com']  # 실제 도메인으로 변경
     CORS_ALLOW_ALL_ORIGINS = False
     
@@ -7,6 +7,7 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
+import atexit
 import os
 
 from django.core.wsgi import get_wsgi_application
@@ -14,3 +15,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'BE_CHAT.settings')
 
 application = get_wsgi_application()
+
+# DB 연결 풀 미리 채우기 / 종료 시 정리
+from chat.db_pool import close_pools, warm_up_pools
+
+warm_up_pools()
+atexit.register(close_pools)
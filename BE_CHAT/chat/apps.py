@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chat'
+
+    def ready(self):
+        from django.conf import settings
+        from . import structured_logging
+
+        # structlog 로거를 settings.LOGGING의 비동기 큐 핸들러로 연결
+        structured_logging.configure(
+            sample_rates=settings.LOG_SAMPLE_RATES,
+            redact_keys=settings.LOG_REDACT_KEYS,
+        )
@@ -0,0 +1,235 @@
+"""
+첨부파일 저장소
+- 분할 업로드: 요청 본문을 메모리에 올리지 않고 요청별 청크 파일에 받은 뒤 (DB 잠금 없이),
+  오프셋을 확인하는 짧은 잠금 안에서 업로드 임시 파일에 붙임 (이어받기 가능)
+- 업로드 완료 시 SHA-256으로 내용이 같은 파일은 한 번만 저장 (중복 제거)
+- 다운로드: Range 요청 지원, nginx X-Accel-Redirect(sendfile)로 전송
+  래스터 이미지/동영상(ATTACHMENT_INLINE_CONTENT_TYPES)만 inline, 나머지는 octet-stream 첨부로 내려받기
+  프록시가 없으면 async 이터레이터로 IO_CHUNK_SIZE씩 스레드에서 읽어서 전송
+  (ASGI에서 동기 이터레이터/FileResponse는 sync_to_async(list)로 본문 전체를 메모리에 올린 뒤 보내므로 쓰지 않음)
+
+저장 위치 (MEDIA_ROOT 기준)
+    attachments/uploads/<upload_id>.part     업로드 중인 임시 파일
+    attachments/uploads/<upload_id>.<토큰>.chunk   받는 중인 청크 (반영 후 삭제)
+    attachments/<sha[:2]>/<sha[2:4]>/<sha>   완료된 파일 (내용 해시 기준)
+    attachments/thumbs/<sha[:2]>/<sha>_<크기>.webp   이미지 썸네일 (chat/previews.py)
+"""
+
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import uuid
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+
+# 요청 본문/파일을 읽을 때 한 번에 처리할 크기
+IO_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_path(relative_path):
+    return os.path.join(settings.MEDIA_ROOT, relative_path)
+
+
+def upload_temp_path(upload_id):
+    return media_path(os.path.join('attachments', 'uploads', f'{upload_id}.part'))
+
+
+def upload_chunk_path(upload_id, token):
+    return media_path(os.path.join('attachments', 'uploads', f'{upload_id}.{token}.chunk'))
+
+
+def blob_relative_path(sha256):
+    return os.path.join('attachments', sha256[:2], sha256[2:4], sha256)
+
+
+def thumbnail_relative_path(sha256, max_size):
+    return os.path.join('attachments', 'thumbs', sha256[:2], f'{sha256}_{max_size}.webp')
+
+
+def receive_chunk(upload_id, stream, max_bytes):
+    """
+    요청 스트림을 이 요청 전용 임시 파일(uploads/<upload_id>.<토큰>.chunk)에 받아서 (경로, 바이트 수) 반환
+    네트워크에서 읽는 동안은 DB 잠금/트랜잭션 없이 - 오프셋 반영은 commit_chunk에서
+    max_bytes를 넘는 본문은 잘라냄 (선언한 전체 크기 초과 방지)
+    """
+    path = upload_chunk_path(upload_id, uuid.uuid4().hex)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    try:
+        with open(path, 'wb') as f:
+            while stream is not None and written < max_bytes:
+                data = stream.read(min(IO_CHUNK_SIZE, max_bytes - written))
+                if not data:
+                    break
+                f.write(data)
+                written += len(data)
+    except BaseException:
+        discard_chunk(path)
+        raise
+    return path, written
+
+
+def commit_chunk(upload_id, offset, chunk_path):
+    """
+    받아둔 청크를 업로드 임시 파일의 offset 위치에 기록하고 청크 파일 삭제 (로컬 디스크 복사라 짧음)
+    offset은 호출한 쪽이 잠금 안에서 확인한 반영된 크기(received_size) - 그 앞은 건드리지 않음
+    """
+    path = upload_temp_path(upload_id)
+    # 파일이 없으면 만들고, 있으면 이어쓰기
+    mode = 'r+b' if os.path.exists(path) else 'wb'
+    written = 0
+    with open(path, mode) as f, open(chunk_path, 'rb') as chunk:
+        f.seek(offset)
+        for data in iter(lambda: chunk.read(IO_CHUNK_SIZE * 16), b''):
+            f.write(data)
+            written += len(data)
+        # 중단된 이전 요청이 반영된 크기 뒤에 남긴 바이트 정리 (offset 이상이라 반영된 내용은 안 잘림)
+        f.truncate(offset + written)
+    discard_chunk(chunk_path)
+    return written
+
+
+def discard_chunk(chunk_path):
+    try:
+        os.remove(chunk_path)
+    except FileNotFoundError:
+        pass
+
+
+def finalize_upload(upload_id):
+    """
+    임시 파일의 해시를 계산해서 최종 위치로 옮기고 (sha256, 상대 경로)를 반환
+    같은 내용의 파일이 이미 있으면 임시 파일은 지우고 기존 파일을 사용
+    """
+    temp_path = upload_temp_path(upload_id)
+    digest = hashlib.sha256()
+    with open(temp_path, 'rb') as f:
+        for data in iter(lambda: f.read(IO_CHUNK_SIZE * 16), b''):
+            digest.update(data)
+    sha256 = digest.hexdigest()
+    relative_path = blob_relative_path(sha256)
+    final_path = media_path(relative_path)
+    if os.path.exists(final_path):
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(temp_path, final_path)
+    return sha256, relative_path
+
+
+def discard_upload(upload_id):
+    try:
+        os.remove(upload_temp_path(upload_id))
+    except FileNotFoundError:
+        pass
+    # 반영되지 못하고 남은 청크 파일 (요청 도중 프로세스가 죽은 경우 등)
+    for chunk_path in glob.glob(upload_chunk_path(upload_id, '*')):
+        discard_chunk(chunk_path)
+
+
+def parse_range(header, size):
+    """'bytes=start-end' 단일 범위를 (start, end) 포함 구간으로 변환, 잘못된 범위면 None"""
+    match = _RANGE_RE.match(header.strip())
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if start == '':
+        # bytes=-N : 마지막 N바이트
+        if end == '':
+            return None
+        length = int(end)
+        if length == 0:
+            return None
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = size - 1 if end == '' else min(int(end), size - 1)
+    if start > end:
+        return None
+    return start, end
+
+
+async def _aiter_range(path, start, length):
+    """파일의 start부터 length바이트를 IO_CHUNK_SIZE씩 (디스크 읽기는 스레드에서, 메모리에는 청크 하나만)"""
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            data = await asyncio.to_thread(f.read, min(IO_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+def serve_attachment(request, attachment):
+    """첨부파일 다운로드 응답 (Range 지원)"""
+    return _serve_file(
+        request, attachment.storage_path, attachment.size, attachment.sha256,
+        attachment.content_type, attachment.file_name,
+    )
+
+
+def serve_thumbnail(request, attachment):
+    """썸네일 응답 - 썸네일도 원본 해시 기준 경로라 원본과 같은 캐시 정책 사용"""
+    try:
+        size = os.path.getsize(media_path(attachment.thumbnail_path))
+    except FileNotFoundError:
+        # 미디어 저장소 정리 등으로 파일이 없어짐 - generate_previews로 다시 생성 가능
+        raise Http404
+    name, _ = os.path.splitext(attachment.file_name)
+    return _serve_file(
+        request, attachment.thumbnail_path, size,
+        f'{attachment.sha256}-thumb', 'image/webp', f'{name}.webp',
+    )
+
+
+def _serve_file(request, relative_path, size, etag, content_type, file_name):
+    path = media_path(relative_path)
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and request.META.get('HTTP_IF_RANGE', f'"{etag}"') == f'"{etag}"':
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    accel_prefix = settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX
+    if accel_prefix:
+        # nginx가 파일 전송과 Range 처리를 직접 함 (sendfile, 워커 점유 없음)
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path.replace(os.sep, '/')
+    else:
+        # 전송 도중이 아니라 여기서 없는 파일을 404로
+        if not os.path.isfile(path):
+            raise Http404
+        start, end = byte_range or (0, size - 1)
+        response = StreamingHttpResponse(
+            _aiter_range(path, start, end - start + 1), status=206 if byte_range else 200
+        )
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+
+    # API 도메인에서 HTML/SVG 등을 그대로 열면 저장형 XSS가 되므로 래스터 이미지/동영상만 inline
+    if content_type in settings.ATTACHMENT_INLINE_CONTENT_TYPES:
+        disposition = 'inline'
+    else:
+        content_type, disposition = 'application/octet-stream', 'attachment'
+    response['Content-Type'] = content_type
+    response['X-Content-Type-Options'] = 'nosniff'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = f'"{etag}"'
+    response['Content-Disposition'] = f"{disposition}; filename*=UTF-8''{quote(file_name, safe='')}"
+    # 내용 해시 기준 저장이라 같은 id의 내용은 절대 안 바뀜
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,174 @@
+"""
+WebSocket 서명 토큰 인증
+AuthMiddlewareStack은 연결마다 Redis 캐시에서 세션을 읽어서, 재배포/장애 후 재접속이 몰리면 세션 저장소도 같이 몰림
+core-service가 발급한 HMAC 서명 토큰을 이 프로세스 안에서 바로 검증 (외부 조회 없음)
+
+토큰 형식: <kid>.<payload>.<signature>  (payload = base64url JSON {"sub": user_id, "iat", "exp"})
+- kid로 검증 키를 고름 → 키 교체 시 새 키를 목록에 추가해서 배포 → 발급 쪽을 새 키로 전환 → 토큰 TTL이 지난 뒤 예전 키 제거
+- 검증 결과는 작은 LRU 캐시에 보관 (같은 토큰으로 재접속하면 디코딩/서명 계산 생략)
+
+전달 방법: 쿼리스트링 ?token=... (브라우저) 또는 Authorization: Bearer ... 헤더
+"""
+
+import base64
+import collections
+import hashlib
+import hmac
+import json
+import threading
+import time
+from urllib.parse import parse_qs
+
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+
+# 발급 서버와 시계가 조금 달라도 허용하는 범위 (초)
+CLOCK_SKEW = 30
+
+
+class InvalidToken(Exception):
+    """서명/형식이 잘못됐거나 만료된 토큰"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def _sign(key, message):
+    return hmac.new(key.encode('utf8'), message.encode('ascii'), hashlib.sha256).digest()
+
+
+def issue_token(user_id, ttl=None, kid=None, now=None):
+    """토큰 발급 (core-service와 같은 키를 공유하는 테스트/내부 도구용)"""
+    keys = settings.CHAT_TOKEN_KEYS
+    kid = kid or next(iter(keys))  # 목록의 첫 번째 키로 발급
+    now = int(time.time() if now is None else now)
+    ttl = settings.CHAT_TOKEN_TTL if ttl is None else ttl
+    payload = _b64encode(json.dumps(
+        {'sub': str(user_id), 'iat': now, 'exp': now + ttl}, separators=(',', ':')
+    ).encode('utf8'))
+    signing_input = f'{kid}.{payload}'
+    return f'{signing_input}.{_b64encode(_sign(keys[kid], signing_input))}'
+
+
+class TokenVerifier:
+    """토큰 검증 + 검증 결과 LRU 캐시"""
+
+    def __init__(self, keys, cache_size=10000):
+        self.keys = keys
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        # 토큰 -> claims
+        self._cache = collections.OrderedDict()
+        self.stats = collections.Counter()
+
+    def verify(self, token, now=None):
+        """검증된 claims({'sub', 'iat', 'exp'})를 반환, 실패하면 InvalidToken"""
+        now = time.time() if now is None else now
+        with self._lock:
+            claims = self._cache.get(token)
+            if claims is not None:
+                self._cache.move_to_end(token)
+        if claims is not None:
+            # 캐시에 있어도 만료와 키 폐기(교체 완료)는 다시 확인
+            if claims['exp'] + CLOCK_SKEW < now or claims['kid'] not in self.keys:
+                self._forget(token)
+                self.stats['rejected'] += 1
+                raise InvalidToken('token expired')
+            self.stats['cache_hits'] += 1
+            return claims
+
+        try:
+            claims = self._verify(token, now)
+        except InvalidToken:
+            self.stats['rejected'] += 1
+            raise
+        self.stats['verified'] += 1
+        with self._lock:
+            self._cache[token] = claims
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return claims
+
+    def _verify(self, token, now):
+        try:
+            kid, payload, signature = token.split('.')
+        except ValueError:
+            raise InvalidToken('malformed token')
+        key = self.keys.get(kid)
+        if key is None:
+            raise InvalidToken('unknown key id')
+        try:
+            valid = hmac.compare_digest(_sign(key, f'{kid}.{payload}'), _b64decode(signature))
+        except (ValueError, UnicodeEncodeError):
+            raise InvalidToken('malformed signature')
+        if not valid:
+            raise InvalidToken('bad signature')
+        try:
+            claims = json.loads(_b64decode(payload))
+            user_id = str(claims['sub'])
+            expires = int(claims['exp'])
+        except (ValueError, KeyError, TypeError):
+            raise InvalidToken('malformed payload')
+        if not user_id or expires + CLOCK_SKEW < now:
+            raise InvalidToken('token expired')
+        return {'sub': user_id, 'iat': claims.get('iat'), 'exp': expires, 'kid': kid}
+
+    def _forget(self, token):
+        with self._lock:
+            self._cache.pop(token, None)
+
+
+_verifier = None
+
+
+def get_verifier():
+    global _verifier
+    if _verifier is None:
+        _verifier = TokenVerifier(settings.CHAT_TOKEN_KEYS, settings.CHAT_TOKEN_CACHE_SIZE)
+    return _verifier
+
+
+def token_from_scope(scope):
+    """쿼리스트링 token 또는 Authorization: Bearer 헤더에서 토큰 추출"""
+    query = parse_qs(scope.get('query_string', b'').decode())
+    if query.get('token'):
+        return query['token'][0]
+    for name, value in scope.get('headers', []):
+        if name == b'authorization':
+            scheme, _, credentials = value.decode('latin1').partition(' ')
+            if scheme.lower() == 'bearer' and credentials:
+                return credentials.strip()
+    return None
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    WebSocket 연결의 토큰을 검증해서 scope에 인증된 사용자를 넣음
+    - scope['user_id']: 인증된 사용자 id (토큰이 없거나 잘못되면 None)
+    - scope['auth']: 'authenticated' / 'anonymous' / 'invalid'
+    - scope['auth_expires']: 토큰 만료 시각 (연결 중 만료 확인용)
+    연결 거절 여부는 consumer가 CHAT_WS_AUTH_REQUIRED를 보고 결정
+    """
+
+    async def __call__(self, scope, receive, send):
+        # scope 복사는 여기서 한 번만 (BaseMiddleware.__call__도 다시 복사하는데, 복사본마다 연결이 끝날 때까지 남음)
+        scope = dict(scope, user_id=None, auth_expires=None)
+        token = token_from_scope(scope)
+        if token is None:
+            scope['auth'] = 'anonymous'
+        else:
+            try:
+                # HMAC 한 번 계산하는 정도라 이벤트 루프에서 바로 검증
+                claims = get_verifier().verify(token)
+            except InvalidToken:
+                scope['auth'] = 'invalid'
+            else:
+                scope['auth'] = 'authenticated'
+                scope['user_id'] = claims['sub']
+                scope['auth_expires'] = claims['exp']
+        return await self.inner(scope, receive, send)
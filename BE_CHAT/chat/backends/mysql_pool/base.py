@@ -0,0 +1,50 @@
+"""
+연결 풀을 사용하는 MySQL 백엔드
+ENGINE = 'chat.backends.mysql_pool' 로 지정하면 Django가 연결을 닫을 때
+실제로 끊지 않고 chat.db_pool 풀에 반납함 (설정은 DATABASES[alias]['POOL'])
+"""
+
+from django.db.backends.mysql import base as mysql_base
+
+from chat.db_pool import get_pool
+
+
+class DatabaseWrapper(mysql_base.DatabaseWrapper):
+    uses_connection_pool = True
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict, self._connect_raw)
+
+    def _connect_raw(self):
+        return super().get_new_connection(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        return self.pool.checkout()
+
+    def init_connection_state(self):
+        # 세션 변수 설정(SQL_AUTO_IS_NULL, 격리 수준)은 연결마다 한 번만 하면 됨
+        if getattr(self.connection, '_pool_initialized', False):
+            return
+        super().init_connection_state()
+        self.connection._pool_initialized = True
+
+    def _set_autocommit(self, autocommit):
+        # 풀에서 꺼낸 연결은 이미 autocommit 상태라 불필요한 왕복을 생략
+        if self.connection.get_autocommit() != autocommit:
+            super()._set_autocommit(autocommit)
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.in_atomic_block:
+            # 트랜잭션 도중에 닫히는 연결은 상태를 알 수 없어서 재사용하지 않음
+            self.pool.discard(self.connection)
+            return
+        try:
+            if not self.connection.get_autocommit():
+                self.connection.rollback()
+        except Exception:
+            self.pool.discard(self.connection)
+            return
+        self.pool.checkin(self.connection)
@@ -1,30 +1,196 @@
+import asyncio
+import collections
+import hashlib
 import json
+import sys
+import time
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from channels.exceptions import StopConsumer
+from channels.generic.http import AsyncHttpConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-from django.shortcuts import get_object_or_404
-from .models import Conversation, Message
-from .serializers import MessageSerializer
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, close_old_connections
+from django.db.models import Count, Max, Q
+from rest_framework.fields import DateTimeField
+from .models import Conversation, Message, DeliveryReceipt, Attachment
+from .serializers import ConversationSummarySerializer, MessageSerializer
 from .events import publish_message_created_event
+from .db_routers import arecord_write, asticky_reads, read_from_primary, record_write
+from .executors import submit_sync
+from .ratelimit import RateLimited, get_rate_limiter
+from .idempotency import RecentSends, ack_payload, get_recent_sends
+from .replay import replay_buffers
+from .notifications import get_digest, get_presence, notify_offline_recipients
+from .moderation import ContentBlocked, acheck_content
+from .heartbeat import IDLE_CLOSE_CODE, get_connection_monitor
 
 
-class ChatConsumer(AsyncWebsocketConsumer):
+class ConversationStreamMixin:
+    """
+    WebSocket/SSE 소비자 공용 - 대화방 확인, 재접속 복구, 접속 상태(오프라인 알림용)
+    self.conversation_id, self.replayed_upto를 사용
+    대부분의 연결은 유휴 상태로 오래 붙어 있으므로 연결마다 남는 상태를 줄임
+    - 기본값은 클래스 속성 (값이 바뀔 때만 인스턴스에 생김), 인증 정보는 scope에서 바로 읽음
+    - 대화방 id/그룹명/참여자 id는 intern해서 같은 대화방 연결끼리 같은 문자열을 공유
+    """
+
+    # 이 연결로 접속 중인 사용자 (chat/notifications.py의 접속 상태에 등록된 사용자)
+    present_user = None
+    presence_refreshed = 0
+    # 재접속 복구로 이미 보낸 마지막 순번 (이후 그룹으로 중복 도착하는 메시지는 건너뜀)
+    replayed_upto = 0
+    # 재전송 버퍼에 attach했는지 (거절된 연결은 detach하지 않도록)
+    replay_attached = False
+
+    @property
+    def auth_user_id(self):
+        """토큰으로 인증된 사용자 (TokenAuthMiddleware) - 있으면 payload의 sender_id/user_id는 무시"""
+        return self.scope.get('user_id')
+
+    @property
+    def auth_expires(self):
+        return self.scope.get('auth_expires')
+
+    def is_participant(self, conversation):
+        """인증된 연결은 대화방 참여자만 허용 (토큰 없는 개발용 연결은 확인할 사용자가 없음)"""
+        user_id = self.auth_user_id
+        return user_id is None or user_id in (conversation.participant1_id, conversation.participant2_id)
+
+    def bind_conversation(self):
+        """URL의 대화방 id(문자열)와 그룹명 (같은 대화방의 모든 연결을 묶음)"""
+        self.conversation_id = sys.intern(str(self.scope['url_route']['kwargs']['conversation_id']))
+        self.conversation_group_name = sys.intern(f'chat_{self.conversation_id}')
+
+    async def get_conversation(self, conversation_id):
+        conversation = await Conversation.objects.filter(id=conversation_id, is_active=True).afirst()
+        if conversation is not None:
+            return conversation
+        # 방금 생성된 대화방이 아직 레플리카에 없을 수 있어서 primary에서 한 번 더 확인
+        with read_from_primary():
+            return await Conversation.objects.filter(id=conversation_id, is_active=True).afirst()
+
+    async def mark_present(self, user_id):
+        """이 연결의 사용자를 대화방 접속자로 등록 (이 대화방의 대기 중인 오프라인 알림은 취소)"""
+        if not user_id or user_id == self.present_user:
+            return
+        presence = get_presence()
+        if self.present_user is not None:
+            # 인증 없는 개발용 연결에서 다른 sender_id로 보낸 경우
+            await presence.adetach(self.present_user, self.conversation_id, self.channel_name)
+        self.present_user = user_id
+        self.presence_refreshed = time.monotonic()
+        await presence.aattach(user_id, self.conversation_id, self.channel_name)
+        get_digest().discard(user_id, self.conversation_id)
+
+    async def refresh_presence(self):
+        """공유 접속 상태 만료 연장 (NOTIFY_PRESENCE_TTL의 1/3마다)"""
+        if self.present_user is None:
+            return
+        if time.monotonic() - self.presence_refreshed < settings.NOTIFY_PRESENCE_TTL / 3:
+            return
+        self.presence_refreshed = time.monotonic()
+        await get_presence().arefresh(self.present_user, self.conversation_id, self.channel_name)
+
+    async def clear_presence(self):
+        if self.present_user is not None:
+            await get_presence().adetach(self.present_user, self.conversation_id, self.channel_name)
+            self.present_user = None
+
+    async def missed_messages_frame(self, last_seq):
+        """
+        last_seq 이후 놓친 메시지 프레임 (missed_messages 또는 resync_required)
+        재전송 버퍼에 구간이 다 있으면 버퍼에서, 아니면 DB에서 조회
+        """
+        # 그룹에 들어간 뒤에 현재 순번을 읽으므로, 이 순번 이후 메시지는 그룹으로 반드시 도착함
+        current = await self.get_last_sequence()
+        # 순번이 현재보다 크면 클라이언트 상태가 서버와 맞지 않음 (DB 복구 등) - 역시 전체 동기화
+        if current - last_seq > settings.CHAT_RESUME_MAX_MESSAGES or not 0 <= last_seq <= current:
+            self.replayed_upto = current
+            return {
+                'type': 'resync_required',
+                'last_seq': current
+            }
+        
+        source = 'buffer'
+        messages = replay_buffers.range(self.conversation_id, last_seq, current) if current > last_seq else []
+        if messages is None:
+            source = 'db'
+            messages = await self.get_messages_between(last_seq, current)
+        self.replayed_upto = max(self.replayed_upto, current)
+        return {
+            'type': 'missed_messages',
+            'messages': messages,
+            'from_seq': last_seq,
+            'last_seq': current,
+            'source': source
+        }
+
+    async def get_last_sequence(self):
+        # 방금 저장된 메시지까지 포함해야 하므로 primary에서 조회
+        with read_from_primary():
+            return await Conversation.objects.filter(id=self.conversation_id).values_list(
+                'last_sequence', flat=True
+            ).aget()
+
+    async def get_messages_between(self, after, until):
+        """after < sequence_number <= until 메시지 (순번 순)"""
+        with read_from_primary():
+            messages = Message.objects.select_related('attachment').filter(
+                conversation_id=self.conversation_id,
+                is_deleted=False,
+                sequence_number__gt=after,
+                sequence_number__lte=until
+            ).order_by('sequence_number')
+            messages = [m async for m in messages]
+        return MessageSerializer(messages, many=True).data
+
+
+class ChatConsumer(ConversationStreamMixin, AsyncWebsocketConsumer):
     """
     WebSocket 채팅 소비자 - 실시간 채팅 기능 제공
     Django Channels를 사용한 비동기 WebSocket 처리
     """
+
+    # 이 연결에서 메시지를 보낸 사용자 (레플리카 sticky 읽기용, 인증된 연결은 connect에서 설정)
+    user_id = None
+    # ?resume=1 로 접속하면 첫 프레임(resume)에서 위치를 받을 때까지 최근 메시지 전송을 미룸
+    awaiting_resume = False
+    # bootstrap 프레임 형식 버전 (필드 의미가 바뀌면 올림)
+    BOOTSTRAP_VERSION = 1
+    # bootstrap의 conversation 부분 (자주 바뀌는 updated_at/last_sequence는 state와 메시지로 전달)
+    BOOTSTRAP_META_FIELDS = ['id', 'participant1_id', 'participant2_id', 'conversation_type', 'brand_id',
+                             'is_active', 'created_at']
     
     async def connect(self):
         """클라이언트 WebSocket 연결 처리"""
-        # URL에서 conversation_id 추출
-        self.conversation_id = self.scope['url_route']['kwargs']['conversation_id']
-        # 그룹명 생성 (같은 대화방의 모든 연결을 묶음)
-        self.conversation_group_name = f'chat_{self.conversation_id}'
+        # URL에서 conversation_id 추출, 그룹명 생성
+        self.bind_conversation()
+        if self.auth_user_id is not None:
+            self.user_id = self.auth_user_id
+        
+        # 잘못된 토큰은 항상, 토큰 없는 연결은 인증 필수일 때 거절 (DB 조회 전에)
+        auth = self.scope.get('auth')
+        if auth == 'invalid' or (settings.CHAT_WS_AUTH_REQUIRED and auth != 'authenticated'):
+            await self.close(code=4401)
+            return
+        
+        # async ORM은 database_sync_to_async처럼 매번 연결 정리를 해주지 않아서
+        # 연결 시점에 한 번 오래된 DB 연결을 정리 (ORM과 같은 스레드에서 실행)
+        await sync_to_async(close_old_connections)()
         
         # 대화방이 실제로 존재하는지 확인
         conversation = await self.get_conversation(self.conversation_id)
         if not conversation:
             await self.close()  # 존재하지 않으면 연결 종료
             return
+        if not self.is_participant(conversation):
+            # 토큰은 유효하지만 이 대화방 참여자가 아님
+            await self.close(code=4403)
+            return
+        # 메시지를 보낼 때 오프라인 알림 대상 확인용
+        self.participants = (sys.intern(conversation.participant1_id), sys.intern(conversation.participant2_id))
         
         # 대화방 그룹에 현재 연결 추가
         await self.channel_layer.group_add(
@@ -32,29 +198,95 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
+        replay_buffers.attach(self.conversation_id)
+        self.replay_attached = True
+        
         # WebSocket 연결 수락
         await self.accept()
+        get_connection_monitor().register(self)
+        await self.mark_present(self.auth_user_id)
         
-        # 연결 즉시 최근 메시지만 전송 (페이지네이션)
-        await self.send_recent_messages()
+        # 재접속이면 마지막으로 받은 순번(last_seq) 이후 메시지만 전송
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        last_seq = query.get('last_seq', [None])[0]
+        if query.get('bootstrap', [''])[0] in ('1', 'true'):
+            # 첫 화면에 필요한 상태를 프레임 하나로 (last_seq가 있으면 그 이후 메시지만)
+            await self.send_bootstrap(conversation, query)
+        elif last_seq is not None:
+            await self.resume_from(last_seq)
+        elif query.get('resume', [''])[0] in ('1', 'true'):
+            self.awaiting_resume = True
+        else:
+            # 연결 즉시 최근 메시지만 전송 (페이지네이션)
+            await self.send_recent_messages()
 
     async def disconnect(self, close_code):
         """클라이언트 WebSocket 연결 해제 처리"""
+        await self.release()
+
+    async def release(self):
+        """그룹/재전송 버퍼/접속 상태 정리 (disconnect와 유휴 연결 정리 양쪽에서 호출, 한 번만 동작)"""
+        get_connection_monitor().unregister(self)
+        # 존재하지 않는 대화방이라 연결을 거절한 경우는 attach하지 않았음
+        if not self.replay_attached:
+            return
+        self.replay_attached = False
+        replay_buffers.detach(self.conversation_id)
+        await self.clear_presence()
         # 대화방 그룹에서 현재 연결 제거
         await self.channel_layer.group_discard(
             self.conversation_group_name,
             self.channel_name
         )
 
+    async def ping(self):
+        """하트비트 - 한동안 프레임이 없는 연결 확인 (클라이언트는 pong으로 응답)"""
+        await self.send(text_data=json.dumps({'type': 'ping', 'ts': int(time.time() * 1000)}))
+
+    async def reap(self):
+        """
+        하트비트에 응답하지 않는 연결 (모바일 네트워크에서 끊긴 half-open 등)
+        닫기 프레임이 상대에게 가지 않아도 더 이상 그룹 메시지를 받지 않도록 먼저 그룹에서 뺌
+        """
+        await self.release()
+        await self.close(code=IDLE_CLOSE_CODE)
+
     async def receive(self, text_data):
         """클라이언트로부터 메시지 수신 처리"""
         try:
             # JSON 파싱
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
+            # 어떤 프레임이든 받으면 살아 있는 연결
+            get_connection_monitor().touch(self)
+            
+            if self.auth_expires is not None and time.time() > self.auth_expires:
+                # 연결 중에 토큰이 만료됨 - 클라이언트는 새 토큰으로 재접속 (last_seq로 이어받기)
+                await self.send(text_data=json.dumps({
+                    'type': 'error',
+                    'error': '인증이 만료되었습니다. 다시 연결해주세요.',
+                    'code': 'token_expired'
+                }))
+                await self.close(code=4401)
+                return
+            await self.refresh_presence()
+            if message_type == 'pong':
+                return
+            if message_type == 'ping':
+                # 클라이언트 쪽 연결 확인
+                await self.send(text_data=json.dumps({'type': 'pong', 'ts': text_data_json.get('ts')}))
+                return
+            
+            if self.awaiting_resume:
+                # ?resume=1 접속 후 첫 프레임 - resume이 아니면 처음 접속한 것으로 보고 최근 메시지부터 전송
+                self.awaiting_resume = False
+                if message_type != 'resume':
+                    await self.send_recent_messages()
             
             # 메시지 타입에 따른 처리 분기
-            if message_type == 'chat_message':
+            if message_type == 'resume':
+                await self.resume_from(text_data_json.get('last_seq'))  # 놓친 메시지 재전송
+            elif message_type == 'chat_message':
                 await self.handle_chat_message(text_data_json)  # 채팅 메시지
             elif message_type == 'mark_as_read':
                 await self.handle_mark_as_read(text_data_json)  # 읽음 처리
@@ -67,44 +299,127 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.send(text_data=json.dumps({
                 'error': 'Invalid JSON format'
             }))
+        except RateLimited as e:
+            # 조용히 버리지 않고 어떤 한도에 걸렸는지, 언제 다시 보내면 되는지 알려줌
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                **e.as_dict()
+            }))
 
     async def handle_chat_message(self, data):
-        sender_id = data.get('sender_id')
-        content = data.get('content')
+        sender_id = self.identity(data, 'sender_id')
+        content = data.get('content', '')
         message_type = data.get('message_type', 'text')
+        attachment_id = data.get('attachment_id')  # 이미지/파일은 업로드 API로 올린 뒤 id만 전달
+        # 클라이언트가 만든 메시지 id - 재전송해도 한 번만 저장되고 같은 ack를 받음
+        client_msg_id = data.get('client_msg_id') or None
+        
+        if not sender_id or not (content or attachment_id):
+            await self.send(text_data=json.dumps({
+                'error': 'sender_id와 content(또는 attachment_id)가 필요합니다.'
+            }))
+            return
+        if client_msg_id is not None and (not isinstance(client_msg_id, str) or len(client_msg_id) > 64):
+            await self.send(text_data=json.dumps({
+                'error': 'client_msg_id는 64자 이하 문자열이어야 합니다.'
+            }))
+            return
+        self.user_id = sender_id
+        await self.mark_present(sender_id)
+        
+        dedupe_key = None
+        if client_msg_id:
+            # 최근에 저장한 메시지의 재전송이면 DB를 거치지 않고 같은 ack만 다시 보냄
+            dedupe_key = RecentSends.key(self.conversation_id, sender_id, client_msg_id)
+            ack = get_recent_sends().get(dedupe_key)
+            if ack is not None:
+                await self.send_ack(client_msg_id, ack, duplicate=True)
+                return
+        
+        await get_rate_limiter().acheck('chat', sender_id, self.conversation_id)
         
-        if not sender_id or not content:
+        # 금칙어/금지 링크 검사 (저장/브로드캐스트 전, 실행기에서 시간 제한 안에)
+        try:
+            await acheck_content(content)
+        except ContentBlocked as e:
             await self.send(text_data=json.dumps({
-                'error': 'sender_id와 content가 필요합니다.'
+                'type': 'error',
+                'client_msg_id': client_msg_id,
+                **e.as_dict()
             }))
             return
         
         # 메시지를 데이터베이스에 저장
-        message = await self.create_message(
-            conversation_id=self.conversation_id,
-            sender_id=sender_id,
-            content=content,
-            message_type=message_type
-        )
+        try:
+            message = await self.create_message(
+                conversation_id=self.conversation_id,
+                sender_id=sender_id,
+                content=content,
+                message_type=message_type,
+                attachment_id=attachment_id,
+                client_msg_id=client_msg_id
+            )
+        except Attachment.DoesNotExist:
+            # ack를 기다리는 클라이언트가 멈추지 않도록 어떤 메시지가 실패했는지 알려줌
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'client_msg_id': client_msg_id,
+                'error': '첨부파일을 찾을 수 없습니다.',
+                'code': 'attachment_not_found'
+            }))
+            return
+        
+        if message is None and client_msg_id:
+            # 다른 연결/노드에서 이미 저장된 재전송 (유니크 제약에 걸림)
+            existing = await self.get_sent_message(sender_id, client_msg_id)
+            if existing is not None:
+                ack = ack_payload(existing)
+                get_recent_sends().put(dedupe_key, ack)
+                await self.send_ack(client_msg_id, ack, duplicate=True)
+            return
         
         if message:
+            # 보낸 사람에게 먼저 ack (브로드캐스트 에코를 기다리지 않고 다음 메시지를 보낼 수 있음)
+            ack = ack_payload(message)
+            if dedupe_key:
+                get_recent_sends().put(dedupe_key, ack)
+            await self.send_ack(client_msg_id, ack)
+            
             # 메시지를 그룹의 모든 멤버에게 브로드캐스트
             await self.channel_layer.group_send(
                 self.conversation_group_name,
                 {
                     'type': 'chat_message',
-                    'message': await self.serialize_message(message)
+                    'message': self.serialize_message(message)
                 }
             )
             
             # 이벤트 발행 (비동기)
-            await self.publish_message_event(message)
+            self.publish_message_event(message)
+            # 상대방이 이 대화방에 연결되어 있지 않으면 알림 다이제스트에 추가
+            submit_sync(notify_offline_recipients, message, self.participants)
+
+    def identity(self, data, key):
+        """프레임을 보낸 사용자 - 인증된 연결이면 토큰의 사용자, 아니면(개발용) payload 값"""
+        if self.auth_user_id is not None:
+            return self.auth_user_id
+        return data.get(key)
+
+    async def send_ack(self, client_msg_id, ack, duplicate=False):
+        await self.send(text_data=json.dumps({
+            'type': 'ack',
+            'client_msg_id': client_msg_id,
+            'duplicate': duplicate,
+            **ack
+        }))
 
     async def handle_mark_as_read(self, data):
         message_id = data.get('message_id')
-        user_id = data.get('user_id')
+        user_id = self.identity(data, 'user_id')
         
         if message_id and user_id:
+            await self.mark_present(user_id)
+            await get_rate_limiter().acheck('read', user_id, self.conversation_id)
             await self.mark_message_as_read(message_id, user_id)
             
             # 읽음 상태를 그룹에 알림
@@ -118,8 +433,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
 
     async def handle_typing(self, data):
-        user_id = data.get('user_id')
+        user_id = self.identity(data, 'user_id')
         is_typing = data.get('is_typing', False)
+        await get_rate_limiter().acheck('typing', user_id, self.conversation_id)
         
         # 타이핑 상태를 다른 참가자에게 알림
         await self.channel_layer.group_send(
@@ -133,6 +449,11 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     # 그룹 메시지 핸들러들
     async def chat_message(self, event):
+        sequence = event['message'].get('sequence_number')
+        replay_buffers.record(self.conversation_id, event['message'])
+        if sequence is not None and sequence <= self.replayed_upto:
+            # 재접속 복구 때 이미 보낸 메시지
+            return
         await self.send(text_data=json.dumps({
             'type': 'chat_message',
             'message': event['message']
@@ -152,60 +473,81 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'is_typing': event['is_typing']
         }))
 
-    # 데이터베이스 작업들
-    @database_sync_to_async
-    def get_conversation(self, conversation_id):
-        try:
-            return Conversation.objects.get(id=conversation_id, is_active=True)
-        except Conversation.DoesNotExist:
-            return None
+    async def attachment_preview(self, event):
+        # 이미지 썸네일이 준비됨 - 클라이언트는 해당 메시지의 첨부파일 정보를 교체
+        await self.send(text_data=json.dumps({
+            'type': 'attachment_preview',
+            'message_ids': event['message_ids'],
+            'attachment': event['attachment']
+        }))
 
-    @database_sync_to_async
-    def create_message(self, conversation_id, sender_id, content, message_type):
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            message = Message.objects.create(
-                conversation=conversation,
+    # 데이터베이스 작업들
+    # Django async ORM을 직접 사용 - 메시지 1건당 database_sync_to_async 홉 3번(저장/직렬화/이벤트)을
+    # 쿼리 1번으로 줄임. 직렬화는 DB를 안 건드려서 이벤트 루프에서 바로 처리
+    async def create_message(self, conversation_id, sender_id, content, message_type, attachment_id=None,
+                             client_msg_id=None):
+        """저장한 메시지, 중복 client_msg_id/없는 대화방이면 None, 없는 첨부파일이면 Attachment.DoesNotExist"""
+        attachment = None
+        if attachment_id:
+            # 직렬화할 때 추가 쿼리가 없도록 첨부파일을 먼저 조회해서 붙여둠
+            try:
+                attachment = await Attachment.objects.aget(id=attachment_id)
+            except ValidationError:
+                # 형식이 잘못된 id
+                raise Attachment.DoesNotExist from None
+        # 대화방 순번 발급 + 저장을 한 트랜잭션으로 (스레드 홉 1번, async ORM 쿼리 1번과 같음)
+        # sticky 기록(동기 캐시 호출)도 같은 홉에서 처리해서 이벤트 루프를 막지 않음
+        def create_and_record():
+            message = Message.objects.create_sequenced(
+                conversation_id=conversation_id,
                 sender_id=sender_id,
                 content=content,
-                message_type=message_type
+                message_type=message_type,
+                attachment=attachment,
+                client_msg_id=client_msg_id
             )
+            record_write(sender_id)
             return message
-        except Conversation.DoesNotExist:
+
+        try:
+            return await sync_to_async(create_and_record)()
+        except (Conversation.DoesNotExist, IntegrityError):
             return None
 
-    @database_sync_to_async
+    async def get_sent_message(self, sender_id, client_msg_id):
+        # 방금 다른 연결에서 저장된 메시지일 수 있어서 primary에서 조회
+        with read_from_primary():
+            return await Message.objects.filter(
+                conversation_id=self.conversation_id, sender_id=sender_id, client_msg_id=client_msg_id
+            ).afirst()
+
     def serialize_message(self, message):
         serializer = MessageSerializer(message)
         return serializer.data
 
-    @database_sync_to_async
-    def get_conversation_messages(self, conversation_id):
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            messages = conversation.messages.filter(is_deleted=False).order_by('created_at')
-            serializer = MessageSerializer(messages, many=True)
-            return serializer.data
-        except Conversation.DoesNotExist:
-            return []
+    async def get_conversation_messages(self, conversation_id):
+        messages = Message.objects.select_related('attachment').filter(
+            conversation_id=conversation_id, is_deleted=False
+        ).order_by('created_at', 'id')
+        return MessageSerializer([m async for m in messages], many=True).data
 
-    @database_sync_to_async
-    def mark_message_as_read(self, message_id, user_id):
-        from .models import DeliveryReceipt
+    async def mark_message_as_read(self, message_id, user_id):
         try:
-            message = Message.objects.get(id=message_id)
-            receipt, created = DeliveryReceipt.objects.update_or_create(
-                message=message,
+            receipt, created = await DeliveryReceipt.objects.aupdate_or_create(
+                message_id=message_id,
                 user_id=user_id,
                 defaults={'status': 'read'}
             )
-            return receipt
-        except Message.DoesNotExist:
+        except (IntegrityError, ValidationError):
+            # 존재하지 않거나 형식이 잘못된 message_id
             return None
+        await arecord_write(user_id)
+        return receipt
 
-    @database_sync_to_async
     def publish_message_event(self, message):
-        publish_message_created_event(message)
+        # 이벤트 발행(로깅/브로커 전송)은 동기 작업이라 실행기로 넘기고 기다리지 않음
+        # (future를 돌려줘서 벤치마크 등 필요한 쪽은 완료를 기다릴 수 있음)
+        return submit_sync(publish_message_created_event, message)
 
     async def send_recent_messages(self, limit=20):
         """최근 메시지들만 전송 (WebSocket 연결시)"""
@@ -216,6 +558,111 @@ class ChatConsumer(AsyncWebsocketConsumer):
             'has_more': len(messages) == limit  # 더 있는지 여부
         }))
     
+    async def send_bootstrap(self, conversation, query, limit=20):
+        """
+        접속 직후 채팅 화면에 필요한 상태를 bootstrap 프레임 하나로 전송
+        (최근 메시지 + REST 대화방 상세/안 읽은 수/상대 읽음 위치/전달 기록을 따로 받던 왕복 대신)
+        쿼리 수 고정: 메시지 1 + 전달 기록 1 + 읽음 상태 1 (대화방은 connect에서 조회한 것 사용)
+        
+        클라이언트가 이미 가진 부분은 건너뜀
+        - conversation: 메타데이터 버전(v)을 ?meta_v=로 보내면 같을 때 빼고 unchanged에 표시
+        - messages: ?last_seq=가 있으면 그 이후 메시지만 (mode=delta, resume과 같은 경로)
+          놓친 메시지가 CHAT_RESUME_MAX_MESSAGES보다 많으면 최근 메시지로 교체 (mode=recent)
+        - state(안 읽은 수, 참여자별 읽은 마지막 순번)는 항상 포함
+        안 읽은 수는 인증된 사용자 기준 (개발용 연결은 ?user_id=)
+        """
+        user_id = self.auth_user_id or query.get('user_id', [None])[0]
+        frame = {'type': 'bootstrap', 'version': self.BOOTSTRAP_VERSION, 'unchanged': []}
+        meta = self.conversation_meta(conversation)
+        if query.get('meta_v', [None])[0] == meta['v']:
+            frame['unchanged'].append('conversation')
+        else:
+            frame['conversation'] = meta
+        
+        missed = None
+        last_seq = query.get('last_seq', [None])[0]
+        if last_seq is not None:
+            try:
+                missed = await self.missed_messages_frame(int(last_seq))
+            except ValueError:
+                pass
+        if missed is not None and missed['type'] == 'missed_messages':
+            frame.update(mode='delta', from_seq=missed['from_seq'], messages=missed['messages'], has_more=False)
+            current = missed['last_seq']
+        else:
+            messages = await self.get_recent_messages(self.conversation_id, limit)
+            frame.update(mode='recent', messages=messages, has_more=len(messages) == limit)
+            sent_upto = max([0] + [
+                message['sequence_number'] for message in messages if message['sequence_number'] is not None
+            ])
+            # 그룹에 들어간 뒤 조회했으므로 그 사이 그룹으로 도착한 메시지는 이미 보낸 것 - 건너뜀
+            self.replayed_upto = max(self.replayed_upto, sent_upto)
+            current = max(conversation.last_sequence, sent_upto)
+        
+        frame['receipts'] = await self.get_receipts([message['id'] for message in frame['messages']])
+        frame['state'] = {'last_seq': current, **await self.get_read_state(user_id)}
+        await self.send(text_data=json.dumps(frame))
+    
+    def conversation_meta(self, conversation):
+        """대화방 메타데이터 + 버전 (내용 해시 - 바뀔 때만 클라이언트가 다시 받음)"""
+        meta = dict(ConversationSummarySerializer(conversation, fields=self.BOOTSTRAP_META_FIELDS).data)
+        meta['v'] = hashlib.sha1(json.dumps(meta, sort_keys=True).encode()).hexdigest()[:12]
+        return meta
+    
+    async def get_receipts(self, message_ids):
+        """메시지들의 전달 기록 (쿼리 1번)"""
+        if not message_ids:
+            return []
+        timestamp = DateTimeField()
+        async with asticky_reads(self.user_id):
+            receipts = DeliveryReceipt.objects.filter(message_id__in=message_ids).values_list(
+                'message_id', 'user_id', 'status', 'timestamp'
+            )
+            return [
+                {'message_id': str(message_id), 'user_id': user_id, 'status': status,
+                 'timestamp': timestamp.to_representation(moment)}
+                async for message_id, user_id, status, moment in receipts
+            ]
+    
+    async def get_read_state(self, user_id):
+        """참여자별 읽은 마지막 순번과 user_id의 안 읽은 메시지 수 (대화방 메시지와 전달 기록 조인 한 번)"""
+        reads = {
+            f'read_{index}': Max('sequence_number', filter=Q(
+                delivery_receipts__user_id=participant, delivery_receipts__status='read'
+            ))
+            for index, participant in enumerate(self.participants)
+        }
+        if user_id:
+            reads['unread'] = Count('id', filter=Q(
+                delivery_receipts__user_id=user_id, delivery_receipts__status__in=['sent', 'delivered']
+            ))
+        async with asticky_reads(self.user_id):
+            # 같은 filter()의 조인을 집계가 그대로 사용 (참여자 두 명의 전달 기록만 읽음)
+            result = await Message.objects.filter(
+                conversation_id=self.conversation_id, is_deleted=False,
+                delivery_receipts__user_id__in=self.participants
+            ).aaggregate(**reads)
+        return {
+            'unread_count': result['unread'] if user_id else None,
+            'read_seq': {
+                participant: result[f'read_{index}'] or 0 for index, participant in enumerate(self.participants)
+            },
+        }
+    
+    async def resume_from(self, last_seq):
+        """
+        last_seq 이후 놓친 메시지를 정확히 전송 (재접속 복구)
+        놓친 메시지가 CHAT_RESUME_MAX_MESSAGES보다 많으면 resync_required로 전체 동기화를 요청
+        """
+        try:
+            last_seq = int(last_seq)
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({
+                'error': 'last_seq는 정수여야 합니다.'
+            }))
+            return
+        await self.send(text_data=json.dumps(await self.missed_messages_frame(last_seq)))
+
     async def handle_load_more_messages(self, data):
         """이전 메시지들 로드 요청 처리"""
         before_message_id = data.get('before_message_id')
@@ -236,37 +683,34 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 'error': 'before_message_id가 필요합니다.'
             }))
 
-    @database_sync_to_async
-    def get_recent_messages(self, conversation_id, limit=20):
+    async def get_recent_messages(self, conversation_id, limit=20):
         """최근 메시지들 조회"""
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            messages = conversation.messages.filter(is_deleted=False).order_by('-created_at')[:limit]
-            # 시간 순으로 다시 정렬 (최신이 아래로)
-            messages = list(reversed(messages))
-            serializer = MessageSerializer(messages, many=True)
-            return serializer.data
-        except Conversation.DoesNotExist:
-            return []
+        async with asticky_reads(self.user_id):
+            messages = Message.objects.select_related('attachment').filter(
+                conversation_id=conversation_id, is_deleted=False
+            ).order_by('-created_at', '-id')[:limit]
+            messages = [m async for m in messages]
+        # 시간 순으로 다시 정렬 (최신이 아래로)
+        messages.reverse()
+        return MessageSerializer(messages, many=True).data
 
-    @database_sync_to_async
-    def get_messages_before(self, conversation_id, before_message_id, limit=20):
+    async def get_messages_before(self, conversation_id, before_message_id, limit=20):
         """특정 메시지 이전의 메시지들 조회"""
-        try:
-            conversation = Conversation.objects.get(id=conversation_id)
-            before_message = Message.objects.get(id=before_message_id, conversation=conversation)
-            
-            messages = conversation.messages.filter(
-                is_deleted=False,
-                created_at__lt=before_message.created_at
-            ).order_by('-created_at')[:limit]
-            
-            # 시간 순으로 다시 정렬
-            messages = list(reversed(messages))
-            serializer = MessageSerializer(messages, many=True)
-            return serializer.data
-        except (Conversation.DoesNotExist, Message.DoesNotExist):
-            return []
+        async with asticky_reads(self.user_id):
+            try:
+                before_message = await Message.objects.only('id', 'created_at').aget(
+                    id=before_message_id, conversation_id=conversation_id
+                )
+            except (Message.DoesNotExist, ValidationError):
+                return []
+            messages = Message.objects.select_related('attachment').filter(
+                conversation_id=conversation_id,
+                is_deleted=False
+            ).before(before_message).order_by('-created_at', '-id')[:limit]
+            messages = [m async for m in messages]
+        # 시간 순으로 다시 정렬
+        messages.reverse()
+        return MessageSerializer(messages, many=True).data
 
     async def send_conversation_history(self):
         """기존 메서드 유지 (하위 호환성)"""
@@ -274,4 +718,154 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'type': 'conversation_history',
             'messages': messages
-        }))
\ No newline at end of file
+        }))
+
+
+class ChatEventStreamConsumer(ConversationStreamMixin, AsyncHttpConsumer):
+    """
+    Server-Sent Events 스트림 - WebSocket이 막힌 네트워크용
+    매초 messages/after를 폴링하는 대신 요청 하나를 열어두고 이벤트가 올 때마다 본문 조각으로 전송
+    ChatConsumer와 같은 대화방 그룹에 가입해서 같은 이벤트를 같은 JSON 형태로 전달 (data: {...})
+    chat_message에는 순번을 id로 붙여서 브라우저가 재연결할 때 Last-Event-ID로 놓친 메시지만 받음
+    받기 전용 - 메시지 전송/읽음 처리는 REST API 사용
+    """
+
+    # 열린 스트림 수/누적 이벤트 수 (지표용)
+    stats = collections.Counter()
+    # 요청 본문을 다 받기 전에 끊겨도 disconnect()가 동작하도록 기본값
+    heartbeat_task = None
+    # 응답 본문을 끝낸 뒤(토큰 만료)에는 남은 그룹 이벤트를 보내지 않음
+    body_finished = False
+
+    async def http_request(self, message):
+        # 기본 구현은 handle()이 끝나면 소비자를 종료하므로,
+        # 헤더만 보내고 돌아와서 그룹 이벤트를 계속 받을 수 있게 함 (종료는 http.disconnect)
+        if 'body' in message:
+            self.body.append(message['body'])
+        if not message.get('more_body'):
+            await self.start_stream()
+
+    async def start_stream(self):
+        self.bind_conversation()
+
+        auth = self.scope.get('auth')
+        if auth == 'invalid' or (settings.CHAT_WS_AUTH_REQUIRED and auth != 'authenticated'):
+            await self.reject(401, '인증이 필요합니다.')
+        await sync_to_async(close_old_connections)()
+        conversation = await self.get_conversation(self.conversation_id)
+        if not conversation:
+            await self.reject(404, '대화방을 찾을 수 없습니다.')
+        if not self.is_participant(conversation):
+            await self.reject(403, '대화방 참여자가 아닙니다.')
+
+        await self.channel_layer.group_add(self.conversation_group_name, self.channel_name)
+        replay_buffers.attach(self.conversation_id)
+        self.replay_attached = True
+        await self.mark_present(self.scope.get('user_id'))
+        self.stats['open'] += 1
+        self.stats['opened'] += 1
+
+        await self.send_headers(headers=[
+            (b'Content-Type', b'text/event-stream; charset=utf-8'),
+            (b'Cache-Control', b'no-cache'),
+            (b'X-Accel-Buffering', b'no'),  # nginx가 응답을 모아두지 않도록
+        ])
+        # 끊기면 브라우저가 이 간격 뒤에 Last-Event-ID와 함께 자동 재연결
+        await self.send_body(f'retry: {settings.SSE_RETRY_MS}\n\n'.encode(), more_body=True)
+
+        last_seq = self.resume_position()
+        if last_seq is not None:
+            frame = await self.missed_messages_frame(last_seq)
+            await self.send_event(frame, event_id=frame['last_seq'])
+        self.heartbeat_task = asyncio.create_task(self.heartbeat())
+
+    def resume_position(self):
+        """Last-Event-ID 헤더(브라우저 자동 재연결) 또는 ?last_seq= (처음 연결)"""
+        headers = dict(self.scope.get('headers', []))
+        value = headers.get(b'last-event-id', b'').decode('latin1')
+        if not value:
+            value = parse_qs(self.scope.get('query_string', b'').decode()).get('last_seq', [''])[0]
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    async def reject(self, status, error):
+        await self.send_response(
+            status, json.dumps({'error': error}).encode('utf8'),
+            headers=[(b'Content-Type', b'application/json')]
+        )
+        raise StopConsumer()
+
+    async def heartbeat(self):
+        """프록시가 유휴 연결을 끊지 않도록 주석 줄 전송, 토큰이 만료되면 스트림 종료"""
+        while True:
+            await asyncio.sleep(settings.SSE_HEARTBEAT_INTERVAL)
+            if self.auth_expires is not None and time.time() > self.auth_expires:
+                await self.send_event({
+                    'type': 'error',
+                    'error': '인증이 만료되었습니다. 다시 연결해주세요.',
+                    'code': 'token_expired'
+                })
+                await self.send_body(b'')
+                self.body_finished = True
+                # 응답을 끝내도 http.disconnect가 오기 전까지는 그룹/재전송 버퍼/접속 상태에 남아 있으므로
+                # 자기 채널로 종료 이벤트를 보내서 디스패치 루프에서 disconnect 정리 후 소비자 종료
+                await self.channel_layer.send(self.channel_name, {'type': 'stream.expired'})
+                return
+            await self.send_body(b': ping\n\n', more_body=True)
+            await self.refresh_presence()
+
+    async def disconnect(self):
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+        if self.replay_attached:
+            self.replay_attached = False
+            replay_buffers.detach(self.conversation_id)
+            self.stats['open'] -= 1
+            await self.clear_presence()
+            await self.channel_layer.group_discard(self.conversation_group_name, self.channel_name)
+
+    async def stream_expired(self, event):
+        await self.disconnect()
+        raise StopConsumer()
+
+    async def send_event(self, data, event_id=None):
+        if self.body_finished:
+            return
+        chunk = f'id: {event_id}\n' if event_id is not None else ''
+        chunk += f'data: {json.dumps(data)}\n\n'
+        self.stats['events'] += 1
+        await self.send_body(chunk.encode('utf8'), more_body=True)
+
+    # 그룹 메시지 핸들러들 (ChatConsumer와 같은 이벤트, 같은 JSON)
+    async def chat_message(self, event):
+        sequence = event['message'].get('sequence_number')
+        replay_buffers.record(self.conversation_id, event['message'])
+        if sequence is not None and sequence <= self.replayed_upto:
+            return
+        await self.send_event({
+            'type': 'chat_message',
+            'message': event['message']
+        }, event_id=sequence)
+
+    async def message_read(self, event):
+        await self.send_event({
+            'type': 'message_read',
+            'message_id': event['message_id'],
+            'user_id': event['user_id']
+        })
+
+    async def typing_status(self, event):
+        await self.send_event({
+            'type': 'typing_status',
+            'user_id': event['user_id'],
+            'is_typing': event['is_typing']
+        })
+
+    async def attachment_preview(self, event):
+        await self.send_event({
+            'type': 'attachment_preview',
+            'message_ids': event['message_ids'],
+            'attachment': event['attachment']
+        })
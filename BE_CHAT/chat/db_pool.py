@@ -0,0 +1,209 @@
+"""
+DB 연결 풀
+ASGI 워커에서는 database_sync_to_async / async ORM 쿼리가 여러 스레드에서 실행되는데
+Django 기본 방식(CONN_MAX_AGE=0)은 요청/호출마다 MySQL 연결을 새로 맺음
+프로세스 단위로 연결을 재사용해서 연결 수립 비용(p99의 상당 부분)을 없앰
+
+- 최대 크기 제한 (MAX_SIZE), 꽉 차면 TIMEOUT초 동안 대기
+- RECYCLE초 이상 된 연결은 폐기 후 새로 생성 (MySQL wait_timeout 대비)
+- PING_AFTER초 이상 놀고 있던 연결은 꺼내기 전에 ping으로 확인 (pre-ping)
+"""
+
+import collections
+import logging
+import threading
+import time
+
+from django.db import connections
+from django.db.utils import OperationalError
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(OperationalError):
+    """풀에서 연결을 TIMEOUT 안에 얻지 못함"""
+
+
+class ConnectionPool:
+    """스레드 안전한 연결 풀 (유휴 연결은 LIFO로 재사용해서 따뜻한 연결 위주로 사용)"""
+
+    def __init__(self, alias, connect, max_size=10, min_size=0, recycle=3600,
+                 ping_after=5, timeout=10):
+        self.alias = alias
+        self._connect = connect
+        self.max_size = max_size
+        self.min_size = min_size
+        self.recycle = recycle
+        self.ping_after = ping_after
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        # (연결, 생성 시각, 마지막 반납 시각)
+        self._idle = collections.deque()
+        # 체크아웃된 연결 id -> 생성 시각
+        self._in_use = {}
+        self._size = 0
+        self.stats = collections.Counter()
+
+    def checkout(self):
+        """풀에서 연결을 꺼냄 (없으면 생성, 꽉 찼으면 대기)"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                conn = None
+                while self._idle:
+                    conn, created_at, returned_at = self._idle.pop()
+                    if time.monotonic() - created_at < self.recycle:
+                        break
+                    self._discard(conn, 'recycled')
+                    conn = None
+                if conn is None:
+                    if self._size < self.max_size:
+                        self._size += 1
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.stats['timeouts'] += 1
+                            raise PoolTimeout(
+                                f"DB 연결 풀({self.alias})이 가득 참: {self.max_size}개 사용 중"
+                            )
+                        self.stats['waits'] += 1
+                        self._cond.wait(remaining)
+                        continue
+
+            if conn is None:
+                # 연결 생성은 락 밖에서 (느린 네트워크가 다른 스레드를 막지 않도록)
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created_at = time.monotonic()
+                self.stats['created'] += 1
+            elif time.monotonic() - returned_at >= self.ping_after and not self._ping(conn):
+                with self._cond:
+                    self._discard(conn, 'ping_failures')
+                continue
+
+            with self._cond:
+                self._in_use[id(conn)] = created_at
+                self.stats['checkouts'] += 1
+            return conn
+
+    def checkin(self, conn):
+        """사용이 끝난 연결을 풀에 반납"""
+        with self._cond:
+            created_at = self._in_use.pop(id(conn), None)
+            if created_at is None:
+                # 풀에서 꺼낸 연결이 아님 (풀 재설정 등) - 그냥 닫음
+                self._close_quietly(conn)
+                return
+            self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def discard(self, conn):
+        """깨진 연결은 풀로 돌려보내지 않고 폐기"""
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                self._close_quietly(conn)
+                return
+            self._discard(conn, 'discarded')
+
+    def warm_up(self):
+        """MIN_SIZE만큼 미리 연결을 만들어 둠 (첫 요청의 연결 비용 제거)"""
+        conns = []
+        try:
+            while len(conns) + len(self._idle) < self.min_size:
+                conns.append(self.checkout())
+        finally:
+            for conn in conns:
+                self.checkin(conn)
+
+    def close_all(self):
+        """유휴 연결을 모두 닫음 (프로세스 종료 시)"""
+        with self._cond:
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn, 'closed')
+
+    def snapshot(self):
+        """풀 지표 (모니터링용)"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'max_size': self.max_size,
+                **self.stats,
+            }
+
+    def _discard(self, conn, reason):
+        # self._cond를 잡은 상태에서 호출
+        self._size -= 1
+        self.stats[reason] += 1
+        self._cond.notify()
+        self._close_quietly(conn)
+
+    def _ping(self, conn):
+        try:
+            conn.ping()
+            return True
+        except Exception as e:
+            logger.warning(f"DB 연결 풀({self.alias}) ping 실패, 연결 교체: {e}")
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, connect):
+    """alias별 풀 (처음 호출될 때 settings_dict['POOL'] 설정으로 생성)"""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                options = settings_dict.get('POOL', {})
+                pool = ConnectionPool(
+                    alias,
+                    connect,
+                    max_size=options.get('MAX_SIZE', 10),
+                    min_size=options.get('MIN_SIZE', 0),
+                    recycle=options.get('RECYCLE', 3600),
+                    ping_after=options.get('PING_AFTER', 5),
+                    timeout=options.get('TIMEOUT', 10),
+                )
+                _pools[alias] = pool
+    return pool
+
+
+def warm_up_pools():
+    """풀을 쓰는 모든 DB alias의 연결을 미리 생성 (WSGI/ASGI 진입점에서 호출)"""
+    for alias in connections:
+        wrapper = connections[alias]
+        if not getattr(wrapper, 'uses_connection_pool', False):
+            continue
+        try:
+            wrapper.pool.warm_up()
+        except Exception as e:
+            # DB가 아직 안 떠 있어도 서버는 시작되어야 함 (첫 요청 때 다시 연결)
+            logger.warning(f"DB 연결 풀({alias}) 워밍업 실패: {e}")
+        finally:
+            wrapper.close()
+
+
+def close_pools():
+    for pool in _pools.values():
+        pool.close_all()
+
+
+def pool_stats():
+    return {alias: pool.snapshot() for alias, pool in _pools.items()}
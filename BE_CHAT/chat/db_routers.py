@@ -0,0 +1,255 @@
+"""
+읽기 전용 레플리카 라우팅
+대화 기록/목록 같은 읽기는 레플리카로, 쓰기는 항상 primary로 보냄
+방금 메시지를 쓴 사용자는 잠깐 동안 primary에서 읽도록 고정해서 (read-your-writes)
+자기가 보낸 메시지가 목록에서 안 보이는 문제를 막음
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .executors import run_sync
+
+logger = logging.getLogger(__name__)
+
+# 현재 요청/연결에서 primary로 읽어야 하는지 여부
+# asgiref가 sync_to_async 호출 시 컨텍스트를 복사하므로 consumer에서도 그대로 동작함
+_use_primary = ContextVar('chat_use_primary', default=False)
+
+# 프로세스 로컬 sticky 기록 (user_id -> 만료 시각)
+# Redis 캐시가 죽어도 최소한 같은 워커 안에서는 read-your-writes 보장
+_local_sticky = {}
+
+
+def _sticky_key(user_id):
+    return f'chat:db_sticky:{user_id}'
+
+
+def record_write(user_id):
+    """사용자가 쓰기를 했음을 기록 - 이후 STICKY 시간 동안 primary에서 읽음"""
+    if not user_id or not settings.DATABASE_REPLICAS:
+        return
+    _record_local_write(user_id)
+    _record_shared_write(user_id)
+
+
+def is_sticky(user_id):
+    """최근에 쓰기를 한 사용자인지 확인"""
+    if not user_id or not settings.DATABASE_REPLICAS:
+        return False
+    return _is_locally_sticky(user_id) or _is_shared_sticky(user_id)
+
+
+async def arecord_write(user_id):
+    """record_write의 async 버전 - 공유 캐시 기록(동기 Redis 호출)은 실행기에서 (이벤트 루프를 막지 않음)"""
+    if not user_id or not settings.DATABASE_REPLICAS:
+        return
+    _record_local_write(user_id)
+    await run_sync(_record_shared_write, user_id)
+
+
+async def ais_sticky(user_id):
+    """is_sticky의 async 버전 - 로컬 기록에 없을 때만 실행기에서 공유 캐시 조회"""
+    if not user_id or not settings.DATABASE_REPLICAS:
+        return False
+    return _is_locally_sticky(user_id) or await run_sync(_is_shared_sticky, user_id)
+
+
+def _record_local_write(user_id):
+    _local_sticky[str(user_id)] = time.monotonic() + settings.DATABASE_REPLICA_STICKY_SECONDS
+
+
+def _record_shared_write(user_id):
+    try:
+        # 다른 노드에서 읽는 경우를 위해 공유 캐시에도 기록
+        cache.set(_sticky_key(user_id), 1, timeout=settings.DATABASE_REPLICA_STICKY_SECONDS)
+    except Exception as e:
+        logger.warning(f"sticky 기록 실패 (로컬만 사용): {e}")
+
+
+def _is_locally_sticky(user_id):
+    expires_at = _local_sticky.get(str(user_id))
+    if expires_at is not None:
+        if expires_at > time.monotonic():
+            return True
+        _local_sticky.pop(str(user_id), None)
+    return False
+
+
+def _is_shared_sticky(user_id):
+    try:
+        return bool(cache.get(_sticky_key(user_id)))
+    except Exception:
+        return False
+
+
+@contextmanager
+def read_from_primary(enabled=True):
+    """블록 안의 읽기를 모두 primary로 보냄 (데코레이터로도 사용 가능)"""
+    if not enabled:
+        yield
+        return
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def sticky_reads(user_id):
+    """최근에 쓴 사용자면 primary, 아니면 레플리카에서 읽도록 하는 컨텍스트"""
+    return read_from_primary(is_sticky(user_id))
+
+
+@asynccontextmanager
+async def asticky_reads(user_id):
+    """sticky_reads의 async 버전 (consumer에서 async with로 사용)"""
+    with read_from_primary(await ais_sticky(user_id)):
+        yield
+
+
+class ReplicaHealthChecker:
+    """
+    레플리카 상태 확인
+    백그라운드 스레드가 interval마다 확인해서 상태만 바꾸고, 라우팅(db_for_read)은 그 상태를 읽기만 함
+    (레플리카가 응답하지 않아도 요청 스레드가 확인 쿼리에 묶이지 않음)
+    접속 실패나 복제 지연(max_lag 초과) 시 unhealthy로 표시해서 라우팅에서 제외
+    첫 확인이 끝나기 전에는 사용하지 않음 (primary로 읽음)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # alias -> (healthy 여부, 마지막 확인 시각)
+        self._state = {}
+        self._thread = None
+
+    def healthy_aliases(self):
+        """현재 사용 가능한 레플리카 alias 목록"""
+        self._start()
+        return [alias for alias in settings.DATABASE_REPLICAS if self._state.get(alias, (False, None))[0]]
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='chat-replica-health', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            for alias in settings.DATABASE_REPLICAS:
+                try:
+                    self._refresh(alias)
+                except Exception as e:
+                    logger.error(f"레플리카 {alias} 상태 확인 오류: {e!r}")
+            time.sleep(settings.DATABASE_REPLICA_CHECK_INTERVAL)
+
+    def _refresh(self, alias):
+        was_healthy = self._state.get(alias, (None, None))[0]
+        is_healthy = self._check(alias)
+        self._state[alias] = (is_healthy, time.monotonic())
+        if was_healthy != is_healthy:
+            logger.info(f"레플리카 {alias} 상태 변경: {'healthy' if is_healthy else 'unhealthy'}")
+        return is_healthy
+
+    def _check(self, alias):
+        connection = connections[alias]
+        try:
+            if connection.vendor == 'mysql':
+                lag = self._probe_mysql(connection)
+            else:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                lag = None
+        except Exception as e:
+            logger.warning(f"레플리카 {alias} 확인 실패: {e}")
+            return False
+        finally:
+            # 확인 스레드의 연결은 다음 확인까지 들고 있지 않음
+            connection.close()
+        if lag is not None and lag > settings.DATABASE_REPLICA_MAX_LAG:
+            logger.warning(f"레플리카 {alias} 복제 지연 {lag}초")
+            return False
+        return True
+
+    def _probe_mysql(self, connection):
+        """
+        풀을 거치지 않는 별도 연결로 SELECT 1 + 복제 지연 조회
+        접속/읽기 제한 시간(DATABASE_REPLICA_CHECK_TIMEOUT)을 둬서 응답 없는 레플리카도 바로 실패로 처리
+        """
+        timeout = settings.DATABASE_REPLICA_CHECK_TIMEOUT
+        params = connection.get_connection_params()
+        params.update(connect_timeout=timeout, read_timeout=timeout, write_timeout=timeout)
+        raw = connection.Database.connect(**params)
+        try:
+            cursor = raw.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            return self._replication_lag(connection, cursor)
+        finally:
+            raw.close()
+
+    def _replication_lag(self, connection, cursor):
+        """MySQL 복제 지연(초) 조회, 확인할 수 없으면 None"""
+        if connection.vendor != 'mysql':
+            return None
+        # MySQL 8.0.22+는 REPLICA, 그 이전은 SLAVE 용어 사용
+        for query, column in (
+            ('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+            ('SHOW SLAVE STATUS', 'Seconds_Behind_Master'),
+        ):
+            try:
+                cursor.execute(query)
+            except Exception:
+                continue
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            columns = [col[0] for col in cursor.description]
+            lag = dict(zip(columns, row)).get(column)
+            # 복제 스레드가 멈추면 NULL - 사용하면 안 되는 상태
+            return float('inf') if lag is None else lag
+        return None
+
+
+replica_health = ReplicaHealthChecker()
+
+
+class ReplicaRouter:
+    """
+    primary/레플리카 라우터
+    settings.DATABASE_REPLICAS가 비어 있으면 모든 쿼리가 default로 감
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_primary.get() or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        # 이미 읽어온 객체의 연관 조회는 같은 DB에서 계속 읽음
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        healthy = replica_health.healthy_aliases()
+        if not healthy:
+            return DEFAULT_DB_ALIAS
+        return random.choice(healthy)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 레플리카는 primary의 복제본이라 관계 허용
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 마이그레이션은 primary에만 적용 (레플리카는 복제로 따라옴)
+        return db == DEFAULT_DB_ALIAS
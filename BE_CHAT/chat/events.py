@@ -1,10 +1,12 @@
-import json
-import logging
 from datetime import datetime
-from django.conf import settings
+
+import structlog
+
+from .rollups import record_conversation_activity, record_message_activity
 
 # 로거 인스턴스 생성 (이벤트 발행 로깅용)
-logger = logging.getLogger(__name__)
+# 한 줄 JSON으로 큐에 넣기만 하고, 메시지 본문은 남기지 않음 (chat/structured_logging.py)
+logger = structlog.get_logger(__name__)
 
 
 def publish_message_created_event(message):
@@ -19,7 +21,7 @@ def publish_message_created_event(message):
         'data': {
             # 메시지 관련 정보들
             'message_id': str(message.id),  # UUID를 문자열로 변환
-            'conversation_id': str(message.conversation.id),
+            'conversation_id': str(message.conversation_id),  # FK 값만 사용 (추가 쿼리 방지)
             'sender_id': message.sender_id,
             'content': message.content,
             'message_type': message.message_type,
@@ -28,7 +30,17 @@ def publish_message_created_event(message):
     }
     
     # 현재는 로깅으로 구현 (실제 환경에서는 메시지 브로커 사용)
-    logger.info(f"Publishing event: {json.dumps(event_data, indent=2)}")
+    # 메시지마다 발생하므로 LOG_SAMPLE_RATES 비율만큼만 기록, 본문 대신 길이만
+    logger.info(
+        'message.created',
+        message_id=event_data['data']['message_id'],
+        conversation_id=event_data['data']['conversation_id'],
+        sender_id=message.sender_id,
+        message_type=message.message_type,
+        content_length=len(message.content or ''),
+    )
+    # 활동 집계 (메모리에 건수만 더하고 주기적으로 반영)
+    record_message_activity(message)
     
     # TODO: 프로덕션 환경에서 구현해야 할 것들
     # - RabbitMQ 또는 Apache Kafka를 통한 이벤트 발행
@@ -55,5 +67,6 @@ def publish_conversation_created_event(conversation):
         }
     }
     
-    logger.info(f"Publishing event: {json.dumps(event_data, indent=2)}")
+    logger.info('conversation.created', **event_data['data'])
+    record_conversation_activity(conversation)
     return event_data
\ No newline at end of file
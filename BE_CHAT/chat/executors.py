@@ -0,0 +1,46 @@
+"""
+이벤트 루프 밖에서 돌려야 하는 동기 작업용 실행기
+DB 쿼리는 Django async ORM을 쓰고, 남은 동기 작업(이벤트 발행 로깅 등)만 여기로 보냄
+스레드 수는 settings.CHAT_SYNC_EXECUTOR_WORKERS로 조절
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """공용 스레드 풀 (처음 사용할 때 생성)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CHAT_SYNC_EXECUTOR_WORKERS,
+            thread_name_prefix='chat-sync',
+        )
+    return _executor
+
+
+async def run_sync(func, *args, **kwargs):
+    """동기 함수를 실행기에서 돌리고 결과를 기다림"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+
+
+def submit_sync(func, *args, **kwargs):
+    """동기 함수를 실행기에 던지고 기다리지 않음 (실패는 로그로만 남김)"""
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_executor(), functools.partial(func, *args, **kwargs))
+    future.add_done_callback(_log_failure)
+    return future
+
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"백그라운드 작업 실패: {future.exception()!r}")
@@ -0,0 +1,131 @@
+"""
+WebSocket 하트비트와 유휴 연결 정리
+모바일 네트워크에서 끊긴(half-open) 연결은 TCP가 알려주지 않아서 채널 레이어 그룹 만료(group_expiry)까지
+chat_{id} 그룹에 남음 → group_send가 계속 그 채널로 보내고 채널 큐가 capacity까지 참
+
+- 연결마다 작업/타이머를 두지 않음 (유휴 연결 메모리, 개발기록 33)
+  프로세스에 sweep 작업 하나가 마지막 수신 시각 순으로 정렬된 목록을 앞에서부터 확인
+  프레임을 받을 때마다 그 연결을 목록 끝으로 옮기므로 오래된 연결만 보고 멈춤
+- CHAT_WS_HEARTBEAT_INTERVAL초 동안 아무 프레임도 안 온 연결에 {"type": "ping"} 전송 → 클라이언트는 {"type": "pong"}
+- CHAT_WS_IDLE_TIMEOUT초 동안 아무 프레임도 안 오면 정리 - 그룹에서 빼고(group_discard) 4408로 닫음
+  (닫기 프레임이 상대에게 가지 않아도 서버의 disconnect를 기다리지 않고 먼저 그룹에서 뺌)
+- 모든 호출은 이벤트 루프 스레드에서만 일어나므로 락 없음
+"""
+
+import asyncio
+import collections
+import logging
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 하트비트에 응답하지 않아 서버가 닫은 연결 (클라이언트는 재접속)
+IDLE_CLOSE_CODE = 4408
+
+
+class ConnectionMonitor:
+    """
+    하트비트 대상 연결 목록 + 정리 작업
+    consumer는 ping()과 reap()을 구현해야 함
+    """
+
+    def __init__(self, heartbeat_interval=30, idle_timeout=75, sweep_interval=5):
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        # consumer -> 마지막 프레임 수신 시각 (오래된 연결이 앞)
+        self._last_seen = collections.OrderedDict()
+        # ping을 보냈는데 아직 아무 프레임도 안 온 연결
+        self._pinged = set()
+        self._task = None
+        self.stats = collections.Counter()
+
+    @property
+    def enabled(self):
+        return self.heartbeat_interval > 0
+
+    def register(self, consumer):
+        if not self.enabled:
+            return
+        self._last_seen[consumer] = time.monotonic()
+        self._start()
+
+    def touch(self, consumer):
+        """연결에서 프레임을 받음 (pong이든 메시지든 살아 있다는 뜻)"""
+        if consumer not in self._last_seen:
+            return
+        self._last_seen[consumer] = time.monotonic()
+        self._last_seen.move_to_end(consumer)
+        if consumer in self._pinged:
+            self._pinged.discard(consumer)
+            self.stats['answered'] += 1
+
+    def unregister(self, consumer):
+        self._last_seen.pop(consumer, None)
+        self._pinged.discard(consumer)
+
+    async def sweep(self):
+        """오래된 연결부터 ping/정리, 정리한 연결 수 반환"""
+        now = time.monotonic()
+        to_ping, to_reap = [], []
+        for consumer, seen in self._last_seen.items():
+            idle = now - seen
+            if idle < self.heartbeat_interval:
+                break
+            if idle >= self.idle_timeout:
+                to_reap.append(consumer)
+            elif consumer not in self._pinged:
+                to_ping.append(consumer)
+        for consumer in to_reap:
+            self.unregister(consumer)
+        self._pinged.update(to_ping)
+        self.stats['sweeps'] += 1
+        self.stats['pings'] += len(to_ping)
+
+        results = await asyncio.gather(
+            *(consumer.ping() for consumer in to_ping),
+            *(consumer.reap() for consumer in to_reap),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            self.stats['errors'] += len(errors)
+            logger.warning(f"하트비트 ping/정리 실패 {len(errors)}건: {errors[0]!r}")
+        if to_reap:
+            self.stats['reaped'] += len(to_reap)
+            logger.info(f"응답 없는 WebSocket 연결 {len(to_reap)}개 정리 (유휴 {self.idle_timeout}초 초과)")
+        return len(to_reap)
+
+    def snapshot(self):
+        return {'connections': len(self._last_seen), 'awaiting_pong': len(self._pinged), **self.stats}
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        # 연결이 하나도 없으면 멈추고 다음 register에서 다시 시작
+        while self._last_seen:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"하트비트 정리 작업 오류: {e!r}")
+
+
+_monitor = None
+
+
+def get_connection_monitor():
+    global _monitor
+    if _monitor is None:
+        _monitor = ConnectionMonitor(
+            settings.CHAT_WS_HEARTBEAT_INTERVAL,
+            settings.CHAT_WS_IDLE_TIMEOUT,
+            settings.CHAT_WS_SWEEP_INTERVAL,
+        )
+    return _monitor
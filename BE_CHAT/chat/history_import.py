@@ -0,0 +1,522 @@
+"""
+이전 채팅 시스템의 대화 기록 일괄 가져오기 (import_chat_history)
+send_message로 한 건씩 넣으면 메시지마다 트랜잭션/순번 UPDATE/이벤트가 생겨서 수백만 건에 며칠이 걸리므로
+JSONL을 줄 단위로 읽어 배치마다 한 트랜잭션에서 대화방 조회/생성 → 순번 예약 → bulk_create
+
+- 입력: 한 줄에 메시지 하나 (.gz도 가능)
+    {"legacy_id": "m-1", "participants": ["u1", "u2"], "sender_id": "u1", "content": "...",
+     "created_at": "2023-05-01T12:00:00+09:00", "message_type": "text", "is_deleted": false,
+     "conversation_type": "user_to_user", "brand_id": null,
+     "receipts": [{"user_id": "u2", "status": "read", "timestamp": "..."}]}
+  legacy_id 외에는 participants/sender_id/created_at만 필수, 시각에 시간대가 없으면 settings.TIME_ZONE
+- 검증: 줄마다 형식/참여자/시각을 확인해서 배치에 넣기 전에 거름 - 잘못된 줄은 건너뛰고 사유별로 세고, --errors 파일에 줄 번호와 함께 기록
+- 대화방: 참여자 쌍을 정렬한 (작은 id, 큰 id)가 기준 - 기존 대화방은 참여자 순서와 상관없이 찾고 새 대화방은 정렬된 순서로 생성
+- 순번: UPDATE last_sequence = last_sequence + n (n이 같은 대화방끼리 한 번에)으로 배치 안의 대화방마다 구간을 예약하고 (created_at, 줄 번호) 순서로 발급
+- 실시간 메시지가 있는 대화방에는 가져오지 않음 (그 대화방의 줄은 conflict로 거절)
+  예약은 last_sequence 뒤에 붙이므로, 가져온 옛 메시지가 실시간 메시지보다 큰 순번을 받아 resume/정렬이 어긋나기 때문
+  → 서비스 전환(cutover) 전에 가져오거나, 이미 대화가 시작된 쌍은 따로 처리해야 함
+  가져오는 동안 실시간 메시지가 들어오면 그 대화방의 나머지 줄도 conflict (배치마다 대화방 행을 잠그고 확인)
+- 중복 방지: client_msg_id = 'import:<legacy_id>' - 다시 실행하거나 체크포인트 이후 배치를 다시 넣어도 이미 있는 메시지는 건너뜀
+- 이벤트/알림/활동 집계/브로드캐스트는 하지 않음 (가져온 기간은 rebuild_activity_rollups로 집계)
+- 병렬: --shards N --shard K로 참여자 쌍 해시가 K인 줄만 처리 → 대화방 하나는 프로세스 하나가 입력 순서대로 처리
+- 이어서 실행: 배치를 커밋할 때마다 다음 줄의 바이트 위치를 체크포인트 파일에 기록
+"""
+
+import collections
+import gzip
+import hashlib
+import json
+import os
+import time
+import zlib
+
+from django.db import router, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .ids import uuid7
+from .models import Conversation, DeliveryReceipt, Message
+
+IMPORT_KEY_PREFIX = 'import:'
+MESSAGE_TYPES = frozenset(value for value, _ in Message.MESSAGE_TYPES)
+RECEIPT_STATUSES = frozenset(value for value, _ in DeliveryReceipt.DELIVERY_STATUS)
+CONVERSATION_TYPES = frozenset(value for value, _ in Conversation._meta.get_field('conversation_type').choices)
+ID_MAX_LENGTH = 255
+
+
+class InvalidRow(Exception):
+    """가져올 수 없는 줄 (사유는 code, 사람이 읽는 설명은 메시지)"""
+
+    def __init__(self, code, detail=''):
+        super().__init__(detail or code)
+        self.code = code
+
+
+def canonical_pair(participants):
+    """참여자 쌍을 정렬한 (participant1_id, participant2_id) - 새 대화방의 참여자 순서이자 조회 키"""
+    first, second = participants
+    return (first, second) if first <= second else (second, first)
+
+
+def shard_of(pair, shards):
+    """참여자 쌍의 샤드 번호 (프로세스가 달라도 같은 값이 나오도록 crc32)"""
+    return zlib.crc32(f'{pair[0]}\0{pair[1]}'.encode()) % shards
+
+
+def import_key(legacy_id):
+    """중복 방지 키 (client_msg_id 64자 제한 - 길면 해시)"""
+    key = f'{IMPORT_KEY_PREFIX}{legacy_id}'
+    if len(key) > 64:
+        key = f'{IMPORT_KEY_PREFIX}{hashlib.sha1(str(legacy_id).encode()).hexdigest()}'
+    return key
+
+
+def _parse_time(value, field):
+    if not isinstance(value, str):
+        raise InvalidRow('time', f'{field}: ISO 시각 문자열이 아님')
+    try:
+        moment = parse_datetime(value)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise InvalidRow('time', f'{field}: {value!r}')
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+def _check_id(value, field):
+    if not isinstance(value, str) or not value or len(value) > ID_MAX_LENGTH:
+        raise InvalidRow('id', f'{field}: 1~{ID_MAX_LENGTH}자 문자열이어야 함')
+    return value
+
+
+class ImportRow:
+    """검증을 통과한 줄 하나"""
+
+    __slots__ = ('line', 'pair', 'sender_id', 'content', 'message_type', 'created_at', 'is_deleted',
+                 'brand_id', 'conversation_type', 'client_msg_id', 'receipts')
+
+    def __init__(self, line, pair, data):
+        self.line = line
+        self.pair = pair
+        sender_id = _check_id(data.get('sender_id'), 'sender_id')
+        if sender_id not in pair:
+            raise InvalidRow('sender', f'sender_id {sender_id!r}가 참여자가 아님')
+        self.sender_id = sender_id
+
+        content = data.get('content', '')
+        if content is None:
+            content = ''
+        if not isinstance(content, str):
+            raise InvalidRow('content', 'content는 문자열이어야 함')
+        self.content = content
+
+        self.message_type = data.get('message_type') or 'text'
+        if self.message_type not in MESSAGE_TYPES:
+            raise InvalidRow('message_type', f'message_type {self.message_type!r}')
+        self.conversation_type = data.get('conversation_type') or 'user_to_user'
+        if self.conversation_type not in CONVERSATION_TYPES:
+            raise InvalidRow('conversation_type', f'conversation_type {self.conversation_type!r}')
+        brand_id = data.get('brand_id')
+        self.brand_id = _check_id(brand_id, 'brand_id') if brand_id is not None else None
+
+        self.created_at = _parse_time(data.get('created_at'), 'created_at')
+        self.is_deleted = bool(data.get('is_deleted', False))
+
+        legacy_id = data.get('legacy_id')
+        if legacy_id is None or legacy_id == '':
+            # id가 없는 내보내기 - 내용으로 만든 키라서 다시 실행해도 같은 키
+            legacy_id = hashlib.sha1(
+                json.dumps([pair, sender_id, data.get('created_at'), content], ensure_ascii=False).encode()
+            ).hexdigest()
+        self.client_msg_id = import_key(legacy_id)
+
+        receipts = data.get('receipts') or []
+        if not isinstance(receipts, list):
+            raise InvalidRow('receipts', 'receipts는 목록이어야 함')
+        self.receipts = {}
+        for receipt in receipts:
+            if not isinstance(receipt, dict):
+                raise InvalidRow('receipts', 'receipt는 객체여야 함')
+            user_id = _check_id(receipt.get('user_id'), 'receipts.user_id')
+            status = receipt.get('status') or 'read'
+            if status not in RECEIPT_STATUSES:
+                raise InvalidRow('receipts', f'receipt status {status!r}')
+            timestamp = _parse_time(receipt['timestamp'], 'receipts.timestamp') if receipt.get('timestamp') else self.created_at
+            # 같은 사용자가 여러 번 있으면 마지막 것 ((message, user_id) 유니크)
+            self.receipts[user_id] = (status, timestamp)
+
+
+def parse_pair(data):
+    """줄에서 참여자 쌍 (샤드 판정은 전체 검증 전에 이것만으로)"""
+    participants = data.get('participants') if isinstance(data, dict) else None
+    if participants is None and isinstance(data, dict):
+        participants = [data.get('participant1_id'), data.get('participant2_id')]
+    if not isinstance(participants, list) or len(participants) != 2:
+        raise InvalidRow('participants', 'participants는 사용자 id 두 개여야 함')
+    pair = canonical_pair([_check_id(value, 'participants') for value in participants])
+    if pair[0] == pair[1]:
+        raise InvalidRow('participants', '참여자 두 명이 같음')
+    return pair
+
+
+class ChatHistoryImporter:
+
+    def __init__(self, path, batch_size=2000, insert_chunk=500, shard=0, shards=1, checkpoint_path=None,
+                 errors_path=None, max_rows=None, progress=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.insert_chunk = insert_chunk
+        self.shard = shard
+        self.shards = shards
+        self.checkpoint_path = checkpoint_path
+        self.errors_path = errors_path
+        self.max_rows = max_rows
+        # 진행 상황 콜백 (management command 출력용), 인자는 snapshot()
+        self.progress = progress
+        self.db = router.db_for_write(Message)
+        # 참여자 쌍 -> 대화방 id (최근에 본 것만)
+        self._conversations = collections.OrderedDict()
+        # 대화방 id -> 이 가져오기가 마지막으로 예약한 순번 (그 뒤로 last_sequence가 바뀌었으면 실시간 메시지가 들어온 것)
+        self._imported_upto = collections.OrderedDict()
+        self._cache_size = 100000
+        self._errors_file = None
+        # 이번 실행의 통계 (max_rows, 처리 속도 기준)와 체크포인트에서 이어받은 이전 실행 통계 (요약/체크포인트용)
+        self.stats = collections.Counter()
+        self.resumed_stats = collections.Counter()
+        self.started = None
+
+    def run(self):
+        """입력 끝까지 가져오면 True, max_rows에서 멈췄으면 False (체크포인트에서 이어서 실행)"""
+        self.started = time.monotonic()
+        checkpoint = self.load_checkpoint()
+        offset, line_number = (checkpoint['offset'], checkpoint['line']) if checkpoint else (0, 0)
+        if checkpoint:
+            self.resumed_stats.update(checkpoint.get('stats', {}))
+        if self.errors_path:
+            self._errors_file = open(self.errors_path, 'a', encoding='utf8')
+        try:
+            with self.open_input() as f:
+                if offset:
+                    f.seek(offset)
+                batch = []
+                while True:
+                    raw = f.readline()
+                    if not raw:
+                        break
+                    offset += len(raw)
+                    line_number += 1
+                    row = self.parse_line(line_number, raw)
+                    if row is not None:
+                        batch.append(row)
+                    if len(batch) >= self.batch_size:
+                        self.import_batch(batch)
+                        batch = []
+                        self.save_checkpoint(offset, line_number)
+                        if self.max_rows and self.stats['lines'] >= self.max_rows:
+                            return False
+                self.import_batch(batch)
+                self.save_checkpoint(offset, line_number)
+        finally:
+            if self._errors_file is not None:
+                self._errors_file.close()
+        self.clear_checkpoint()
+        return True
+
+    def open_input(self):
+        # 바이트 위치로 이어서 읽어야 하므로 바이너리 모드 (gzip은 seek가 앞에서부터 다시 풀어서 느림)
+        if self.path.endswith('.gz'):
+            return gzip.open(self.path, 'rb')
+        return open(self.path, 'rb')
+
+    def parse_line(self, line_number, raw):
+        """샤드에 속한 유효한 줄이면 ImportRow, 아니면 None"""
+        if not raw.strip():
+            return None
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            self.reject(line_number, InvalidRow('json', 'JSON이 아님'), raw)
+            return None
+        try:
+            pair = parse_pair(data)
+        except InvalidRow as e:
+            # 샤드를 정할 수 없는 줄은 0번 샤드만 기록 (여러 프로세스가 같은 오류를 중복 기록하지 않도록)
+            if self.shard == 0:
+                self.reject(line_number, e, raw)
+            return None
+        if self.shards > 1 and shard_of(pair, self.shards) != self.shard:
+            return None
+        self.stats['lines'] += 1
+        try:
+            return ImportRow(line_number, pair, data)
+        except InvalidRow as e:
+            self.reject(line_number, e, raw)
+            return None
+
+    def reject(self, line_number, error, raw=None):
+        self.stats['invalid'] += 1
+        self.stats[f'invalid_{error.code}'] += 1
+        if self._errors_file is not None:
+            record = {'line': line_number, 'error': error.code, 'detail': str(error)}
+            if raw is not None:
+                record['row'] = raw.decode('utf8', errors='replace').rstrip('\n')
+            self._errors_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def import_batch(self, rows):
+        if not rows:
+            return
+        started = time.monotonic()
+        with transaction.atomic(using=self.db):
+            conversation_ids = self.resolve_conversations(rows)
+            rows = self.skip_existing(rows, conversation_ids)
+            live = self.live_conversations(list(set(conversation_ids.values())))
+            by_conversation = collections.defaultdict(list)
+            for row in rows:
+                conversation_id = conversation_ids[row.pair]
+                if conversation_id in live:
+                    self.reject(row.line, InvalidRow('conflict', f'실시간 메시지가 있는 대화방 {conversation_id}'))
+                    continue
+                by_conversation[conversation_id].append(row)
+            sequences = self.reserve_sequences(by_conversation)
+            for conversation_id, last_sequence in sequences.items():
+                self._imported_upto[conversation_id] = last_sequence
+                self._imported_upto.move_to_end(conversation_id)
+            while len(self._imported_upto) > self._cache_size:
+                self._imported_upto.popitem(last=False)
+
+            messages, receipts = [], []
+            for conversation_id, conversation_rows in by_conversation.items():
+                conversation_rows.sort(key=lambda row: (row.created_at, row.line))
+                first = sequences[conversation_id] - len(conversation_rows) + 1
+                for sequence, row in enumerate(conversation_rows, start=first):
+                    message_id = uuid7()
+                    messages.append(Message(
+                        id=message_id,
+                        conversation_id=conversation_id,
+                        sender_id=row.sender_id,
+                        content=row.content,
+                        message_type=row.message_type,
+                        created_at=row.created_at,
+                        is_deleted=row.is_deleted,
+                        brand_id=row.brand_id,
+                        sequence_number=sequence,
+                        client_msg_id=row.client_msg_id,
+                    ))
+                    receipts.extend(
+                        DeliveryReceipt(message_id=message_id, user_id=user_id, status=status, timestamp=timestamp)
+                        for user_id, (status, timestamp) in row.receipts.items()
+                    )
+            Message.objects.using(self.db).bulk_create(messages, batch_size=self.insert_chunk)
+            DeliveryReceipt.objects.using(self.db).bulk_create(receipts, batch_size=self.insert_chunk)
+            self.widen_conversation_times(list(by_conversation))
+        self.stats['messages'] += len(messages)
+        self.stats['receipts'] += len(receipts)
+        self.stats['batches'] += 1
+        self.stats['batch_seconds'] += time.monotonic() - started
+        if self.progress and self.stats['batches'] % 10 == 0:
+            self.progress(self.snapshot())
+
+    def resolve_conversations(self, rows):
+        """배치의 참여자 쌍 -> 대화방 id (없으면 정렬된 순서로 생성)"""
+        result = {}
+        missing = {}
+        first_at = {}
+        for row in rows:
+            if row.pair not in first_at or row.created_at < first_at[row.pair]:
+                first_at[row.pair] = row.created_at
+            if row.pair in result or row.pair in missing:
+                continue
+            conversation_id = self._conversations.get(row.pair)
+            if conversation_id is not None:
+                self._conversations.move_to_end(row.pair)
+                result[row.pair] = conversation_id
+            else:
+                # 새로 만들 때의 유형/브랜드/생성 시각은 그 쌍의 첫 줄 기준
+                missing[row.pair] = row
+        if missing:
+            found = self.find_conversations(list(missing))
+            created = [
+                Conversation(
+                    id=uuid7(),
+                    participant1_id=pair[0],
+                    participant2_id=pair[1],
+                    conversation_type=row.conversation_type,
+                    brand_id=row.brand_id,
+                    created_at=first_at[pair],
+                )
+                for pair, row in missing.items() if pair not in found
+            ]
+            if created:
+                # 같은 쌍을 서비스(create_conversation)가 동시에 만들었으면 그쪽 대화방 사용
+                Conversation.objects.using(self.db).bulk_create(
+                    created, batch_size=self.insert_chunk, ignore_conflicts=True
+                )
+                found.update(self.find_conversations([(c.participant1_id, c.participant2_id) for c in created]))
+                ours = [c.id for c in created if found.get((c.participant1_id, c.participant2_id)) == c.id]
+                # 대화방 목록 정렬(updated_at)이 가져오기 시각이 아니라 마지막 메시지 기준이 되도록 (메시지를 넣은 뒤 widen_conversation_times에서 올림)
+                Conversation.objects.using(self.db).filter(id__in=ours).update(updated_at=F('created_at'))
+                self.stats['conversations_created'] += len(ours)
+            for pair in missing:
+                if pair not in found:
+                    raise RuntimeError(f'대화방을 만들지 못함: {pair}')
+                result[pair] = found[pair]
+                self._remember(pair, found[pair])
+        return result
+
+    def find_conversations(self, pairs):
+        """참여자 순서와 상관없이 기존 대화방 찾기 {정렬된 쌍: 대화방 id}"""
+        partners = collections.defaultdict(set)
+        for first, second in pairs:
+            partners[first].add(second)
+            partners[second].add(first)
+        found = {}
+        users = list(partners)
+        for start in range(0, len(users), 200):
+            # 사용자마다 participant1_id = 사용자 AND participant2_id IN (상대들) - (participant1_id, participant2_id) 유니크 인덱스 범위
+            # 두 방향 모두 이 사용자 목록 안에 있으므로 participant1_id 쪽만 보면 됨
+            condition = Q(*(
+                Q(participant1_id=user_id, participant2_id__in=partners[user_id])
+                for user_id in users[start:start + 200]
+            ), _connector=Q.OR)
+            candidates = Conversation.objects.using(self.db).filter(condition).values_list(
+                'participant1_id', 'participant2_id', 'id'
+            )
+            for participant1_id, participant2_id, conversation_id in candidates:
+                found.setdefault(canonical_pair((participant1_id, participant2_id)), conversation_id)
+        return found
+
+    def _remember(self, pair, conversation_id):
+        self._conversations[pair] = conversation_id
+        while len(self._conversations) > self._cache_size:
+            self._conversations.popitem(last=False)
+
+    def skip_existing(self, rows, conversation_ids):
+        """이미 가져온 메시지(같은 대화방/보낸 사람/client_msg_id)와 배치 안의 중복 줄 제외"""
+        existing = set()
+        keys = list({row.client_msg_id for row in rows})
+        conversations = list(set(conversation_ids.values()))
+        for start in range(0, len(keys), self.insert_chunk):
+            existing.update(
+                Message.objects.using(self.db).filter(
+                    conversation_id__in=conversations, client_msg_id__in=keys[start:start + self.insert_chunk]
+                ).values_list('conversation_id', 'sender_id', 'client_msg_id')
+            )
+        result = []
+        for row in rows:
+            key = (conversation_ids[row.pair], row.sender_id, row.client_msg_id)
+            if key in existing:
+                self.stats['duplicates'] += 1
+                continue
+            existing.add(key)
+            result.append(row)
+        return result
+
+    def live_conversations(self, conversation_ids):
+        """
+        실시간(가져오기가 아닌) 메시지가 있는 대화방 id 집합
+        대화방 행을 잠가서 확인부터 커밋까지 실시간 전송(create_sequenced의 순번 UPDATE)이 끼어들지 못하게 함
+        - 이 가져오기가 순번을 예약한 대화방: last_sequence가 그때 그대로인지만 확인 (메시지 조회 없음)
+        - 처음 보는 대화방: last_sequence가 0이면 빈 대화방, 아니면 가져오기 키가 아닌 메시지가 있는지 조회
+        """
+        live = set()
+        unknown = []
+        for start in range(0, len(conversation_ids), self.insert_chunk):
+            current = Conversation.objects.using(self.db).select_for_update().filter(
+                id__in=conversation_ids[start:start + self.insert_chunk]
+            ).values_list('id', 'last_sequence')
+            for conversation_id, last_sequence in current:
+                imported_upto = self._imported_upto.get(conversation_id)
+                if imported_upto is not None:
+                    if last_sequence != imported_upto:
+                        live.add(conversation_id)
+                elif last_sequence:
+                    unknown.append(conversation_id)
+        for start in range(0, len(unknown), self.insert_chunk):
+            live.update(
+                Message.objects.using(self.db).filter(conversation_id__in=unknown[start:start + self.insert_chunk])
+                .exclude(client_msg_id__startswith=IMPORT_KEY_PREFIX)
+                .values_list('conversation_id', flat=True).distinct()
+            )
+        return live
+
+    def reserve_sequences(self, by_conversation):
+        """
+        대화방마다 메시지 수만큼 순번 구간 예약, {대화방 id: 예약한 마지막 순번}
+        가져오는 메시지 수가 같은 대화방끼리 묶어서 UPDATE (대화방마다 한 번씩 하지 않음)
+        """
+        by_count = collections.defaultdict(list)
+        for conversation_id, conversation_rows in by_conversation.items():
+            by_count[len(conversation_rows)].append(conversation_id)
+        for count, ids in by_count.items():
+            for start in range(0, len(ids), self.insert_chunk):
+                Conversation.objects.using(self.db).filter(id__in=ids[start:start + self.insert_chunk]).update(
+                    last_sequence=F('last_sequence') + count
+                )
+        sequences = {}
+        ids = list(by_conversation)
+        for start in range(0, len(ids), self.insert_chunk):
+            sequences.update(
+                Conversation.objects.using(self.db).filter(id__in=ids[start:start + self.insert_chunk])
+                .values_list('id', 'last_sequence')
+            )
+        return sequences
+
+    def widen_conversation_times(self, conversation_ids):
+        """대화방 created_at/updated_at을 가져온 메시지의 처음/마지막 시각까지 넓힘 ((conversation, created_at) 인덱스로 조회)"""
+        messages = Message.objects.using(self.db).filter(conversation=OuterRef('pk'))
+        for start in range(0, len(conversation_ids), self.insert_chunk):
+            Conversation.objects.using(self.db).filter(
+                id__in=conversation_ids[start:start + self.insert_chunk]
+            ).update(
+                created_at=Least(F('created_at'), Subquery(messages.order_by('created_at').values('created_at')[:1])),
+                updated_at=Greatest(F('updated_at'), Subquery(messages.order_by('-created_at').values('created_at')[:1])),
+            )
+
+    def total_stats(self):
+        """이전 실행(체크포인트) + 이번 실행"""
+        total = self.resumed_stats.copy()
+        total.update(self.stats)
+        return total
+
+    def snapshot(self):
+        """누적 통계 + 이번 실행의 메시지 수/경과 시간/처리 속도"""
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return {
+            **self.total_stats(),
+            'run_messages': self.stats['messages'],
+            'elapsed': round(elapsed, 2),
+            'messages_per_sec': round(self.stats['messages'] / elapsed, 1) if elapsed else 0,
+        }
+
+    # 체크포인트 - 배치를 커밋할 때마다 다음에 읽을 바이트 위치 기록
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if (checkpoint.get('input'), checkpoint.get('shard'), checkpoint.get('shards')) != (
+            os.path.abspath(self.path), self.shard, self.shards
+        ):
+            raise ValueError(
+                f"체크포인트({self.checkpoint_path})가 다른 입력/샤드용: {checkpoint.get('input')} "
+                f"{checkpoint.get('shard')}/{checkpoint.get('shards')}"
+            )
+        return checkpoint
+
+    def save_checkpoint(self, offset, line_number):
+        if not self.checkpoint_path:
+            return
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({
+                'input': os.path.abspath(self.path), 'shard': self.shard, 'shards': self.shards,
+                'offset': offset, 'line': line_number,
+                'stats': {key: value for key, value in self.total_stats().items() if key != 'batch_seconds'},
+            }, f)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
@@ -0,0 +1,68 @@
+"""
+client_msg_id 기반 중복 전송 방지
+모바일 클라이언트는 네트워크가 끊기면 같은 chat_message를 다시 보냄
+- 최근에 저장한 (대화방, 보낸 사람, client_msg_id) -> ack 정보를 잠깐 메모리에 보관해서 재전송은 DB 없이 바로 ack
+- 다른 노드로 재접속해서 보낸 경우 등 캐시에 없으면 DB 유니크 제약(uniq_message_client_msg_id)이 최종 보장
+"""
+
+import collections
+import threading
+import time
+
+from django.conf import settings
+from rest_framework import serializers
+
+
+class RecentSends:
+    """TTL + 최대 개수 제한이 있는 최근 전송 캐시"""
+
+    def __init__(self, ttl=300, max_entries=50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 키 -> (저장 시각, ack 정보)
+        self._entries = collections.OrderedDict()
+
+    @staticmethod
+    def key(conversation_id, sender_id, client_msg_id):
+        return f'{conversation_id}:{sender_id}:{client_msg_id}'
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key, ack):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), ack)
+            self._entries.move_to_end(key)
+            # 오래된 것부터 정리 (삽입 순서 = 시간 순서)
+            cutoff = time.monotonic() - self.ttl
+            while self._entries and (
+                len(self._entries) > self.max_entries or next(iter(self._entries.values()))[0] < cutoff
+            ):
+                self._entries.popitem(last=False)
+
+
+_recent_sends = None
+
+
+def get_recent_sends():
+    global _recent_sends
+    if _recent_sends is None:
+        _recent_sends = RecentSends(settings.CHAT_DEDUPE_TTL, settings.CHAT_DEDUPE_MAX_ENTRIES)
+    return _recent_sends
+
+
+def ack_payload(message):
+    """ack 프레임에 담을 서버 id/순번"""
+    return {
+        'message_id': str(message.id),
+        'sequence_number': message.sequence_number,
+        'created_at': serializers.DateTimeField().to_representation(message.created_at),  # 메시지 직렬화와 같은 형식
+    }
@@ -0,0 +1,61 @@
+"""
+시간 순서 UUID (UUIDv7, RFC 9562)
+uuid4는 완전히 랜덤이라 InnoDB(기본키 순서로 행을 저장)에서 insert가 B-tree 전체에 흩어짐
+→ 페이지 분할과 버퍼 풀 교체가 늘어남. UUIDv7은 앞 48비트가 밀리초 시각이라 새 행이 항상 끝에 붙음
+
+구성: unix_ts_ms(48) | ver=7(4) | counter(12) | var=10(2) | random(62)
+- 같은 밀리초 안에서는 12비트 카운터를 올려서 한 프로세스 안의 순서를 보장 (RFC 9562 6.2 방법 1)
+- 카운터가 넘치거나 시계가 뒤로 가면 마지막 시각을 1ms 앞으로 밀어서 계속 증가
+- MySQL에서 UUIDField는 32자리 hex 문자열(char(32))로 저장되므로 문자열 순서 = 시각 순서
+
+기존 uuid4 id는 그대로 유효 (컬럼 타입 변경 없음, 새 행의 기본값만 바뀜)
+단, uuid4 행은 시각 순서가 아니므로 정렬은 (created_at, id) 순서를 사용하고 id는 같은 시각의 순서를 정하는 데만 씀
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+_COUNTER_MAX = 0xFFF
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7():
+    """새 UUIDv7 (모델 id 기본값)"""
+    global _last_ms, _counter
+    random_bits = int.from_bytes(os.urandom(8), 'big') & ((1 << 62) - 1)
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # 카운터 시작값을 랜덤하게 (위쪽 절반은 남겨서 같은 밀리초에 여러 개 만들 여유)
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                _last_ms += 1
+                _counter = 0
+        timestamp_ms, counter = _last_ms, _counter
+    value = (timestamp_ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | random_bits
+    return uuid.UUID(int=value)
+
+
+def uuid7_time(value):
+    """UUIDv7에 들어 있는 생성 시각 (UTC datetime), v7이 아니면 None"""
+    value = value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    if value.version != 7:
+        return None
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
+
+
+def uuid7_lower_bound(moment):
+    """
+    moment 이후에 만든 UUIDv7은 모두 이 값 이상 (보관/정리 작업에서 기본키 범위로 자를 때)
+    uuid4 행에는 의미가 없으므로 v7으로 만든 행에만 사용
+    """
+    timestamp_ms = int(moment.timestamp() * 1000)
+    return uuid.UUID(int=(timestamp_ms << 80) | (0x7 << 76) | (0b10 << 62))
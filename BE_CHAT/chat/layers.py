@@ -0,0 +1,451 @@
+"""
+여러 Redis 노드에 샤딩하는 채널 레이어
+channels_redis 기본 샤딩은 crc32 % 노드 수라서 노드를 하나만 추가해도 거의 모든 그룹이 이동함
+가상 노드를 둔 consistent hash ring으로 바꿔서 노드 추가/제거 시 1/N 정도만 이동하게 함
+
+리샤딩 절차 (무중단)
+1. hosts=새 노드 목록, previous_hosts=기존 노드 목록으로 배포
+   - group_add는 새/기존 소유 노드 양쪽에 기록, group_send는 양쪽 멤버를 합쳐서 전송
+   - 아직 예전 설정으로 떠 있는 프로세스도 기존 노드에서 멤버를 그대로 볼 수 있음
+2. python manage.py reshard_channel_groups 로 기존 그룹 멤버십을 새 소유 노드로 복사
+3. 모든 프로세스가 새 설정으로 뜬 뒤 previous_hosts 제거 후 재배포
+"""
+
+import asyncio
+import bisect
+import collections
+import hashlib
+import itertools
+import logging
+import time
+import uuid
+
+from channels_redis.core import RedisChannelLayer
+from channels_redis.utils import decode_hosts
+
+logger = logging.getLogger(__name__)
+
+# group_send에서 채널별 큐에 메시지를 넣는 Lua 스크립트 (channels_redis와 동일한 동작)
+GROUP_SEND_LUA = """
+    local over_capacity = 0
+    local current_time = ARGV[#ARGV - 1]
+    local expiry = ARGV[#ARGV]
+    for i=1,#KEYS do
+        if redis.call('ZCOUNT', KEYS[i], '-inf', '+inf') < tonumber(ARGV[i + #KEYS]) then
+            redis.call('ZADD', KEYS[i], current_time, ARGV[i])
+            redis.call('EXPIRE', KEYS[i], expiry)
+        else
+            over_capacity = over_capacity + 1
+        end
+    end
+    return over_capacity
+"""
+
+
+def _host_key(host):
+    """노드 식별자 - 목록 순서가 바뀌어도 같은 노드는 같은 위치에 오도록 주소 기준"""
+    if 'address' in host:
+        return str(host['address'])
+    if 'sentinels' in host:
+        return f"sentinel:{host.get('master_name')}"
+    return f"{host.get('host')}:{host.get('port')}"
+
+
+def _hash(value):
+    if isinstance(value, str):
+        value = value.encode('utf8')
+    return int.from_bytes(hashlib.md5(value).digest()[:8], 'big')
+
+
+class HashRing:
+    """가상 노드 기반 consistent hash ring (값 -> 노드 인덱스)"""
+
+    def __init__(self, nodes, virtual_nodes=160):
+        # nodes: [(노드 인덱스, 노드 식별자)]
+        points = sorted(
+            (_hash(f'{key}#{replica}'), index)
+            for index, key in nodes
+            for replica in range(virtual_nodes)
+        )
+        self._points = [point for point, _ in points]
+        self._indexes = [index for _, index in points]
+        self._single = self._indexes[0] if len({index for _, index in nodes}) == 1 else None
+
+    def get(self, value):
+        if self._single is not None:
+            return self._single
+        position = bisect.bisect(self._points, _hash(value)) % len(self._points)
+        return self._indexes[position]
+
+
+class ShardedRedisChannelLayer(RedisChannelLayer):
+    """consistent hash 샤딩 + 리샤딩 중 이중 기록/이중 조회를 지원하는 Redis 채널 레이어"""
+
+    def __init__(self, hosts=None, previous_hosts=None, virtual_nodes=160, **kwargs):
+        super().__init__(hosts=hosts, **kwargs)
+        current = list(self.hosts)
+        previous = decode_hosts(previous_hosts) if previous_hosts else []
+
+        # 리샤딩 중 빠지는 노드도 연결은 해야 하므로 전체 노드 목록 뒤에 붙임
+        keys = [_host_key(host) for host in current]
+        for host in previous:
+            if _host_key(host) not in keys:
+                keys.append(_host_key(host))
+                self.hosts.append(host)
+        self.ring_size = len(self.hosts)
+
+        self._ring = HashRing(list(enumerate(keys[:len(current)])), virtual_nodes)
+        self._previous_ring = None
+        if previous:
+            self._previous_ring = HashRing(
+                [(keys.index(_host_key(host)), _host_key(host)) for host in previous],
+                virtual_nodes,
+            )
+        # 일반(비 프로세스 로컬) 채널은 현재 노드들만 순환 사용
+        self._receive_index_generator = itertools.cycle(range(len(current)))
+        self._send_index_generator = itertools.cycle(range(len(current)))
+        if self._previous_ring is not None:
+            self.client_prefix = self._stable_client_prefix()
+        # 프로세스 로컬 채널('!' 포함) 수신 - 채널별 asyncio.Queue(비어 있어도 deque 4개 + Event, 약 3KB) 대신
+        # 기다리는 receive의 future 튜플과, 가져가지 않은 메시지가 있을 때만 만드는 deque로 관리
+        self._receivers = {}
+        self.receive_buffer = {}
+        # 공용 채널(specific.{client_prefix}!)을 Redis에서 읽어서 로컬 채널로 나눠주는 작업 (공용 채널 이름 -> Task)
+        self._readers = {}
+
+    def consistent_hash(self, value):
+        # 프로세스 로컬 채널은 공용 채널(specific.{client_prefix}!)과 같은 노드로
+        # (channels_redis send()는 전체 채널 이름으로 노드를 골라서 노드가 여러 개면 리더가 못 읽음)
+        if '!' in value:
+            value = self.non_local_name(value)
+        return self._ring.get(value)
+
+    @property
+    def previous_node_indexes(self):
+        """리샤딩 전 노드들의 인덱스 (리샤딩 중이 아니면 빈 목록)"""
+        if self._previous_ring is None:
+            return []
+        return sorted(set(self._previous_ring._indexes))
+
+    def _previous_owner(self, group):
+        """리샤딩 중이고 그룹의 기존 소유 노드가 바뀌었으면 그 인덱스, 아니면 None"""
+        if self._previous_ring is None:
+            return None
+        previous = self._previous_ring.get(group)
+        return None if previous == self.consistent_hash(group) else previous
+
+    def _stable_client_prefix(self):
+        """
+        프로세스 로컬 채널 키가 새/기존 ring 모두에서 같은 노드로 가도록 client_prefix 선택
+        아직 예전 설정으로 떠 있는 프로세스가 보내는 메시지도 이 프로세스가 받을 수 있음
+        """
+        for _ in range(1000):
+            prefix = uuid.uuid4().hex
+            channel_key = f'specific.{prefix}!'
+            if self._ring.get(channel_key) == self._previous_ring.get(channel_key):
+                return prefix
+        logger.warning("새/기존 Redis 노드가 겹치지 않아 리샤딩 중 일부 메시지가 유실될 수 있음")
+        return uuid.uuid4().hex
+
+    ### 프로세스 로컬 채널 수신 ###
+
+    async def receive(self, channel):
+        """
+        로컬 채널은 공용 채널 리더 하나가 Redis에서 읽어서 채널별로 나눠줌
+        기본 구현은 기다리는 채널마다 asyncio.Queue + 작업 2개(수신 락, 큐 get)를 두므로
+        유휴 연결이 많으면 연결당 7~8KB가 됨 → 여기서는 대기 future 하나 (메시지가 쌓일 때만 deque)
+        """
+        if '!' not in channel:
+            return await super().receive(channel)
+        assert self.require_valid_channel_name(channel)
+        real_channel = self.non_local_name(channel)
+        assert real_channel.endswith(self.client_prefix + '!'), 'Wrong client prefix'
+
+        buffered = self.receive_buffer.get(channel)
+        if buffered:
+            message = buffered.popleft()
+            if not buffered:
+                del self.receive_buffer[channel]
+            return message
+
+        loop = asyncio.get_running_loop()
+        if self.receive_event_loop is not None and self.receive_event_loop is not loop:
+            raise RuntimeError("Two event loops are trying to receive() on one channel layer at once!")
+        self.receive_event_loop = loop
+        waiter = loop.create_future()
+        self._receivers[channel] = self._receivers.get(channel, ()) + (waiter,)
+        reader = self._readers.get(real_channel)
+        if reader is None or reader.done():
+            self._readers[real_channel] = loop.create_task(self._read_local_channels(real_channel))
+        try:
+            return await waiter
+        except asyncio.CancelledError:
+            # consumer 종료 - 남은 메시지도 버림 (channels_redis 기본 구현과 같음)
+            self.receive_buffer.pop(channel, None)
+            self._forget_receiver(channel, waiter)
+            raise
+
+    def _deliver(self, channel, message):
+        """기다리는 receive가 있으면 바로 넘기고, 없으면 버퍼에 쌓음"""
+        receivers = self._receivers.pop(channel, ())
+        for index, waiter in enumerate(receivers):
+            if not waiter.done():
+                if index + 1 < len(receivers):
+                    self._receivers[channel] = receivers[index + 1:]
+                waiter.set_result(message)
+                return
+        self._buffer(channel, message)
+
+    def _buffer(self, channel, message):
+        buffered = self.receive_buffer.get(channel)
+        if buffered is None:
+            # 용량을 넘으면 오래된 메시지부터 버림 (channels_redis BoundedQueue와 같은 동작)
+            buffered = self.receive_buffer[channel] = collections.deque(maxlen=self.capacity)
+        buffered.append(message)
+
+    def _forget_receiver(self, channel, waiter):
+        """취소된 receive 정리 - 기다리는 receive가 하나도 없으면 리더도 멈춤 (다음 receive에서 다시 시작)"""
+        remaining = tuple(other for other in self._receivers.pop(channel, ()) if other is not waiter)
+        if remaining:
+            self._receivers[channel] = remaining
+        if not self._receivers:
+            self._stop_readers()
+
+    def _stop_readers(self):
+        for reader in self._readers.values():
+            reader.cancel()
+        self._readers.clear()
+        self.receive_event_loop = None
+
+    async def _read_local_channels(self, real_channel):
+        """공용 채널에서 메시지를 하나씩 꺼내서 (그룹 전송이면 여러) 로컬 채널로 전달"""
+        while True:
+            try:
+                # 취소돼도 메시지는 Redis 백업 큐에 남음 (channels_redis receive_single)
+                message_channel, message = await self.receive_single(real_channel)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis 장애 - 연결들은 기다리게 두고 잠시 뒤 다시 읽음
+                logger.warning(f"로컬 채널 수신 실패, 1초 후 재시도: {e!r}")
+                await asyncio.sleep(1)
+                continue
+            if isinstance(message_channel, list):
+                for channel in message_channel:
+                    self._deliver(channel, message)
+            else:
+                self._deliver(message_channel, message)
+
+    async def close_pools(self):
+        self._stop_readers()
+        await super().close_pools()
+
+    ### Groups extension ###
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        previous = self._previous_owner(group)
+        if previous is not None:
+            # 예전 설정의 프로세스도 이 멤버를 볼 수 있도록 기존 노드에도 기록
+            connection = self.connection(previous)
+            group_key = self._group_key(group)
+            await connection.zadd(group_key, {channel: time.time()})
+            await connection.expire(group_key, self.group_expiry)
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        previous = self._previous_owner(group)
+        if previous is not None:
+            await self.connection(previous).zrem(self._group_key(group), channel)
+
+    async def group_send(self, group, message):
+        assert self.require_valid_group_name(group), "Group name not valid"
+        channel_names = await self.group_channels(group)
+        await self.send_to_channels(group, channel_names, message)
+
+    async def group_channels(self, group):
+        """그룹 멤버 채널 목록 (리샤딩 중이면 새/기존 노드의 멤버를 합침)"""
+        key = self._group_key(group)
+        indexes = [self.consistent_hash(group)]
+        previous = self._previous_owner(group)
+        if previous is not None:
+            indexes.append(previous)
+
+        async def members(index):
+            connection = self.connection(index)
+            # group_expiry가 지난 멤버 정리
+            await connection.zremrangebyscore(key, min=0, max=int(time.time()) - self.group_expiry)
+            return await connection.zrange(key, 0, -1)
+
+        results = await asyncio.gather(*(members(index) for index in indexes))
+        return list(dict.fromkeys(x.decode('utf8') for result in results for x in result))
+
+    async def send_to_channels(self, group, channel_names, message):
+        """채널 목록에 메시지 전송 - 노드별로 Lua 스크립트 1번씩 병렬 실행"""
+        if not channel_names:
+            return
+        (
+            connection_to_channel_keys,
+            channel_keys_to_message,
+            channel_keys_to_capacity,
+        ) = self._map_channel_keys_to_connection(channel_names, message)
+
+        async def send_shard(connection_index, channel_redis_keys):
+            connection = self.connection(connection_index)
+            now = time.time()
+            pipe = connection.pipeline()
+            for key in channel_redis_keys:
+                pipe.zremrangebyscore(key, min=0, max=int(now) - int(self.expiry))
+            await pipe.execute()
+            args = [channel_keys_to_message[key] for key in channel_redis_keys]
+            args += [channel_keys_to_capacity[key] for key in channel_redis_keys]
+            args += [now, self.expiry]
+            return await connection.eval(
+                GROUP_SEND_LUA, len(channel_redis_keys), *channel_redis_keys, *args
+            )
+
+        results = await asyncio.gather(*(
+            send_shard(index, keys) for index, keys in connection_to_channel_keys.items()
+        ))
+        over_capacity = sum(results)
+        if over_capacity > 0:
+            logger.info(
+                "%s of %s channels over capacity in group %s",
+                over_capacity, len(channel_names), group,
+            )
+
+
+class LocalFanoutChannelLayer(ShardedRedisChannelLayer):
+    """
+    같은 프로세스에 붙어 있는 그룹 멤버에게는 Redis를 거치지 않고 바로 전달하는 채널 레이어
+    (멀티 디바이스 사용자, sticky 라우팅된 대화방처럼 양쪽이 같은 워커에 있는 경우가 많음)
+
+    - 이 프로세스의 채널을 group_add하면 프로세스 내 레지스트리에도 기록
+    - group_send는 로컬 멤버에게 먼저 직접 넘기고 (기다리는 receive 또는 수신 버퍼),
+      나머지(다른 노드) 멤버에게만 Redis로 한 번 보냄
+    - 그룹마다 다른 프로세스 멤버가 있는지 플래그로 기억해서, 없으면 Redis 멤버 조회도 건너뜀
+      - 그룹에 처음 로컬 멤버가 생길 때 한 번 조회해서 플래그를 정하고,
+        이미 멤버가 있던 다른 프로세스들에게 공용 채널로 가입 알림을 보냄 (받은 쪽은 플래그를 켬)
+      - 플래그가 켜져 있거나 알림을 읽는 리더(receive)가 멈춰 있으면 매번 조회하고,
+        조회 결과 다른 프로세스 멤버가 없으면 다시 끔
+      - 알림이 도착하기 전(가입 직후 Redis 왕복 1번 정도)에 보낸 메시지는 새 멤버가 못 받을 수 있음
+        (group_add와 동시에 보낸 메시지와 같은 취급)
+    """
+
+    # 프로세스 간 멤버십 알림을 받는 로컬 채널 이름 (specific.{client_prefix}!{이름})
+    membership_channel = 'layer.membership'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # 그룹 -> {이 프로세스의 채널: group_add 시각}
+        self._local_groups = {}
+        # 로컬 멤버가 있는 그룹 -> 다른 프로세스(또는 프로세스 로컬이 아닌) 멤버가 있을 수 있는지
+        self._remote_members = {}
+        # 로컬 채널의 receive가 기다리는 이벤트 루프
+        self._local_loop = None
+        self.stats = {
+            'local_deliveries': 0, 'remote_sends': 0, 'redis_skipped': 0,
+            'member_lookups': 0, 'lookups_skipped': 0, 'membership_notices': 0,
+        }
+
+    def _is_local(self, channel):
+        return '!' in channel and self.non_local_name(channel) == f'specific.{self.client_prefix}!'
+
+    async def group_add(self, group, channel):
+        # 다른 노드에서도 보낼 수 있도록 Redis 멤버십은 그대로 유지
+        await super().group_add(group, channel)
+        if not self._is_local(channel):
+            return
+        first_local = group not in self._local_groups
+        self._local_groups.setdefault(group, {})[channel] = time.time()
+        self._local_loop = asyncio.get_running_loop()
+        if first_local:
+            remote_channels = await self._remote_channels(group, ())
+            self._remote_members[group] = bool(remote_channels)
+            await self._notify_members(group, remote_channels)
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        members = self._local_groups.get(group)
+        if members is not None:
+            members.pop(channel, None)
+            if not members:
+                del self._local_groups[group]
+                self._remote_members.pop(group, None)
+
+    async def group_send(self, group, message):
+        assert self.require_valid_group_name(group), "Group name not valid"
+        local_channels = self._local_members(group)
+        # 로컬 멤버에게 먼저 전달 (Redis 왕복 없음)
+        loop = self._local_loop
+        if local_channels and loop is not None and loop is not asyncio.get_running_loop():
+            # 다른 스레드(async_to_sync로 호출한 백그라운드 작업 등)에서 보낸 경우 큐가 속한 루프에서 넣음
+            loop.call_soon_threadsafe(self._deliver_local, local_channels, message)
+        else:
+            self._deliver_local(local_channels, message)
+        self.stats['local_deliveries'] += len(local_channels)
+
+        if local_channels and not self._remote_members.get(group, True) and self._reading():
+            # 다른 프로세스 멤버 없음 - Redis 호출 없이 끝
+            self.stats['lookups_skipped'] += 1
+            self.stats['redis_skipped'] += 1
+            return
+
+        remote_channels = await self._remote_channels(group, local_channels)
+        if group in self._local_groups:
+            self._remote_members[group] = bool(remote_channels)
+        if remote_channels:
+            self.stats['remote_sends'] += 1
+            await self.send_to_channels(group, remote_channels, message)
+        else:
+            self.stats['redis_skipped'] += 1
+
+    def _reading(self):
+        """가입 알림을 받을 공용 채널 리더가 돌고 있는지 (안 돌면 플래그를 믿을 수 없음)"""
+        reader = self._readers.get(f'specific.{self.client_prefix}!')
+        return reader is not None and not reader.done()
+
+    async def _remote_channels(self, group, local_channels):
+        """Redis에 기록된 그룹 멤버 중 이 프로세스 밖의 채널"""
+        self.stats['member_lookups'] += 1
+        return [
+            channel for channel in await self.group_channels(group)
+            if channel not in local_channels and not self._is_local(channel)
+        ]
+
+    async def _notify_members(self, group, remote_channels):
+        """이미 이 그룹 멤버가 있는 다른 프로세스들에게 이 프로세스가 가입했다고 알림"""
+        prefixes = {
+            self.non_local_name(channel) for channel in remote_channels if '!' in channel
+        }
+        for prefix in prefixes:
+            try:
+                await self.send(prefix + self.membership_channel, {'type': 'layer.member_joined', 'group': group})
+            except Exception as e:
+                # 알림 실패 - 상대 프로세스는 다음 조회 전까지 이 프로세스 멤버를 모를 수 있음
+                logger.warning(f"그룹 가입 알림 실패: group={group}, {e!r}")
+                continue
+            self.stats['membership_notices'] += 1
+
+    def _deliver(self, channel, message):
+        if channel.endswith('!' + self.membership_channel):
+            # 다른 프로세스가 이 프로세스의 그룹에 가입 - 다음 group_send부터 Redis로도 보냄
+            if message.get('group') in self._remote_members:
+                self._remote_members[message['group']] = True
+            return
+        super()._deliver(channel, message)
+
+    def _deliver_local(self, channels, message):
+        for channel in channels:
+            self._deliver(channel, dict(message))
+
+    def _local_members(self, group):
+        members = self._local_groups.get(group)
+        if not members:
+            return ()
+        # Redis와 같은 기준으로 group_expiry가 지난 멤버 정리
+        cutoff = time.time() - self.group_expiry
+        expired = [channel for channel, added_at in members.items() if added_at < cutoff]
+        for channel in expired:
+            del members[channel]
+        return tuple(members)
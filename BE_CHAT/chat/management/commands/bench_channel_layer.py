@@ -0,0 +1,113 @@
+"""
+샤딩된 채널 레이어의 group_send 처리량 벤치마크
+노드 수를 1개부터 늘려가며 같은 부하를 보내서 처리량이 노드 수에 따라 늘어나는지 확인
+
+로컬 예시 (Redis 3개 띄우기):
+    redis-server --port 6380 --save '' &
+    redis-server --port 6381 --save '' &
+    redis-server --port 6382 --save '' &
+    python manage.py bench_channel_layer --hosts redis://127.0.0.1:6380,redis://127.0.0.1:6381,redis://127.0.0.1:6382
+
+클라이언트 프로세스 하나로는 Python 쪽이 먼저 병목이 되므로 --workers N으로 프로세스 N개가 동시에 부하를 줌
+(프로세스마다 그룹/채널을 따로 만들고 다 같이 시작, 처리량은 프로세스별 결과의 합)
+    python manage.py bench_channel_layer --hosts ... --workers 4
+"""
+
+import asyncio
+import multiprocessing
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.layers import ShardedRedisChannelLayer
+
+
+def run_worker(hosts, options, start_barrier, results):
+    """--workers의 자식 프로세스: 준비가 끝나면 다른 프로세스와 같이 시작해서 group_send/s를 돌려줌"""
+    try:
+        results.put(asyncio.run(run_bench(hosts, options, start_barrier)))
+    except Exception as e:
+        start_barrier.abort()
+        results.put(e)
+
+
+async def run_bench(hosts, options, start_barrier=None):
+    layer = ShardedRedisChannelLayer(
+        hosts=hosts, prefix=f'bench{uuid.uuid4().hex[:8]}', capacity=100000, expiry=60,
+    )
+    # 여러 프로세스의 프로세스 로컬 채널처럼 이름을 만들어서 노드에 고르게 퍼지게 함
+    process_prefixes = [uuid.uuid4().hex for _ in range(options['processes'])]
+    groups = [f'chat_{uuid.uuid4()}' for _ in range(options['groups'])]
+    try:
+        for i, group in enumerate(groups):
+            for member in range(options['members']):
+                process = process_prefixes[(i + member) % len(process_prefixes)]
+                await layer.group_add(group, f'specific.{process}!{uuid.uuid4().hex}')
+
+        queue = asyncio.Queue()
+        for i in range(options['sends']):
+            queue.put_nowait(groups[i % len(groups)])
+
+        async def worker():
+            while not queue.empty():
+                group = queue.get_nowait()
+                await layer.group_send(group, {'type': 'chat_message', 'message': {'content': 'x' * 200}})
+
+        if start_barrier is not None:
+            # 그룹 준비가 느린 프로세스를 기다렸다가 측정 구간을 맞춤
+            start_barrier.wait()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+        elapsed = time.perf_counter() - started
+    finally:
+        await layer.flush()
+    return options['sends'] / elapsed
+
+
+class Command(BaseCommand):
+    help = 'Redis 노드 수별 group_send 처리량 측정 (테스트용 Redis에서만 실행 - flush 함)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hosts', required=True, help='쉼표로 구분한 Redis 주소 목록')
+        parser.add_argument('--groups', type=int, default=1000, help='대화방(그룹) 수')
+        parser.add_argument('--members', type=int, default=2, help='그룹당 연결 수')
+        parser.add_argument('--processes', type=int, default=8, help='가상 ASGI 프로세스 수 (채널 키 분산)')
+        parser.add_argument('--sends', type=int, default=20000, help='노드 구성별 group_send 횟수 (프로세스마다)')
+        parser.add_argument('--concurrency', type=int, default=64, help='동시 group_send 수 (프로세스마다)')
+        parser.add_argument('--workers', type=int, default=1, help='동시에 부하를 주는 클라이언트 프로세스 수')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers는 1 이상이어야 합니다.')
+        hosts = [h.strip() for h in options['hosts'].split(',') if h.strip()]
+        baseline = None
+        for node_count in range(1, len(hosts) + 1):
+            rates = self.run(hosts[:node_count], options)
+            rate = sum(rates)
+            baseline = baseline or rate
+            per_worker = f" (프로세스별 {', '.join(f'{r:,.0f}' for r in rates)})" if len(rates) > 1 else ''
+            self.stdout.write(
+                f'노드 {node_count}개: {rate:,.0f} group_send/s (x{rate / baseline:.2f}){per_worker}'
+            )
+
+    def run(self, hosts, options):
+        """프로세스별 group_send/s 목록"""
+        if options['workers'] == 1:
+            return [asyncio.run(run_bench(hosts, options))]
+        context = multiprocessing.get_context('fork')
+        start_barrier = context.Barrier(options['workers'])
+        results = context.Queue()
+        processes = [
+            context.Process(target=run_worker, args=(hosts, options, start_barrier, results))
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        rates = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        errors = [rate for rate in rates if isinstance(rate, Exception)]
+        if errors:
+            raise CommandError(f'벤치마크 프로세스 실패: {errors[0]!r}')
+        return rates
@@ -0,0 +1,150 @@
+"""
+ChatConsumer 메시지 저장 경로 벤치마크
+기존 database_sync_to_async 3홉 방식과 async ORM 방식을 같은 DB에서 비교
+
+사용 예:
+    python manage.py bench_consumer_db --messages 1000
+"""
+
+import asyncio
+import logging
+import statistics
+import threading
+import time
+
+from asgiref.sync import SyncToAsync
+from channels.db import database_sync_to_async
+from django.core.management.base import BaseCommand
+
+from chat.consumers import ChatConsumer
+from chat.events import publish_message_created_event
+from chat.executors import get_executor
+from chat.models import Conversation, Message
+from chat.serializers import MessageSerializer
+
+
+class HopCounter:
+    """
+    스레드 풀 홉 횟수와 최대 스레드 수를 측정
+    SyncToAsync 호출과 chat.executors 실행기에 넘긴 작업(submit_sync/run_sync)을 모두 1홉으로 셈
+    """
+
+    def __init__(self):
+        self.hops = 0
+        self.peak_threads = threading.active_count()
+        self._original_call = SyncToAsync.__call__
+        self._executor = get_executor()
+
+    def _count(self):
+        self.hops += 1
+        self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    def __enter__(self):
+        counter = self
+        original_call = self._original_call
+        original_submit = self._executor.submit
+
+        async def counting_call(sync_to_async_self, *args, **kwargs):
+            counter._count()
+            return await original_call(sync_to_async_self, *args, **kwargs)
+
+        def counting_submit(*args, **kwargs):
+            counter._count()
+            return original_submit(*args, **kwargs)
+
+        SyncToAsync.__call__ = counting_call
+        self._executor.submit = counting_submit
+        return self
+
+    def __exit__(self, *exc_info):
+        SyncToAsync.__call__ = self._original_call
+        del self._executor.submit
+
+
+# 변경 전 consumer 코드와 동일한 동기 함수들
+# (저장은 현재와 같은 순번 발급 경로를 써서 스레드 홉 차이만 비교)
+@database_sync_to_async
+def legacy_create_message(conversation_id, sender_id, content, message_type):
+    conversation = Conversation.objects.get(id=conversation_id)
+    return Message.objects.create_sequenced(
+        conversation_id=conversation.id,
+        sender_id=sender_id,
+        content=content,
+        message_type=message_type
+    )
+
+
+@database_sync_to_async
+def legacy_serialize_message(message):
+    return MessageSerializer(message).data
+
+
+@database_sync_to_async
+def legacy_publish_message_event(message):
+    publish_message_created_event(message)
+
+
+class Command(BaseCommand):
+    help = 'ChatConsumer 메시지 저장 경로(기존 sync 래핑 vs async ORM) 지연시간/스레드 홉 비교'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='방식별 전송 메시지 수')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        # 벤치마크 중 이벤트 로그가 파일에 쌓이지 않도록
+        events_logger = logging.getLogger('chat.events')
+        previous_level = events_logger.level
+        events_logger.setLevel(logging.WARNING)
+
+        conversation = Conversation.objects.create(
+            participant1_id='bench_user_1', participant2_id=f'bench_user_{time.time_ns()}'
+        )
+        try:
+            legacy = asyncio.run(self.run_legacy(conversation.id, count))
+            native = asyncio.run(self.run_native(conversation.id, count))
+        finally:
+            conversation.delete()
+            events_logger.setLevel(previous_level)
+
+        self.report('database_sync_to_async (기존)', legacy, count)
+        self.report('async ORM (현재)', native, count)
+        saved = statistics.mean(legacy['latencies']) - statistics.mean(native['latencies'])
+        self.stdout.write(self.style.SUCCESS(
+            f"메시지당 절약: {saved * 1000:.3f}ms, "
+            f"스레드 홉 {(legacy['hops'] - native['hops']) / count:.1f}회"
+        ))
+
+    async def run_legacy(self, conversation_id, count):
+        latencies = []
+        with HopCounter() as counter:
+            for i in range(count):
+                started = time.perf_counter()
+                message = await legacy_create_message(conversation_id, 'bench_user_1', f'legacy {i}', 'text')
+                await legacy_serialize_message(message)
+                await legacy_publish_message_event(message)
+                latencies.append(time.perf_counter() - started)
+        return {'latencies': latencies, 'hops': counter.hops, 'peak_threads': counter.peak_threads}
+
+    async def run_native(self, conversation_id, count):
+        consumer = ChatConsumer()
+        consumer.user_id = 'bench_user_1'
+        latencies = []
+        with HopCounter() as counter:
+            for i in range(count):
+                started = time.perf_counter()
+                message = await consumer.create_message(conversation_id, 'bench_user_1', f'native {i}', 'text')
+                consumer.serialize_message(message)
+                # 운영에서는 기다리지 않지만 발행 작업도 메시지당 비용이라 측정 구간 안에서 완료까지 기다림
+                await consumer.publish_message_event(message)
+                latencies.append(time.perf_counter() - started)
+        return {'latencies': latencies, 'hops': counter.hops, 'peak_threads': counter.peak_threads}
+
+    def report(self, label, result, count):
+        latencies = sorted(result['latencies'])
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{label}: 평균 {statistics.mean(latencies) * 1000:.3f}ms, "
+            f"p50 {statistics.median(latencies) * 1000:.3f}ms, p99 {p99 * 1000:.3f}ms, "
+            f"메시지당 홉 {result['hops'] / count:.1f}회, 최대 스레드 {result['peak_threads']}개"
+        )
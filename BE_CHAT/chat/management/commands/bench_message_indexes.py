@@ -0,0 +1,279 @@
+"""
+메시지 테이블 인덱스 벤치마크
+시드 데이터를 넣은 뒤 views.py/consumers.py(+ 직렬화/보관 정리/미리보기)의 조회 경로마다
+실행 계획과 응답 시간을 보여주고, insert 처리량과 insert 한 번에 쓰는 인덱스 수를 측정
+
+- 실행 계획에서 테이블 전체 스캔/별도 정렬이 보이면 경고로 표시 (모든 조회 경로가 인덱스를 타야 함)
+- --compare-legacy: 예전 인덱스 구성(이번에 제거한 인덱스)을 잠깐 추가해서 insert 처리량을 같이 비교
+- 시드 데이터는 chat/synthetic.py 분포로 bench_idx_ 참여자를 만들고 끝나면 삭제 (--keep이면 남김)
+
+사용 예:
+    python manage.py bench_message_indexes
+    python manage.py bench_message_indexes --conversations 500 --messages-per-conversation 400 --compare-legacy
+"""
+
+import random
+import re
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from chat.models import Conversation, DeliveryReceipt, Message
+from chat.synthetic import SyntheticDataset, delete_dataset
+
+# 이번에 제거한 인덱스 (예전 구성과 비교용)
+# 예전 (conversation, is_deleted, -created_at)은 새 messages_timeline_idx로 바뀐 것이라 빼고 비교
+LEGACY_INDEXES = [
+    (Message, ['sender_id', 'created_at']),
+    (Message, ['conversation', 'message_type', 'is_deleted']),
+    (Message, ['reply_to']),
+    (Message, ['brand_id', 'created_at']),
+    (Message, ['created_at']),
+    (Message, ['sender_id']),
+    (Message, ['brand_id']),
+    (Message, ['sequence_number']),
+    (Message, ['conversation']),
+    (DeliveryReceipt, ['message', 'user_id']),
+    (DeliveryReceipt, ['user_id']),
+    (DeliveryReceipt, ['message']),
+]
+# MySQL은 외래키 컬럼으로 시작하는 인덱스가 있으면 외래키 전용 인덱스를 따로 두지 않음
+MYSQL_IMPLICIT = {(Message, ('conversation',)), (DeliveryReceipt, ('message',))}
+
+
+class Command(BaseCommand):
+    help = '메시지 조회 경로별 실행 계획/응답 시간과 insert 처리량(인덱스 쓰기 수) 측정'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conversations', type=int, default=200, help='시드 대화방 수')
+        parser.add_argument('--messages-per-conversation', type=int, default=250, help='대화방당 시드 메시지 수')
+        parser.add_argument('--inserts', type=int, default=1000, help='insert 측정 메시지 수')
+        parser.add_argument('--repeat', type=int, default=20, help='조회 경로별 반복 횟수')
+        parser.add_argument('--compare-legacy', action='store_true', help='예전 인덱스 구성의 insert 처리량도 측정')
+        parser.add_argument('--keep', action='store_true', help='시드 데이터를 지우지 않음')
+
+    def handle(self, *args, **options):
+        self.run_id = f'bench_idx_{time.time_ns()}'
+        self.verbose = options['verbosity'] > 1
+        conversations = self.seed(options['conversations'], options['messages_per_conversation'])
+        try:
+            self.analyze()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'조회 경로 ({connection.vendor})'))
+            warnings = 0
+            for name, queryset in self.read_paths(conversations):
+                warnings += self.report_query(name, queryset, options['repeat'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('insert'))
+            current = self.measure_inserts(conversations, options['inserts'], 'current')
+            self.report_inserts('현재 구성', current)
+            if options['compare_legacy']:
+                added = self.add_legacy_indexes()
+                try:
+                    legacy = self.measure_inserts(conversations, options['inserts'], 'legacy')
+                finally:
+                    self.remove_legacy_indexes(added)
+                self.report_inserts('예전 구성', legacy)
+                self.stdout.write(self.style.SUCCESS(
+                    f"insert 처리량 x{current['rate'] / legacy['rate']:.2f}, "
+                    f"인덱스 쓰기 {legacy['index_writes']} → {current['index_writes']}개/메시지"
+                ))
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+        if warnings:
+            self.stdout.write(self.style.WARNING(f'인덱스를 타지 않는 조회 경로 {warnings}개'))
+        else:
+            self.stdout.write(self.style.SUCCESS('모든 조회 경로가 인덱스 사용'))
+
+    # 시드 데이터 - 운영 분포(큰 대화방 소수, 읽지 않은 꼬리 등)로 만들어야 옵티마이저 통계와 실행 계획이 운영과 비슷함
+    def seed(self, conversation_count, per_conversation):
+        dataset = SyntheticDataset(
+            messages=conversation_count * per_conversation, conversations=conversation_count,
+            prefix=f'{self.run_id}_', seed=42,
+        )
+        conversation_ids = dataset.generate()
+        by_id = Conversation.objects.in_bulk(conversation_ids)
+        stats = dataset.snapshot()
+        distribution = dataset.distribution()
+        self.stdout.write(
+            f"시드: 대화방 {stats['conversations']}개, 메시지 {stats['messages']:,}개 "
+            f"(대화방 크기 p50 {distribution['p50']}, 최대 {distribution['max']:,}) ({stats['elapsed']:.1f}s)"
+        )
+        # 큰 대화방 순서
+        return [by_id[conversation_id] for conversation_id in conversation_ids]
+
+    def analyze(self):
+        """통계를 갱신해서 실제 운영 데이터처럼 옵티마이저가 인덱스를 고르게 함"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute('ANALYZE TABLE conversations, messages, delivery_receipts')
+                cursor.fetchall()
+            else:
+                cursor.execute('ANALYZE')
+
+    def cleanup(self):
+        delete_dataset(self.run_id)
+
+    # 조회 경로 - 각 호출 위치와 같은 조건/정렬 (count()/update()는 정렬을 빼고 실행되므로 여기서도 뺌)
+    def read_paths(self, conversations):
+        # 가장 큰 대화방 (페이지 이동/안 읽은 수가 가장 무거운 경우)
+        conversation = conversations[0]
+        messages = conversation.messages.filter(is_deleted=False)
+        middle = messages.order_by('created_at', 'id')[messages.count() // 2]
+        recipient = conversation.participant2_id
+        message_ids = list(messages.order_by('-created_at', '-id').values_list('id', flat=True)[:50])
+        attachment_id = messages.filter(attachment__isnull=False).values_list('attachment_id', flat=True).first()
+        client_msg_id = messages.filter(
+            sender_id=conversation.participant1_id, client_msg_id__isnull=False
+        ).values_list('client_msg_id', flat=True).first()
+        cutoff = timezone.now() - timedelta(days=60)
+        latest = Message.objects.filter(
+            conversation=OuterRef('pk'), is_deleted=False
+        ).order_by('-created_at', '-id').values('id')[:1]
+
+        return [
+            ('views.conversation_messages', messages.select_related('attachment').order_by('created_at', 'id')),
+            ('views.conversation_messages_paginated',
+             messages.select_related('conversation', 'attachment').order_by('-created_at', '-id')[:50]),
+            ('views.messages_before', messages.before(middle).order_by('-created_at', '-id')[:50]),
+            ('views.messages_after', messages.after(middle).order_by('created_at', 'id')[:50]),
+            ('views.conversations_batch(last_message)',
+             Conversation.objects.filter(id__in=[c.id for c in conversations[:100]]).annotate(
+                 latest_message_id=Subquery(latest)
+             ).only('id')),
+            ('views.send_message(client_msg_id)', Message.objects.filter(
+                conversation=conversation, sender_id=conversation.participant1_id, client_msg_id=client_msg_id
+            )),
+            ('prefetch delivery_receipts', DeliveryReceipt.objects.filter(message_id__in=message_ids)),
+            ('views.mark_as_read / consumers.mark_message_as_read', DeliveryReceipt.objects.filter(
+                message_id=middle.id, user_id=recipient
+            )),
+            ('serializers.unread_count', conversation.messages.filter(
+                is_deleted=False, delivery_receipts__user_id=recipient,
+                delivery_receipts__status__in=['sent', 'delivered']
+            ).order_by()),
+            ('consumers.get_recent_messages', Message.objects.select_related('attachment').filter(
+                conversation_id=conversation.id, is_deleted=False
+            ).order_by('-created_at', '-id')[:50]),
+            ('consumers.get_messages_between', Message.objects.select_related('attachment').filter(
+                conversation_id=conversation.id, is_deleted=False,
+                sequence_number__gt=middle.sequence_number, sequence_number__lte=middle.sequence_number + 50
+            ).order_by('sequence_number')),
+            ('consumers.get_conversation_messages', Message.objects.select_related('attachment').filter(
+                conversation_id=conversation.id, is_deleted=False
+            ).order_by('created_at', 'id')),
+            ('retention.expired', Message.objects.filter(
+                conversation_id=conversation.id, created_at__lt=cutoff
+            ).order_by('created_at').values_list('id', flat=True)[:500]),
+            ('retention.soft_deleted', Message.objects.filter(
+                conversation_id=conversation.id, is_deleted=True, updated_at__lt=timezone.now()
+            ).order_by('created_at').values_list('id', flat=True)[:500]),
+            ('retention.detach_replies', Message.objects.filter(reply_to_id__in=message_ids).order_by()),
+            ('previews.notify', Message.objects.filter(
+                attachment_id=attachment_id, is_deleted=False
+            ).order_by().values_list('id', 'conversation_id')),
+        ]
+
+    def report_query(self, name, queryset, repeat):
+        plan = queryset.explain()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter() - started)
+        problems = plan_problems(plan)
+        label = self.style.WARNING(f"  !! {', '.join(problems)}") if problems else ''
+        self.stdout.write(f'{name}: {statistics.median(timings) * 1000:.2f}ms{label}')
+        for line in plan.splitlines() if self.verbose or problems else []:
+            self.stdout.write(f'    {line}')
+        return 1 if problems else 0
+
+    # insert
+    def measure_inserts(self, conversations, count, label):
+        rng = random.Random(7)
+        latencies = []
+        for i in range(count):
+            conversation = conversations[rng.randrange(len(conversations))]
+            started = time.perf_counter()
+            message = Message.objects.create_sequenced(
+                conversation.id, sender_id=conversation.participant1_id, content=f'bench {i}',
+                client_msg_id=f'{label}-{i}',
+            )
+            DeliveryReceipt.objects.create(message=message, user_id=conversation.participant2_id)
+            latencies.append(time.perf_counter() - started)
+        return {
+            'rate': count / sum(latencies),
+            'latencies': sorted(latencies),
+            'index_writes': index_count('messages') + index_count('delivery_receipts'),
+        }
+
+    def report_inserts(self, label, result):
+        latencies = result['latencies']
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f"{label}: {result['rate']:,.0f} 메시지/s, p50 {statistics.median(latencies) * 1000:.3f}ms, "
+            f"p99 {p99 * 1000:.3f}ms, 메시지+전달 기록 insert당 인덱스 {result['index_writes']}개"
+        )
+
+    def add_legacy_indexes(self):
+        added = []
+        with connection.schema_editor() as editor:
+            for i, (model, fields) in enumerate(LEGACY_INDEXES):
+                columns = tuple(model._meta.get_field(field).column for field in fields)
+                if connection.vendor == 'mysql' and (model, tuple(fields)) in MYSQL_IMPLICIT:
+                    continue
+                if columns in index_columns(model._meta.db_table):
+                    continue
+                index = models.Index(fields=fields, name=f'bench_legacy_{i}')
+                editor.add_index(model, index)
+                added.append((model, index))
+        self.analyze()
+        return added
+
+    def remove_legacy_indexes(self, added):
+        with connection.schema_editor() as editor:
+            for model, index in added:
+                editor.remove_index(model, index)
+        self.analyze()
+
+
+def index_columns(table):
+    """테이블의 인덱스(기본키/유니크 포함)별 컬럼 목록"""
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {
+        tuple(constraint['columns']) for constraint in constraints.values()
+        if constraint['index'] or constraint['unique'] or constraint['primary_key']
+    }
+
+
+def index_count(table):
+    """insert 한 번에 갱신되는 B-tree 수 (기본키 포함)"""
+    return len(index_columns(table))
+
+
+def plan_problems(plan):
+    """실행 계획에서 전체 스캔/별도 정렬 찾기 (DB별 EXPLAIN 형식)"""
+    problems = []
+    if connection.vendor == 'sqlite':
+        problems += [f'full scan {table}' for table in re.findall(r'\bSCAN (\w+)(?! USING)', plan)]
+        if 'USE TEMP B-TREE FOR ORDER BY' in plan:
+            problems.append('sort')
+    elif connection.vendor == 'mysql':
+        for row in plan.splitlines():
+            columns = row.split()
+            if len(columns) > 4 and columns[4] == 'ALL':
+                problems.append(f'full scan {columns[2]}')
+            if 'Using filesort' in row:
+                problems.append('filesort')
+    elif connection.vendor == 'postgresql':
+        problems += [f'full scan {table}' for table in re.findall(r'Seq Scan on (\w+)', plan)]
+        if re.search(r'->\s+Sort\b|^Sort\b', plan, re.M):
+            problems.append('sort')
+    return problems
@@ -0,0 +1,118 @@
+"""
+금칙어 필터 벤치마크
+가짜 금칙어 목록(한글/영문 단어 + 금지 도메인)과 메시지를 만들어서
+Aho-Corasick 필터의 메시지당 검사 비용과 금칙어마다 정규식을 돌리는 방식의 비용을 비교
+
+사용 예:
+    python manage.py bench_moderation
+    python manage.py bench_moderation --terms 20000 --messages 50000 --length 200
+"""
+
+import asyncio
+import random
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from chat.executors import run_sync
+from chat.moderation import ContentBlocked, ContentFilter, normalize, search_key, search_text
+
+
+def hangul_word(rng, low=2, high=4):
+    return ''.join(chr(0xAC00 + rng.randrange(11172)) for _ in range(rng.randint(low, high)))
+
+
+def ascii_word(rng, low=4, high=8):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(low, high)))
+
+
+class Command(BaseCommand):
+    help = '금칙어 필터(Aho-Corasick)의 메시지당 검사 비용 측정 (금칙어별 정규식 방식과 비교)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--terms', type=int, default=5000, help='금칙어 수')
+        parser.add_argument('--domains', type=int, default=1000, help='금지 도메인 수')
+        parser.add_argument('--messages', type=int, default=20000, help='검사할 메시지 수')
+        parser.add_argument('--length', type=int, default=80, help='메시지 길이 (글자)')
+        parser.add_argument('--hit-rate', type=float, default=0.02, help='금칙어/금지 링크가 들어 있는 메시지 비율')
+        parser.add_argument('--naive-messages', type=int, default=200, help='정규식 방식으로 검사할 메시지 수')
+
+    def handle(self, *args, **options):
+        rng = random.Random(44)
+        terms = [hangul_word(rng) if i % 3 else ascii_word(rng) for i in range(options['terms'])]
+        domains = [f'{ascii_word(rng)}.{rng.choice(["com", "net", "kr", "io"])}' for _ in range(options['domains'])]
+
+        started = time.perf_counter()
+        content_filter = ContentFilter()
+        content_filter.load(terms, domains)
+        build = time.perf_counter() - started
+        self.stdout.write(
+            f"오토마톤: 금칙어 {len(terms):,}개, 도메인 {len(domains):,}개, 생성 {build * 1000:.1f}ms"
+        )
+
+        messages = [self.message(rng, terms, domains, options) for _ in range(options['messages'])]
+
+        latencies = []
+        blocked = 0
+        for text in messages:
+            started = time.perf_counter()
+            try:
+                content_filter.check(text)
+            except ContentBlocked:
+                blocked += 1
+            latencies.append(time.perf_counter() - started)
+        self.report('Aho-Corasick', latencies)
+        self.stdout.write(f'  차단 {blocked:,}건 / {len(messages):,}건')
+
+        # 실행기를 거친 전체 비용 (consumer가 기다리는 시간)
+        hops = asyncio.run(self.run_in_executor(content_filter, messages[:2000]))
+        self.report('Aho-Corasick + 실행기', hops)
+
+        # 금칙어마다 정규식 검색 (비교용)
+        patterns = [re.compile(re.escape(search_key(normalize(term)))) for term in terms]
+        sample = messages[:options['naive_messages']]
+        naive = []
+        mismatches = 0
+        for text in sample:
+            started = time.perf_counter()
+            normalized = search_text(text)
+            found = any(pattern.search(normalized) for pattern in patterns)
+            naive.append(time.perf_counter() - started)
+            if found and not content_filter.find(text):
+                mismatches += 1
+        self.report(f'금칙어별 정규식 ({len(sample)}건)', naive)
+        self.stdout.write(self.style.SUCCESS(
+            f'메시지당 x{statistics.mean(naive) / statistics.mean(latencies):,.0f} 빠름, '
+            f'정규식 방식과 결과가 다른 메시지 {mismatches}건'
+        ))
+
+    def message(self, rng, terms, domains, options):
+        words = []
+        while sum(len(word) + 1 for word in words) < options['length']:
+            words.append(hangul_word(rng, 1, 3))
+        if rng.random() < options['hit_rate']:
+            if rng.random() < 0.7:
+                # 사이에 공백/기호를 끼워 넣은 금칙어
+                term = rng.choice(terms)
+                words.insert(rng.randrange(len(words)), rng.choice([' ', '.', '\u200b']).join(term))
+            else:
+                words.append(f'https://www.{rng.choice(domains)}/path')
+        return ' '.join(words)
+
+    async def run_in_executor(self, content_filter, messages):
+        latencies = []
+        for text in messages:
+            started = time.perf_counter()
+            await run_sync(content_filter.find, text)
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def report(self, label, latencies):
+        latencies = sorted(latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{label}: 평균 {statistics.mean(latencies) * 1e6:.1f}us, '
+            f'p50 {statistics.median(latencies) * 1e6:.1f}us, p99 {p99 * 1e6:.1f}us'
+        )
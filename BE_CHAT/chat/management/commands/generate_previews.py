@@ -0,0 +1,57 @@
+"""
+이미지 첨부파일 미리보기 백필
+대기열이 넘쳤거나 서버 재시작으로 처리되지 못한 pending 첨부파일, 또는 실패한 첨부파일을 다시 처리
+
+사용 예:
+    python manage.py generate_previews
+    python manage.py generate_previews --retry-failed --workers 4
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat.models import Attachment
+from chat.previews import PreviewPipeline, is_previewable
+
+
+class Command(BaseCommand):
+    help = 'pending 상태인 이미지 첨부파일의 썸네일/blurhash 생성 (백필)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.PREVIEW_WORKERS, help='프로세스 수')
+        parser.add_argument('--limit', type=int, default=None, help='최대 처리 개수')
+        parser.add_argument('--retry-failed', action='store_true', help='failed 상태도 다시 처리')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            Attachment.objects.filter(preview_status='failed').update(preview_status='pending')
+
+        pending = Attachment.objects.filter(preview_status='pending').order_by('created_at')
+        if options['limit']:
+            pending = pending[:options['limit']]
+        rows = list(pending.values_list('id', 'content_type'))
+
+        skipped = [attachment_id for attachment_id, content_type in rows if not is_previewable(content_type)]
+        Attachment.objects.filter(id__in=skipped).update(preview_status='skipped')
+        targets = [attachment_id for attachment_id, content_type in rows if is_previewable(content_type)]
+
+        pipeline = PreviewPipeline(
+            workers=options['workers'],
+            queue_size=options['workers'] * 2,
+            max_retries=settings.PREVIEW_MAX_RETRIES,
+            timeout=settings.PREVIEW_TIMEOUT,
+            thumbnail_size=settings.PREVIEW_THUMBNAIL_SIZE,
+        )
+        try:
+            for attachment_id in targets:
+                # 대기열이 작아서 워커 속도에 맞춰 넣음 (메모리에 전부 쌓지 않음)
+                pipeline.enqueue(attachment_id, block=True)
+            pipeline.join()
+        finally:
+            pipeline.shutdown()
+
+        stats = pipeline.snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"완료: 생성 {stats['ready'] - stats['reused']}개, 재사용 {stats['reused']}개, "
+            f"실패 {stats['failed']}개, 재시도 {stats['retries']}회, 이미지 아님 {len(skipped)}개"
+        ))
@@ -0,0 +1,129 @@
+"""
+이전 채팅 시스템의 대화 기록(JSONL) 일괄 가져오기 - 입력 형식은 chat/history_import.py
+배치마다 한 트랜잭션에서 대화방 생성/순번 예약/bulk_create, 이벤트·알림·브로드캐스트 없음
+서비스 전환 전에 실행 - 실시간 메시지가 있는 대화방의 줄은 conflict로 거절 (--errors 파일에 기록)
+중단되면(장애, --max-rows) 같은 명령을 다시 실행하면 체크포인트에서 이어서 진행
+
+- 병렬: --workers N이면 프로세스 N개가 참여자 쌍 해시로 나눠서 처리
+  여러 서버에서 나눠 돌릴 때는 --shards N --shard K를 서버마다 지정
+- 체크포인트 기본 경로: <입력 파일>.import-<K>of<N>.json (샤드마다 따로)
+- 끝나면 가져온 기간의 활동 집계를 다시 계산: python manage.py rebuild_activity_rollups --since ... --until ...
+
+사용 예:
+    python manage.py import_chat_history legacy.jsonl --errors rejected.jsonl
+    python manage.py import_chat_history legacy.jsonl.gz --workers 8 --batch-size 5000
+    python manage.py import_chat_history legacy.jsonl --shards 4 --shard 2
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from chat.db_pool import close_pools
+from chat.history_import import ChatHistoryImporter
+
+
+def format_stats(label, stats):
+    invalid = ', '.join(
+        f"{key[len('invalid_'):]} {value}" for key, value in sorted(stats.items())
+        if key.startswith('invalid_') and value
+    )
+    return (
+        f"{label}: 줄 {stats.get('lines', 0):,}, 메시지 {stats.get('messages', 0):,}건, "
+        f"전달 기록 {stats.get('receipts', 0):,}건, 새 대화방 {stats.get('conversations_created', 0):,}개, "
+        f"중복 건너뜀 {stats.get('duplicates', 0):,}, 잘못된 줄 {stats.get('invalid', 0):,}"
+        + (f" ({invalid})" if invalid else '')
+        + f", 배치 {stats.get('batches', 0)}회, 이번 실행 메시지 {stats.get('run_messages', 0):,}건 "
+        + f"({stats.get('elapsed', 0)}s, {stats.get('messages_per_sec', 0):,} msg/s)"
+    )
+
+
+def run_shard(options, shard, shards):
+    """샤드 하나 가져오기 (--workers의 자식 프로세스에서도 호출), (끝까지 갔는지, 통계) 반환"""
+    prefix = f'[{shard}/{shards}] ' if shards > 1 else ''
+    errors_path = options['errors']
+    if errors_path and shards > 1:
+        errors_path = f'{errors_path}.{shard}'
+    importer = ChatHistoryImporter(
+        options['path'],
+        batch_size=options['batch_size'],
+        insert_chunk=options['insert_chunk'],
+        shard=shard,
+        shards=shards,
+        checkpoint_path=options['checkpoint'] or f"{options['path']}.import-{shard}of{shards}.json",
+        errors_path=errors_path,
+        max_rows=options['max_rows'],
+        progress=lambda stats: print(format_stats(f'{prefix}진행 중', stats), flush=True),
+    )
+    if options['restart']:
+        importer.clear_checkpoint()
+    finished = importer.run()
+    return finished, importer.snapshot()
+
+
+class Command(BaseCommand):
+    help = '이전 채팅 시스템의 대화 기록(JSONL)을 배치 단위 bulk insert로 가져오기 (병렬/이어서 실행 지원)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL 파일 (.gz 가능)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='트랜잭션 하나에 넣는 줄 수')
+        parser.add_argument('--insert-chunk', type=int, default=500, help='INSERT 한 번에 넣는 행 수')
+        parser.add_argument('--workers', type=int, default=1, help='병렬 프로세스 수 (참여자 쌍 해시로 나눔)')
+        parser.add_argument('--shards', type=int, default=1, help='전체 샤드 수 (여러 서버에서 나눠 실행할 때)')
+        parser.add_argument('--shard', type=int, default=0, help='이 프로세스가 처리할 샤드 번호 (0부터)')
+        parser.add_argument('--checkpoint', default=None, help='체크포인트 파일 경로 (샤드 하나일 때만)')
+        parser.add_argument('--restart', action='store_true', help='체크포인트를 무시하고 처음부터 (이미 가져온 메시지는 건너뜀)')
+        parser.add_argument('--errors', default=None, help='잘못된 줄을 기록할 JSONL 파일')
+        parser.add_argument('--max-rows', type=int, default=None, help='이만큼 처리하면 체크포인트 저장 후 중단')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['insert_chunk'] < 1:
+            raise CommandError('--batch-size와 --insert-chunk는 1 이상이어야 합니다.')
+        if options['workers'] > 1:
+            if options['shards'] != 1:
+                raise CommandError('--workers와 --shards는 같이 쓸 수 없습니다.')
+            if options['checkpoint']:
+                raise CommandError('--workers를 쓰면 체크포인트는 샤드마다 기본 경로를 사용합니다.')
+            results = self.run_workers(options)
+        else:
+            if not 0 <= options['shard'] < options['shards']:
+                raise CommandError('--shard는 0 이상 --shards 미만이어야 합니다.')
+            try:
+                results = [run_shard(options, options['shard'], options['shards'])]
+            except (OSError, ValueError) as e:
+                raise CommandError(str(e))
+
+        total = {}
+        for _, stats in results:
+            for key, value in stats.items():
+                total[key] = max(total.get(key, 0), value) if key == 'elapsed' else total.get(key, 0) + value
+        if total.get('elapsed'):
+            # 처리 속도는 이번 실행에서 가져온 메시지 기준 (체크포인트에서 이어받은 건수 제외)
+            total['messages_per_sec'] = round(total.get('run_messages', 0) / total['elapsed'], 1)
+        summary = format_stats('완료', total)
+        if any(finished is None for finished, _ in results):
+            self.stdout.write(self.style.ERROR(f'{summary} - 실패한 샤드가 있음, 다시 실행하면 체크포인트에서 이어서 진행'))
+        elif all(finished for finished, _ in results):
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.WARNING(f'{summary} - --max-rows에서 중단, 다시 실행하면 이어서 진행'))
+
+    def run_workers(self, options):
+        workers = options['workers']
+        # 자식 프로세스가 부모의 DB 연결(연결 풀에 반납된 것 포함)을 같이 쓰지 않도록 fork 전에 닫음 (자식은 새로 연결)
+        connections.close_all()
+        close_pools()
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(run_shard, options, shard, workers) for shard in range(workers)]
+            results = []
+            for shard, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # 다른 샤드는 계속 진행, 다시 실행하면 실패한 샤드는 체크포인트에서 이어지고 끝난 샤드는 중복으로 건너뜀
+                    self.stderr.write(f'샤드 {shard}/{workers} 실패: {e!r}')
+                    results.append((None, {}))
+        return results
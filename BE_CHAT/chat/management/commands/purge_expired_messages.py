@@ -0,0 +1,66 @@
+"""
+보관 기간이 지난 메시지/소프트 삭제된 메시지 정리 (cron 등으로 주기 실행)
+작은 배치로 나눠 지우고 배치 사이에 쉬므로 서비스 중에도 실행 가능
+중단되면(--max-seconds, 장애) 다음 실행이 체크포인트에서 이어서 진행
+
+사용 예:
+    python manage.py purge_expired_messages --dry-run
+    python manage.py purge_expired_messages --max-seconds 1800
+    python manage.py purge_expired_messages --type user_to_user --batch-size 200 --pause 0.5
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.retention import RetentionPurger
+
+
+class Command(BaseCommand):
+    help = '대화방 유형별 보관 정책에 따라 오래된/소프트 삭제된 메시지를 배치로 삭제'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', action='append', dest='types', help='이 대화방 유형만 정리 (여러 번 지정 가능)')
+        parser.add_argument('--batch-size', type=int, default=settings.RETENTION_BATCH_SIZE, help='배치당 메시지 수')
+        parser.add_argument('--pause', type=float, default=settings.RETENTION_BATCH_PAUSE, help='배치 사이 대기 (초)')
+        parser.add_argument('--max-seconds', type=float, default=None, help='이 시간이 지나면 체크포인트 저장 후 중단')
+        parser.add_argument('--checkpoint', default=settings.RETENTION_CHECKPOINT_FILE, help='체크포인트 파일 경로')
+        parser.add_argument('--restart', action='store_true', help='체크포인트를 무시하고 처음부터')
+        parser.add_argument('--dry-run', action='store_true', help='삭제하지 않고 대상 개수만 집계')
+
+    def handle(self, *args, **options):
+        policies = settings.RETENTION_POLICIES
+        if options['types']:
+            unknown = set(options['types']) - set(policies)
+            if unknown:
+                raise CommandError(f"정책이 없는 대화방 유형: {', '.join(sorted(unknown))}")
+            policies = {name: policy for name, policy in policies.items() if name in options['types']}
+
+        purger = RetentionPurger(
+            policies,
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            # dry-run은 체크포인트와 상관없이 전체 대상을 집계
+            checkpoint_path=None if options['dry_run'] else options['checkpoint'],
+            max_seconds=options['max_seconds'],
+            dry_run=options['dry_run'],
+            progress=lambda stats: self.stdout.write(self.format_stats('진행 중', stats)),
+        )
+        if options['restart']:
+            purger.clear_checkpoint()
+        finished = purger.run()
+
+        summary = self.format_stats('대상(dry-run)' if options['dry_run'] else '완료', purger.snapshot())
+        if finished:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(self.style.WARNING(f"{summary} - 시간 제한으로 중단, 다음 실행에서 이어서 진행"))
+
+    @staticmethod
+    def format_stats(label, stats):
+        return (
+            f"{label}: 메시지 {stats.get('messages', 0)}건 "
+            f"(기간 만료 {stats.get('expired', 0)}, 소프트 삭제 {stats.get('soft_deleted', 0)}), "
+            f"전달 기록 {stats.get('receipts', 0)}건, 답장 참조 해제 {stats.get('replies_detached', 0)}건, "
+            f"대화방 {stats.get('conversations', 0)}개, 배치 {stats.get('batches', 0)}회, "
+            f"{stats['elapsed']}s, {stats['rows_per_sec']} rows/s"
+        )
@@ -0,0 +1,71 @@
+"""
+대화방 활동 집계(activity_rollups)를 messages/conversations에서 다시 계산
+집계를 처음 켰을 때 과거 구간 채우기, 프로세스가 죽어서 반영 전 건수가 빠졌을 때 복구용
+하루 단위로 계산해서 그 날의 집계 행을 한 트랜잭션에서 교체 (메모리와 잠금 시간을 하루치로 제한)
+
+- 날짜는 settings.TIME_ZONE 기준, --until 기본값은 오늘 자정 (진행 중인 오늘은 증분 갱신에 맡김)
+- 보관 기간 정리(purge_expired_messages)로 지운 메시지는 다시 계산할 수 없으므로 그보다 오래된 날은 다시 만들지 않는 게 좋음
+- 메시지는 대화방별로 (conversation, created_at) 인덱스 범위를 읽음 - 대상은 그 날 이후 갱신된 대화방이라
+  오래된 날일수록(최근까지 활동한 대화방이 많을수록) 날마다 탐색하는 대화방 수가 늘어남
+
+사용 예:
+    python manage.py rebuild_activity_rollups
+    python manage.py rebuild_activity_rollups --days 30
+    python manage.py rebuild_activity_rollups --since 2025-01-01 --until 2025-02-01
+"""
+
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from chat.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        '대화방 활동 집계를 원본 테이블에서 하루 단위로 다시 계산해서 교체 '
+        '(날마다 그 날 이후 갱신된 대화방을 훑으므로 오래된 날일수록 느려짐)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='--until 이전 며칠을 다시 계산할지')
+        parser.add_argument('--since', help='시작 날짜 (YYYY-MM-DD, 포함)')
+        parser.add_argument('--until', help='끝 날짜 (YYYY-MM-DD, 제외, 기본 오늘)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='조회/INSERT 배치 크기')
+
+    def handle(self, *args, **options):
+        until = self.parse_day(options['until']) if options['until'] else timezone.localdate()
+        since = self.parse_day(options['since']) if options['since'] else until - datetime.timedelta(days=options['days'])
+        if since >= until:
+            raise CommandError('--since는 --until보다 앞이어야 합니다.')
+
+        total_rows = 0
+        started = time.perf_counter()
+        day = since
+        while day < until:
+            next_day = day + datetime.timedelta(days=1)
+            day_started = time.perf_counter()
+            rows = rebuild_rollups(self.midnight(day), self.midnight(next_day), batch_size=options['batch_size'])
+            total_rows += rows
+            self.stdout.write(f'{day}: 집계 행 {rows:,}개 ({time.perf_counter() - day_started:.2f}s)')
+            day = next_day
+        self.stdout.write(self.style.SUCCESS(
+            f'{since} ~ {until} (제외) 다시 계산 완료: 집계 행 {total_rows:,}개, {time.perf_counter() - started:.1f}s'
+        ))
+
+    @staticmethod
+    def parse_day(value):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'날짜 형식이 아닙니다 (YYYY-MM-DD): {value}')
+        return day
+
+    @staticmethod
+    def midnight(day):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
@@ -0,0 +1,56 @@
+"""
+채널 레이어 리샤딩 - 기존 노드의 그룹 멤버십을 새 소유 노드로 복사
+CHANNEL_REDIS_PREVIOUS_HOSTS를 설정해서 배포한 뒤 실행 (chat/layers.py 참고)
+
+사용 예:
+    python manage.py reshard_channel_groups --dry-run
+    python manage.py reshard_channel_groups
+"""
+
+import asyncio
+
+from channels.layers import get_channel_layer
+from django.core.management.base import BaseCommand, CommandError
+
+from chat.layers import ShardedRedisChannelLayer
+
+
+class Command(BaseCommand):
+    help = '기존 Redis 노드의 채널 그룹 멤버십을 consistent hash 기준 새 소유 노드로 복사'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='복사하지 않고 이동 대상만 집계')
+        parser.add_argument('--batch', type=int, default=500, help='SCAN 한 번에 가져올 키 수')
+
+    def handle(self, *args, **options):
+        layer = get_channel_layer()
+        if not isinstance(layer, ShardedRedisChannelLayer) or not layer.previous_node_indexes:
+            raise CommandError('CHANNEL_REDIS_PREVIOUS_HOSTS가 설정된 ShardedRedisChannelLayer에서만 실행할 수 있습니다.')
+        moved, total = asyncio.run(self.reshard(layer, options['batch'], options['dry_run']))
+        action = '이동 대상' if options['dry_run'] else '복사 완료'
+        self.stdout.write(self.style.SUCCESS(f'그룹 {total}개 중 {moved}개 {action}'))
+
+    async def reshard(self, layer, batch, dry_run):
+        prefix = f'{layer.prefix}:group:'
+        moved = total = 0
+        try:
+            for source in layer.previous_node_indexes:
+                connection = layer.connection(source)
+                async for key in connection.scan_iter(match=f'{prefix}*', count=batch):
+                    total += 1
+                    group = key.decode('utf8')[len(prefix):]
+                    target = layer.consistent_hash(group)
+                    if target == source:
+                        continue
+                    moved += 1
+                    if dry_run:
+                        continue
+                    members = await connection.zrange(key, 0, -1, withscores=True)
+                    if members:
+                        # 이미 새 노드에 있는 멤버는 더 최근 점수를 유지 (GT)
+                        target_connection = layer.connection(target)
+                        await target_connection.zadd(key, dict(members), gt=True)
+                        await target_connection.expire(key, layer.group_expiry)
+        finally:
+            await layer.close_pools()
+        return moved, total
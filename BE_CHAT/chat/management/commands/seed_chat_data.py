@@ -0,0 +1,91 @@
+"""
+운영 분포를 흉내 낸 합성 채팅 데이터 넣기 (부하 테스트/인덱스·쿼리 검증용) - 분포는 chat/synthetic.py
+같은 --seed와 옵션이면 같은 데이터 (끝 시각은 기본 오늘 자정이라 날짜가 바뀌면 시각만 달라짐, 고정하려면 --end)
+이벤트·알림·활동 집계 갱신 없음 - 집계가 필요하면 끝난 뒤 rebuild_activity_rollups
+
+- 참여자 id는 <prefix>user<N>, 브랜드는 <prefix>brand<N> → --clear로 같은 prefix 데이터를 지우고 다시 만들 수 있음
+- 운영 DB에서 실행하지 말 것 (prefix로 구분은 되지만 대량 insert로 부하가 큼)
+
+사용 예:
+    python manage.py seed_chat_data --messages 1000000
+    python manage.py seed_chat_data --messages 5000000 --users 200000 --brands 300 --days 365 --seed 7
+    python manage.py seed_chat_data --prefix load_ --clear --messages 200000
+"""
+
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from chat.synthetic import SyntheticDataset, delete_dataset
+
+
+class Command(BaseCommand):
+    help = '운영과 비슷한 분포(큰 대화방 소수, 인기 브랜드, 읽지 않은 꼬리)의 합성 채팅 데이터를 bulk insert'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=100000, help='전체 메시지 수 (대략)')
+        parser.add_argument('--conversations', type=int, default=None, help='대화방 수 (기본 메시지 40개당 1개)')
+        parser.add_argument('--users', type=int, default=None, help='사용자 수 (기본 대화방 수의 절반)')
+        parser.add_argument('--brands', type=int, default=50, help='브랜드 수')
+        parser.add_argument('--brand-share', type=float, default=0.2, help='브랜드 상담방 비율')
+        parser.add_argument('--days', type=int, default=180, help='데이터 기간 (끝 시각 이전 며칠)')
+        parser.add_argument('--end', help='기간 끝 날짜 (YYYY-MM-DD, 제외, 기본 오늘)')
+        parser.add_argument('--seed', type=int, default=42, help='난수 시드')
+        parser.add_argument('--prefix', default='seed_', help='참여자/브랜드 id 접두어')
+        parser.add_argument('--batch-size', type=int, default=5000, help='트랜잭션 하나에 넣는 메시지 수')
+        parser.add_argument('--no-receipts', action='store_true', help='전달 기록을 만들지 않음')
+        parser.add_argument('--clear', action='store_true', help='같은 prefix로 만든 데이터를 먼저 삭제')
+
+    def handle(self, *args, **options):
+        if options['messages'] < 1 or options['batch_size'] < 1 or options['days'] < 1:
+            raise CommandError('--messages, --batch-size, --days는 1 이상이어야 합니다.')
+        if not 0 <= options['brand_share'] <= 1:
+            raise CommandError('--brand-share는 0~1 사이여야 합니다.')
+        if not options['prefix']:
+            raise CommandError('--prefix는 비울 수 없습니다 (--clear가 모든 데이터를 지우게 됨).')
+        end = None
+        if options['end']:
+            day = parse_date(options['end'])
+            if day is None:
+                raise CommandError(f"날짜 형식이 아닙니다 (YYYY-MM-DD): {options['end']}")
+            end = timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+
+        if options['clear']:
+            deleted = delete_dataset(options['prefix'])
+            self.stdout.write(f"'{options['prefix']}' 데이터 삭제: 메시지 {deleted:,}개")
+
+        dataset = SyntheticDataset(
+            messages=options['messages'],
+            conversations=options['conversations'],
+            users=options['users'],
+            brands=options['brands'],
+            brand_share=options['brand_share'],
+            days=options['days'],
+            end=end,
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            receipts=not options['no_receipts'],
+            progress=lambda stats: self.stdout.write(
+                f"진행 중: 메시지 {stats['messages']:,}개, {stats['elapsed']}s, {stats['rows_per_sec']:,} 행/s"
+            ),
+        )
+        self.stdout.write(
+            f'대화방 {dataset.conversation_count:,}개, 사용자 {dataset.user_count:,}명, 브랜드 {dataset.brand_count}개, '
+            f'{dataset.end - datetime.timedelta(days=dataset.days):%Y-%m-%d} ~ {dataset.end:%Y-%m-%d} (seed {dataset.seed})'
+        )
+        dataset.generate()
+        stats = dataset.snapshot()
+        distribution = dataset.distribution()
+        self.stdout.write(
+            f"대화방 크기: p50 {distribution['p50']}, p90 {distribution['p90']}, p99 {distribution['p99']}, "
+            f"최대 {distribution['max']:,}, 상위 1% 대화방이 메시지의 {distribution['top1pct_share']:.0%}, "
+            f"브랜드 상담 {distribution['brand_message_share']:.0%} (상위 5개 브랜드가 그 중 {distribution['top5_brand_share']:.0%})"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"완료: 대화방 {stats.get('conversations', 0):,}개, 메시지 {stats.get('messages', 0):,}개, "
+            f"전달 기록 {stats.get('receipts', 0):,}개, 첨부파일 {stats.get('attachments', 0):,}개, "
+            f"{stats['elapsed']}s ({stats['rows_per_sec']:,} 행/s)"
+        ))
@@ -0,0 +1,248 @@
+"""
+유휴 WebSocket 연결 소크 테스트
+ASGI 앱(TokenAuthMiddleware + URLRouter, BE_CHAT/asgi.py의 websocket 스택)에 연결을 대량으로 열어둔 채
+프로세스 RSS 증가량과 tracemalloc 할당 위치별 합계로 연결 하나가 차지하는 메모리를 측정
+
+- 연결은 실제 서버 대신 연결마다 receive 큐 하나와 받은 프레임을 버리는 send로 앱을 직접 호출
+  (소켓/프로토콜 서버 버퍼는 빼고 consumer + 채널 레이어 수신 대기 + 미들웨어 scope만 측정)
+- 기본 채널 레이어는 InMemoryChannelLayer (--layer configured면 settings의 Redis 레이어)
+- 브라우저가 보내는 정도의 헤더(쿠키, User-Agent 등)를 scope에 넣음
+- 1단계: 연결을 열고 RSS 증가량 측정 → 모두 닫음
+  2단계: tracemalloc을 켜고 다시 열어서 할당 위치별 상위 항목 출력 (tracemalloc 자체 오버헤드 때문에 RSS와 분리)
+- 시드 대화방은 soak_ 참여자로 만들고 끝나면 삭제
+
+사용 예:
+    python manage.py soak_idle_connections
+    python manage.py soak_idle_connections --connections 50000 --conversations 25000 --top 20
+"""
+
+import asyncio
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+from channels.layers import DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer, channel_layers
+from channels.routing import URLRouter
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from chat.auth import TokenAuthMiddleware
+from chat.consumers import ChatConsumer
+from chat.models import Conversation
+from chat.routing import websocket_urlpatterns
+
+# 브라우저 WebSocket 핸드셰이크에 붙는 헤더 (연결마다 scope에 남는 크기를 실제와 비슷하게)
+BROWSER_HEADERS = [
+    (b'host', b'chat.example.com'),
+    (b'connection', b'Upgrade'),
+    (b'pragma', b'no-cache'),
+    (b'cache-control', b'no-cache'),
+    (b'user-agent', b'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                    b'(KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'),
+    (b'upgrade', b'websocket'),
+    (b'origin', b'https://www.example.com'),
+    (b'sec-websocket-version', b'13'),
+    (b'accept-encoding', b'gzip, deflate, br, zstd'),
+    (b'accept-language', b'ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7'),
+    (b'cookie', b'sessionid=' + b'x' * 32 + b'; csrftoken=' + b'y' * 32 + b'; _ga=GA1.1.1234567890.1700000000'),
+    (b'sec-websocket-extensions', b'permessage-deflate; client_max_window_bits'),
+]
+
+
+def rss_bytes():
+    """현재 RSS (리눅스는 /proc, 그 외에는 최대 RSS로 대신함)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class IdleConnection:
+    """서버 역할 - 앱에 connect를 넣고 accept를 기다린 뒤 disconnect까지 아무것도 보내지 않음"""
+
+    __slots__ = ('queue', 'accepted', 'task')
+
+    def __init__(self, app, scope):
+        self.queue = asyncio.Queue()
+        self.accepted = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait({'type': 'websocket.connect'})
+        self.task = asyncio.create_task(app(scope, self.queue.get, self.send))
+
+    async def send(self, message):
+        # 받은 프레임(최근 메시지 등)은 버림
+        if not self.accepted.done():
+            if message['type'] == 'websocket.accept':
+                self.accepted.set_result(True)
+            elif message['type'] == 'websocket.close':
+                self.accepted.set_result(False)
+
+    async def close(self):
+        self.queue.put_nowait({'type': 'websocket.disconnect', 'code': 1000})
+        await self.task
+
+
+class Command(BaseCommand):
+    help = '유휴 WebSocket 연결을 대량으로 열어서 연결당 메모리(RSS, tracemalloc 위치별) 측정'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=10000, help='열어둘 연결 수')
+        parser.add_argument('--conversations', type=int, default=5000, help='연결을 나눠 붙일 대화방 수')
+        parser.add_argument('--batch', type=int, default=500, help='동시에 여는 연결 수')
+        parser.add_argument('--layer', choices=['memory', 'configured'], default='memory',
+                            help='memory: InMemoryChannelLayer, configured: settings.CHANNEL_LAYERS')
+        parser.add_argument('--recent', action='store_true',
+                            help='연결마다 최근 메시지 전송까지 수행 (기본은 ?resume=1로 접속해서 생략)')
+        parser.add_argument('--top', type=int, default=15, help='tracemalloc 상위 할당 위치 수')
+        parser.add_argument('--no-trace', action='store_true', help='tracemalloc 단계 생략')
+
+    def handle(self, *args, **options):
+        if options['layer'] == 'memory':
+            channel_layers.set(DEFAULT_CHANNEL_LAYER, InMemoryChannelLayer(capacity=100))
+        run_id = f'soak_{time.time_ns()}'
+        conversations = [
+            str(conversation.id) for conversation in Conversation.objects.bulk_create(
+                Conversation(participant1_id=f'{run_id}_{i}_a', participant2_id=f'{run_id}_{i}_b')
+                for i in range(max(1, options['conversations']))
+            )
+        ]
+        try:
+            # DEBUG의 쿼리 기록(최근 9000개)이 연결당 메모리에 섞이지 않도록 운영과 같이 끔
+            with override_settings(DEBUG=False):
+                asyncio.run(self.soak(conversations, options))
+        finally:
+            Conversation.objects.filter(participant1_id__startswith=run_id).delete()
+
+    def scopes(self, conversations, count, recent):
+        query_string = b'' if recent else b'resume=1'
+        for i in range(count):
+            conversation_id = conversations[i % len(conversations)]
+            yield {
+                'type': 'websocket',
+                'asgi': {'version': '3.0', 'spec_version': '2.3'},
+                'http_version': '1.1',
+                'scheme': 'ws',
+                'server': ('127.0.0.1', 8000),
+                'client': ('10.0.0.1', 40000 + i % 20000),
+                'root_path': '',
+                'path': f'/ws/chat/{conversation_id}/',
+                'raw_path': f'/ws/chat/{conversation_id}/'.encode(),
+                'query_string': query_string,
+                # 프로토콜 서버는 연결마다 헤더를 새로 파싱하므로 바이트도 연결마다 새 객체
+                'headers': [(bytes(bytearray(name)), bytes(bytearray(value))) for name, value in BROWSER_HEADERS]
+                + [(b'sec-websocket-key', os.urandom(16).hex().encode())],
+                'subprotocols': [],
+            }
+
+    async def open(self, app, scopes, batch):
+        connections = []
+        pending = []
+        for scope in scopes:
+            pending.append(IdleConnection(app, scope))
+            if len(pending) >= batch:
+                connections += await self.accept_all(pending)
+                pending = []
+        connections += await self.accept_all(pending)
+        return connections
+
+    async def accept_all(self, pending):
+        results = await asyncio.gather(*(connection.accepted for connection in pending))
+        rejected = results.count(False)
+        if rejected:
+            raise RuntimeError(f'{rejected}개 연결이 거절됨 (CHAT_WS_AUTH_REQUIRED 또는 대화방 확인 실패)')
+        return pending
+
+    async def close(self, connections, batch):
+        for start in range(0, len(connections), batch):
+            await asyncio.gather(*(connection.close() for connection in connections[start:start + batch]))
+
+    async def soak(self, conversations, options):
+        app = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+        count, batch = options['connections'], options['batch']
+
+        # 모듈 import, DB 연결, 싱글턴 생성 같은 1회성 비용은 측정에서 제외
+        warm_up = await self.open(app, self.scopes(conversations, min(count, batch), options['recent']), batch)
+        await self.close(warm_up, batch)
+        del warm_up
+
+        gc.collect()
+        baseline = rss_bytes()
+        started = time.perf_counter()
+        connections = await self.open(app, self.scopes(conversations, count, options['recent']), batch)
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        grown = rss_bytes() - baseline
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'유휴 연결 {count:,}개 (대화방 {len(conversations):,}개, 채널 레이어 {options["layer"]})'
+        ))
+        self.stdout.write(f'연결 수립: {elapsed:.1f}s ({count / elapsed:,.0f}/s), asyncio 작업 {len(asyncio.all_tasks()):,}개')
+        self.stdout.write(
+            f'RSS 증가: {grown / 2**20:,.1f}MiB → 연결당 {grown / count / 1024:,.2f}KiB '
+            f'(5만 연결이면 {grown / count * 50000 / 2**20:,.0f}MiB)'
+        )
+        self.report_consumer_state()
+        await self.close(connections, batch)
+        del connections
+
+        if options['no_trace']:
+            return
+        gc.collect()
+        tracemalloc.start(1)
+        before = tracemalloc.take_snapshot()
+        connections = await self.open(app, self.scopes(conversations, count, options['recent']), batch)
+        gc.collect()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        self.report_trace(before, after, count, options['top'])
+        await self.close(connections, batch)
+
+    def report_consumer_state(self):
+        """연결 하나의 consumer 인스턴스에 직접 붙어 있는 상태 크기 (공유 객체는 한 번만)"""
+        consumers = [obj for obj in gc.get_objects() if isinstance(obj, ChatConsumer)]
+        if not consumers:
+            return
+        consumer = consumers[-1]
+        shared = set()
+        state = sys.getsizeof(consumer) + sys.getsizeof(consumer.__dict__)
+        for name, value in vars(consumer).items():
+            # 다른 연결과 같은 객체(인턴된 문자열, 공유 scope 값 등)는 연결당 비용이 아님
+            if any(value is vars(other).get(name) for other in consumers[:8]):
+                shared.add(name)
+                continue
+            state += sys.getsizeof(value)
+        scope = consumer.scope
+        scope_size = sys.getsizeof(scope) + sum(
+            sys.getsizeof(value) for key, value in scope.items()
+            if not any(value is other.scope.get(key) for other in consumers[:8])
+        )
+        self.stdout.write(
+            f'consumer 상태: 속성 {len(vars(consumer))}개, {state:,}B (공유 속성 {len(shared)}개 제외), '
+            f'scope 키 {len(scope)}개 {scope_size:,}B (얕은 크기)'
+        )
+
+    def report_trace(self, before, after, count, top):
+        stats = after.compare_to(before, 'lineno')
+        total = sum(stat.size_diff for stat in stats)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'tracemalloc: 연결당 {total / count:,.0f}B (할당 위치별 상위 {top}개)'
+        ))
+        cwd = os.getcwd()
+        for stat in stats[:top]:
+            frame = stat.traceback[0]
+            filename = frame.filename
+            if filename.startswith(cwd):
+                filename = os.path.relpath(filename, cwd)
+            else:
+                # site-packages 경로는 패키지 이름부터만
+                marker = 'site-packages' + os.sep
+                filename = filename.split(marker, 1)[-1] if marker in filename else filename.replace(sys.prefix, '')
+            self.stdout.write(
+                f'  {stat.size_diff / count:8,.0f}B/연결 {stat.count_diff / count:6.1f}개  {filename}:{frame.lineno}'
+            )
@@ -0,0 +1,29 @@
+from .db_routers import _use_primary, is_sticky
+
+
+class ReplicaStickinessMiddleware:
+    """
+    최근에 쓰기를 한 사용자의 요청은 primary에서 읽도록 고정
+    사용자 식별: X-User-Id 헤더 > user_id 쿼리 파라미터 > URL의 user_id
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            token = getattr(request, '_replica_sticky_token', None)
+            if token is not None:
+                _use_primary.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        user_id = (
+            request.headers.get('X-User-Id')
+            or request.GET.get('user_id')
+            or view_kwargs.get('user_id')
+        )
+        if user_id and is_sticky(user_id):
+            request._replica_sticky_token = _use_primary.set(True)
+        return None
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 import uuid
 
+from .ids import uuid7
+
 
 class Conversation(models.Model):
     """
@@ -13,7 +16,8 @@ class Conversation(models.Model):
     
     # UUID를 Primary Key로 사용하는게 분산 환경에서는 좋겠지만 
     # 혹시 나중에 정수형으로 바꿔야 할 수도 있어서 일단 UUID로...
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # 새 행은 시간 순서 UUIDv7 (InnoDB 기본키 B-tree 끝에 붙음, chat/ids.py), 기존 uuid4 id도 그대로 유효
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     
     # core service의 user 테이블과 연결되는 부분
     # 외래키로 하고 싶지만 MSA에서는 string이 맞는듯
@@ -53,6 +57,10 @@ class Conversation(models.Model):
         ],
         default='user_to_user'
     )
+    
+    # 마지막으로 발급한 메시지 순번 (Message.sequence_number)
+    # 메시지 저장할 때 같은 UPDATE로 1씩 올려서 대화방 안에서 순서가 겹치지 않게 함
+    last_sequence = models.BigIntegerField(default=0)
 
     class Meta:
         # 실제 데이터베이스 테이블명 지정
@@ -85,6 +93,133 @@ class Conversation(models.Model):
         return f"Conversation {self.id}: {self.participant1_id} - {self.participant2_id}"
 
 
+class Attachment(models.Model):
+    """
+    첨부파일 모델
+    이미지/파일 메시지는 내용을 content에 넣지 않고 첨부파일 id로 참조
+    같은 내용(sha256)의 파일은 디스크에 한 번만 저장하고 storage_path를 공유
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # 업로드한 사용자 (core-service의 user_id)
+    uploaded_by = models.CharField(max_length=255)
+
+    # 업로드 시 파일 정보 (다운로드할 때 그대로 사용)
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, default='application/octet-stream')
+    size = models.BigIntegerField()
+
+    # 내용 해시 - 중복 제거 기준
+    sha256 = models.CharField(max_length=64, db_index=True)
+
+    # MEDIA_ROOT 기준 저장 경로 (attachments/ab/cd/<sha256>)
+    storage_path = models.CharField(max_length=255)
+
+    # 이미지 미리보기 (chat/previews.py에서 백그라운드로 채움)
+    # 목록 화면은 원본 대신 썸네일 + blurhash 자리표시로 그림
+    PREVIEW_STATUS = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),  # 이미지가 아닌 파일
+    ]
+    preview_status = models.CharField(max_length=10, choices=PREVIEW_STATUS, default='pending')
+    thumbnail_path = models.CharField(max_length=255, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    blurhash = models.CharField(max_length=64, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'attachments'
+        indexes = [
+            # 미리보기 백필(generate_previews) 대상 조회용
+            models.Index(fields=['preview_status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Attachment {self.id}: {self.file_name} ({self.size} bytes)"
+
+
+class AttachmentUpload(models.Model):
+    """
+    분할 업로드 세션
+    클라이언트는 received_size(오프셋)부터 이어서 청크를 보내면 됨 (네트워크 끊김 대비)
+    """
+
+    UPLOAD_STATUS = [
+        ('uploading', 'Uploading'),
+        ('completed', 'Completed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    uploader_id = models.CharField(max_length=255)
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=255, default='application/octet-stream')
+
+    # 업로드 시작할 때 선언한 전체 크기와 지금까지 받은 크기
+    total_size = models.BigIntegerField()
+    received_size = models.BigIntegerField(default=0)
+
+    status = models.CharField(max_length=10, choices=UPLOAD_STATUS, default='uploading')
+
+    # 완료되면 생성된 첨부파일
+    attachment = models.ForeignKey(Attachment, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'attachment_uploads'
+        indexes = [
+            # 오래된 미완료 업로드 정리용
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.id}: {self.received_size}/{self.total_size}"
+
+
+class MessageQuerySet(models.QuerySet):
+    """
+    메시지 기준 페이지네이션 (created_at이 같은 메시지는 id로 순서를 정해서 경계에서 빠지지 않게)
+    정렬도 같은 기준 ('created_at', 'id') - id는 UUIDv7이라 같은 시각 안에서도 저장 순서와 같음
+    """
+
+    def before(self, message):
+        return self.filter(
+            Q(created_at__lt=message.created_at) | Q(created_at=message.created_at, id__lt=message.id)
+        )
+
+    def after(self, message):
+        return self.filter(
+            Q(created_at__gt=message.created_at) | Q(created_at=message.created_at, id__gt=message.id)
+        )
+
+
+class MessageManager(models.Manager.from_queryset(MessageQuerySet)):
+    """메시지 저장 시 대화방 순번 발급"""
+
+    def create_sequenced(self, conversation_id, **fields):
+        """
+        대화방 순번을 발급해서 메시지 저장
+        대화방 행을 UPDATE로 잠그고 순번을 올리므로 같은 대화방의 동시 전송도 순번이 겹치지 않음
+        (대화방 updated_at도 같이 갱신 - 대화방 목록 최신순 정렬용)
+        대화방이 없으면 Conversation.DoesNotExist, client_msg_id가 중복이면 IntegrityError
+        """
+        db = router.db_for_write(self.model)
+        with transaction.atomic(using=db):
+            updated = Conversation.objects.using(db).filter(id=conversation_id).update(
+                last_sequence=F('last_sequence') + 1, updated_at=timezone.now()
+            )
+            if not updated:
+                raise Conversation.DoesNotExist(conversation_id)
+            sequence = Conversation.objects.using(db).values_list('last_sequence', flat=True).get(id=conversation_id)
+            return self.using(db).create(conversation_id=conversation_id, sequence_number=sequence, **fields)
+
+
 class Message(models.Model):
     """
     메시지 모델
@@ -106,21 +241,25 @@ class Message(models.Model):
 
     # UUID 쓰는게 나은가 고민됨
     # 메시지는 엄청 많이 생길텐데 성능상 어떨까
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # → uuid4는 insert가 기본키 B-tree 전체에 흩어져서 페이지 분할이 많음, 시간 순서 UUIDv7 사용 (chat/ids.py)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     
     # 대화방 참조
     # CASCADE로 해도 되나? 혹시 나중에 대화방 삭제해도 메시지는 남겨둬야 할 수도...
     # 일단 CASCADE로 하고 나중에 필요하면 PROTECT로 변경
-    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages')
+    # 단독 인덱스는 두지 않음 - Meta.indexes의 복합 인덱스가 모두 conversation으로 시작함
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, related_name='messages', db_index=False
+    )
     
     # 발송자 ID - core service의 user와 연결
     # API 호출로 사용자 정보 가져와야 함
-    sender_id = models.CharField(max_length=255, db_index=True)
+    # 발송자만으로 조회하는 경로가 없어서 인덱스 없음 (대화방 안에서는 중복 방지 유니크 제약이 사용)
+    sender_id = models.CharField(max_length=255)
     
     # 메시지 내용
-    # 이미지나 파일은 URL로 저장할 예정
-    # S3나 CDN 경로가 들어갈듯
-    content = models.TextField()
+    # 이미지/파일 메시지는 attachment로 참조하고 content는 캡션으로 사용 (비어 있어도 됨)
+    content = models.TextField(blank=True)
     
     # 메시지 타입
     message_type = models.CharField(max_length=15, choices=MESSAGE_TYPES, default='text')
@@ -142,12 +281,22 @@ class Message(models.Model):
     reply_to = models.ForeignKey('self', null=True, blank=True, on_delete=models.SET_NULL, related_name='replies')
     
     # 브랜드 관련 메시지인 경우
-    # core ERD의 brand와 연결될 수 있음
-    brand_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    # core ERD의 brand와 연결될 수 있음 (브랜드별 조회는 대화방 brand_id 인덱스로)
+    brand_id = models.CharField(max_length=255, null=True, blank=True)
+    
+    # 첨부파일 (이미지/파일 메시지)
+    attachment = models.ForeignKey(Attachment, null=True, blank=True, on_delete=models.SET_NULL, related_name='messages')
     
     # 메시지 순서 보장을 위한 필드
     # 동시에 여러 메시지가 오면 created_at만으로는 순서 보장이 안될 수 있어서
-    sequence_number = models.BigIntegerField(null=True, blank=True, db_index=True)
+    # 순번은 대화방 안에서만 의미가 있으므로 (conversation, sequence_number) 인덱스만 둠
+    sequence_number = models.BigIntegerField(null=True, blank=True)
+    
+    # 클라이언트가 만든 메시지 id (재전송 시 중복 저장 방지)
+    # 같은 대화방에서 같은 보낸 사람의 client_msg_id는 하나만 저장됨
+    client_msg_id = models.CharField(max_length=64, null=True, blank=True)
+
+    objects = MessageManager()
 
     class Meta:
         # 실제 데이터베이스 테이블명
@@ -155,27 +304,31 @@ class Message(models.Model):
         
         # 인덱스 설정
         # 페이지네이션 때문에 인덱스가 정말 중요함
+        # 인덱스마다 insert 한 번에 B-tree 쓰기가 하나씩 늘어나므로 실제 조회 경로에 쓰이는 것만 둠
+        # (조회 경로별 실행 계획/insert 속도: python manage.py bench_message_indexes)
+        # - reply_to, attachment: ForeignKey 기본 인덱스 (답장 참조 해제, 미리보기 알림)
+        # - 발송자/브랜드/메시지 타입/전체 시간순 조회는 사용하는 곳이 없어서 인덱스 제거
         indexes = [
             # 페이지네이션용 - 가장 중요한 인덱스
-            # 대화방별로 시간 역순으로 조회하는 경우가 많음
-            models.Index(fields=['conversation', 'is_deleted', '-created_at']),
-            # 발송자별 메시지 조회용
-            models.Index(fields=['sender_id', 'created_at']),
-            # 메시지 타입별 검색용 (이미지만 보기 등)
-            models.Index(fields=['conversation', 'message_type', 'is_deleted']),
-            # 답장 관련 조회용
-            models.Index(fields=['reply_to']),
-            # 브랜드 관련 메시지 조회용
-            models.Index(fields=['brand_id', 'created_at']),
-            # 순서 보장용 인덱스
-            models.Index(fields=['conversation', 'sequence_number']),
-            # 전체 메시지 시간순 조회 (관리자용)
-            models.Index(fields=['created_at']),
+            # 대화방 안에서 (created_at, id) 순서로 읽으면서 is_deleted는 인덱스 안에서 바로 걸러냄
+            # (MySQL은 조건부 인덱스가 없어서 부분 인덱스 대신 is_deleted를 인덱스 끝에 포함)
+            # 양방향 페이지, 마지막 메시지 서브쿼리, 보관 기간 정리의 id 조회가 정렬 없이 이 인덱스로 처리됨
+            models.Index(fields=['conversation', 'created_at', 'id', 'is_deleted'], name='messages_timeline_idx'),
+            # 순번 범위 재전송 (resume_from, SSE Last-Event-ID)
+            models.Index(fields=['conversation', 'sequence_number'], name='messages_sequence_idx'),
+        ]
+        
+        # 재전송된 메시지 중복 저장 방지 (NULL은 중복 허용 - client_msg_id 없이 보낸 메시지)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['conversation', 'sender_id', 'client_msg_id'],
+                name='uniq_message_client_msg_id',
+            ),
         ]
         
         # 정렬 기본값
         # 최신 메시지가 먼저 오도록
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
 
     def __str__(self):
         """관리자 페이지나 디버깅 시 표시될 문자열"""
@@ -196,17 +349,21 @@ class DeliveryReceipt(models.Model):
         ('read', 'Read'),          # 읽음 (상대방이 메시지를 읽음)
     ]
 
-    # UUID를 Primary Key로 사용
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # UUID를 Primary Key로 사용 (메시지와 같이 시간 순서 UUIDv7)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     
     # 전달 상태를 추적할 메시지 (Foreign Key 관계)
     # on_delete=CASCADE: 메시지가 삭제되면 관련 전달 기록도 모두 삭제
     # related_name='delivery_receipts': Message 객체에서 message.delivery_receipts로 역참조
-    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name='delivery_receipts')
+    # 단독 인덱스는 두지 않음 - (message, user_id) 유니크 제약 인덱스가 message로 시작함
+    message = models.ForeignKey(
+        Message, on_delete=models.CASCADE, related_name='delivery_receipts', db_index=False
+    )
     
     # 메시지를 받을 사용자 ID (core-service의 user_id를 문자열로 참조)
     # 메시지 발송자가 아닌 수신자의 ID를 저장
-    user_id = models.CharField(max_length=255, db_index=True)
+    # 사용자별 조회는 (user_id, status) 인덱스가 처리
+    user_id = models.CharField(max_length=255)
     
     # 현재 전달 상태 (sent, delivered, read 중 하나)
     status = models.CharField(max_length=10, choices=DELIVERY_STATUS, default='sent')
@@ -223,9 +380,8 @@ class DeliveryReceipt(models.Model):
         unique_together = ['message', 'user_id']
         
         # 데이터베이스 인덱스 설정
+        # 특정 메시지의 전달 상태 조회는 위 유니크 제약 인덱스 (message, user_id)가 처리
         indexes = [
-            # 특정 메시지의 모든 전달 상태를 조회할 때 사용
-            models.Index(fields=['message', 'user_id']),
             # 특정 사용자의 읽음 상태들을 조회할 때 사용
             models.Index(fields=['user_id', 'status']),
         ]
@@ -233,3 +389,53 @@ class DeliveryReceipt(models.Model):
     def __str__(self):
         """관리자 페이지나 디버깅 시 표시될 문자열"""
         return f"Receipt {self.id}: {self.message_id} - {self.user_id} ({self.status})"
+
+
+class ActivityRollup(models.Model):
+    """
+    대화방 활동 집계 (시간/일 단위)
+    브랜드별 일일 메시지 수, 유형별 활성 대화방 수 같은 분석 질의를 messages/conversations 전체
+    COUNT/GROUP BY 대신 이 테이블에서 읽음 (chat/rollups.py가 메시지 저장 이벤트로 증분 갱신)
+    """
+
+    SCOPES = [
+        ('all', '전체'),
+        ('type', '대화방 유형'),
+        ('brand', '브랜드'),
+        ('conversation', '대화방'),
+    ]
+    GRANULARITIES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    scope = models.CharField(max_length=12, choices=SCOPES)
+    # 집계 대상 - 대화방 id / brand_id / conversation_type (전체는 빈 문자열)
+    key = models.CharField(max_length=255, blank=True, default='')
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES)
+    # 구간 시작 시각 (settings.TIME_ZONE 기준 정시/자정)
+    period_start = models.DateTimeField()
+
+    message_count = models.BigIntegerField(default=0)
+    # 이 구간에 메시지가 있었던 대화방 수 (대화방 단위 집계는 항상 1)
+    active_conversations = models.BigIntegerField(default=0)
+    # 이 구간에 생성된 대화방 수 (대화방 단위 집계에서는 사용하지 않음)
+    new_conversations = models.BigIntegerField(default=0)
+    last_message_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'activity_rollups'
+        constraints = [
+            # 증분 갱신의 UPDATE 대상 + 특정 대상의 구간 조회 (scope, key, granularity, period_start 범위)
+            models.UniqueConstraint(
+                fields=['scope', 'key', 'granularity', 'period_start'],
+                name='uniq_activity_rollup',
+            ),
+        ]
+        indexes = [
+            # 한 구간의 대상별 목록 (예: 어제 브랜드별 메시지 수)
+            models.Index(fields=['scope', 'granularity', 'period_start'], name='activity_rollup_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"Rollup {self.scope}:{self.key} {self.granularity} {self.period_start:%Y-%m-%d %H:%M}"
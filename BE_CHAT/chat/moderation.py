@@ -0,0 +1,263 @@
+"""
+메시지 금칙어/금지 링크 필터
+금칙어가 수천 개라 패턴마다 정규식을 돌리면 메시지 하나에 수천 번 검색하게 되므로
+Aho-Corasick 오토마톤 하나로 본문을 한 번만 훑어서 모든 금칙어를 같이 찾음
+
+- 정규화: NFKC(전각 → 반각, 분리된 한글 자모 → 완성형) + casefold 후 단어(글자/숫자 묶음)를 공백 하나로 구분
+  폭 없는 공백 같은 보이지 않는 문자는 지우고, 한 글자 단어가 이어지면 붙임 → "바 보", "바.보", "b.a.d"도 같은 단어로 걸림
+  단어 사이 구분은 남겨서 "I was sad"가 "iwassad"가 되어 "ass"에 걸리는 일이 없게 함 (금칙어도 같은 방식으로 정규화)
+- 라틴 문자/숫자만으로 된 금칙어는 단어 단위로만, 한글 등은 단어 안에서도 찾음 ("바보야"는 "바보"에 걸림)
+- 링크: 본문에서 도메인 모양 문자열을 뽑아서 금지 도메인(하위 도메인 포함)인지 확인
+- 목록 파일: 한 줄에 하나, '#' 주석, 'link:example.com'은 금지 도메인
+  파일이 바뀌면 (MODERATION_RELOAD_INTERVAL초마다 수정 시각 확인) 재시작 없이 새 오토마톤으로 교체
+- 검사는 실행기에서 MODERATION_TIMEOUT_MS 안에 끝나야 함 - 넘으면 MODERATION_FAIL_OPEN에 따라 통과/차단
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+
+from .executors import get_executor, run_sync
+
+logger = logging.getLogger(__name__)
+
+# 본문에서 도메인 후보 추출 (정규화 전 casefold한 본문 기준)
+HOST_PATTERN = re.compile(r'(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z]{2,}')
+# 정규화할 때의 단어 (밑줄을 뺀 \w - 글자/숫자 묶음)
+WORD_PATTERN = re.compile(r'[^\W_]+')
+# 서식 문자(폭 없는 공백 등 유니코드 Cf) - 보이지 않으므로 구분자가 아니라 없는 문자로 취급
+FORMAT_CHARS = frozenset(
+    chr(code) for code in range(sys.maxunicode + 1) if unicodedata.category(chr(code)) == 'Cf'
+)
+_DELETE_FORMAT_CHARS = dict.fromkeys(map(ord, FORMAT_CHARS))
+LINK_PREFIX = 'link:'
+
+
+class ContentBlocked(Exception):
+    """금칙어/금지 링크가 들어 있는 메시지"""
+
+    def __init__(self, matches):
+        super().__init__(', '.join(matches))
+        self.matches = matches
+
+    def as_dict(self):
+        # 어떤 단어에 걸렸는지는 알려주지 않음 (목록을 떠보는 데 쓰이지 않도록)
+        return {'error': '허용되지 않는 내용이 포함되어 있습니다.', 'code': 'content_blocked'}
+
+
+def normalize(text):
+    """NFKC + casefold 후 단어를 공백 하나로 구분, 한 글자 단어가 이어지면 붙임 ("바 보" → "바보")"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    if not FORMAT_CHARS.isdisjoint(text):
+        text = text.translate(_DELETE_FORMAT_CHARS)
+    words = []
+    letters = []
+    for word in WORD_PATTERN.findall(text):
+        if len(word) == 1:
+            letters.append(word)
+            continue
+        if letters:
+            words.append(''.join(letters))
+            letters = []
+        words.append(word)
+    if letters:
+        words.append(''.join(letters))
+    return ' '.join(words)
+
+
+def search_key(term):
+    """정규화한 금칙어를 오토마톤에 넣는 형태 - 라틴 문자/숫자만이면 앞뒤 공백을 붙여 단어 단위로만 찾음"""
+    return f' {term} ' if term.isascii() else term
+
+
+def search_text(text):
+    """검사할 본문 (앞뒤 공백을 붙여 첫/마지막 단어도 단어 단위 금칙어에 걸리게)"""
+    return f' {normalize(text)} '
+
+
+class Automaton:
+    """Aho-Corasick 오토마톤 (노드별 전이 dict, 실패 링크, 그 노드에서 끝나는 금칙어)"""
+
+    def __init__(self, terms):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for term in terms:
+            self._add(term)
+        self._build()
+        self.size = len(terms)
+
+    def _add(self, term):
+        node = 0
+        for ch in term:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            node = next_node
+        self._output[node] = (term,)
+
+    def _build(self):
+        # 너비 우선으로 실패 링크 계산, 실패 링크 쪽에서 끝나는 금칙어도 출력에 합쳐둠 (검색 때 링크를 따라가지 않도록)
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                if self._output[self._fail[child]]:
+                    self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text, limit=1):
+        """text에 들어 있는 금칙어 (최대 limit개)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found = []
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found.extend(output[node])
+                if len(found) >= limit:
+                    return found[:limit]
+        return found
+
+
+class ContentFilter:
+    """금칙어 오토마톤 + 금지 도메인, 목록 파일이 바뀌면 다시 읽음"""
+
+    def __init__(self, path=None, reload_interval=5):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked_at = 0
+        self.stats = collections.Counter()
+        self.load([], [])
+        # 첫 메시지 검사가 파일 읽기 때문에 시간 제한을 넘지 않도록 미리 읽음
+        self.maybe_reload()
+
+    def load(self, terms, domains):
+        """목록 교체 (만든 뒤 참조 하나만 바꾸므로 검사 중인 다른 스레드는 이전 목록으로 끝까지 진행)"""
+        normalized = sorted({search_key(term) for term in map(normalize, terms) if term})
+        self._rules = (Automaton(normalized), frozenset(domain.casefold().strip('.') for domain in domains))
+        self.stats['terms'] = len(normalized)
+        self.stats['domains'] = len(self._rules[1])
+
+    def load_file(self, path):
+        terms, domains = [], []
+        with open(path, encoding='utf8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith(LINK_PREFIX):
+                    domains.append(line[len(LINK_PREFIX):].strip())
+                else:
+                    terms.append(line)
+        self.load(terms, domains)
+
+    def maybe_reload(self):
+        if not self.path or time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if time.monotonic() - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+                if mtime == self._mtime:
+                    return
+                self.load_file(self.path)
+            except OSError as e:
+                # 파일을 교체하는 중이거나 잘못된 경로 - 이전 목록 유지
+                self.stats['reload_errors'] += 1
+                logger.warning(f"금칙어 목록을 읽지 못함 (이전 목록 유지): {e!r}")
+                return
+            self._mtime = mtime
+            self.stats['reloads'] += 1
+            logger.info(f"금칙어 목록 적용: 단어 {self.stats['terms']}개, 도메인 {self.stats['domains']}개")
+
+    def find(self, text, limit=1):
+        """걸린 금칙어/도메인 목록 (없으면 빈 목록)"""
+        self.maybe_reload()
+        automaton, domains = self._rules
+        matches = [term.strip() for term in automaton.search(search_text(text), limit)] if automaton.size else []
+        if domains and len(matches) < limit:
+            for host in HOST_PATTERN.findall(unicodedata.normalize('NFKC', text).casefold()):
+                labels = host.split('.')
+                for i in range(len(labels) - 1):
+                    domain = '.'.join(labels[i:])
+                    if domain in domains:
+                        matches.append(f'{LINK_PREFIX}{domain}')
+                        break
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def check(self, text):
+        """금칙어/금지 링크가 있으면 ContentBlocked"""
+        if not text:
+            return
+        self.stats['checked'] += 1
+        matches = self.find(text)
+        if matches:
+            self.stats['blocked'] += 1
+            raise ContentBlocked(matches)
+
+
+_filter = None
+
+
+def get_content_filter():
+    global _filter
+    if _filter is None:
+        _filter = ContentFilter(settings.MODERATION_TERMS_FILE or None, settings.MODERATION_RELOAD_INTERVAL)
+    return _filter
+
+
+def _timed_out(content_filter):
+    content_filter.stats['timeouts'] += 1
+    logger.warning(f"금칙어 검사 시간 초과 ({settings.MODERATION_TIMEOUT_MS}ms)")
+    if not settings.MODERATION_FAIL_OPEN:
+        raise ContentBlocked(['timeout'])
+
+
+async def acheck_content(text):
+    """consumer용 - 실행기에서 검사, 시간 제한을 넘으면 MODERATION_FAIL_OPEN에 따라 통과/차단"""
+    if not settings.MODERATION_ENABLED or not text:
+        return
+    content_filter = get_content_filter()
+    try:
+        await asyncio.wait_for(run_sync(content_filter.check, text), settings.MODERATION_TIMEOUT_MS / 1000)
+    except asyncio.TimeoutError:
+        _timed_out(content_filter)
+
+
+def check_content(text):
+    """REST 요청 스레드용 - 같은 실행기와 시간 제한 사용"""
+    if not settings.MODERATION_ENABLED or not text:
+        return
+    content_filter = get_content_filter()
+    future = get_executor().submit(content_filter.check, text)
+    try:
+        future.result(timeout=settings.MODERATION_TIMEOUT_MS / 1000)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        _timed_out(content_filter)
@@ -0,0 +1,344 @@
+"""
+오프라인 수신자 알림 다이제스트
+메시지를 저장할 때 상대방이 그 대화방에 연결(WebSocket/SSE)되어 있지 않으면 알림 대상으로 기록
+메시지마다 푸시를 보내면 알림 서비스가 감당하지 못하므로 사용자별로 모았다가 한 번에 전송
+
+- 접속 상태(presence): (사용자, 대화방)별 열린 연결
+    local: 이 프로세스의 연결만 (단일 노드/개발용)
+    redis: 노드 전체 공유 - 사용자별 ZSET에 '대화방|채널' 항목, 점수는 만료 시각
+           노드가 죽어서 disconnect가 안 불려도 NOTIFY_PRESENCE_TTL이 지나면 오프라인으로 봄
+           Redis 오류 시에는 오프라인으로 간주 (알림이 빠지는 것보다 한 번 더 가는 게 나음)
+- 다이제스트: 사용자별로 대화방당 한 항목(건수, 순번 범위, 마지막 메시지)만 보관 → 같은 대화방의 연속 메시지는 한 줄로 합쳐짐
+  첫 알림이 쌓인 뒤 NOTIFY_DIGEST_WINDOW초가 지나면 전송, 보내기 직전에 그 사이 접속한 대화방은 제외
+- 본문은 담지 않음 (알림 서비스는 건수/발신자만 표시하거나 API로 조회)
+- 전송 대상(sink)은 settings.NOTIFY_SINK - 기본 LocalNotificationSink는 푸시 서비스 대신 JSON 줄로 기록
+"""
+
+import atexit
+import collections
+import json
+import logging
+import threading
+import time
+
+import structlog
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+event_logger = structlog.get_logger(__name__)
+
+
+class LocalPresence:
+    """이 프로세스의 연결 수 (사용자, 대화방) -> 연결 수"""
+
+    def __init__(self):
+        self._connections = collections.Counter()
+        self._lock = threading.Lock()
+        self.stats = collections.Counter()
+
+    def attach(self, user_id, conversation_id, channel_name):
+        with self._lock:
+            self._connections[(user_id, conversation_id)] += 1
+
+    def detach(self, user_id, conversation_id, channel_name):
+        with self._lock:
+            key = (user_id, conversation_id)
+            self._connections[key] -= 1
+            if self._connections[key] <= 0:
+                del self._connections[key]
+
+    def refresh(self, user_id, conversation_id, channel_name):
+        pass
+
+    def online(self, user_id, conversation_id):
+        return self._connections.get((user_id, conversation_id), 0) > 0
+
+    # consumer용 (이벤트 루프에서 바로 처리)
+    async def aattach(self, user_id, conversation_id, channel_name):
+        self.attach(user_id, conversation_id, channel_name)
+
+    async def adetach(self, user_id, conversation_id, channel_name):
+        self.detach(user_id, conversation_id, channel_name)
+
+    async def arefresh(self, user_id, conversation_id, channel_name):
+        pass
+
+
+class RedisPresence:
+    """노드 전체 공유 접속 상태 (사용자별 ZSET, 항목 '대화방|채널', 점수 = 만료 시각)"""
+
+    def __init__(self, url, ttl=900, prefix='chat:presence:'):
+        self.url = url
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = None
+        self._async_client = None
+        self.stats = collections.Counter()
+
+    def _key(self, user_id):
+        return f'{self.prefix}{user_id}'
+
+    @staticmethod
+    def _member(conversation_id, channel_name):
+        return f'{conversation_id}|{channel_name}'
+
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        return self._client
+
+    def async_client(self):
+        if self._async_client is None:
+            import redis.asyncio
+            self._async_client = redis.asyncio.Redis.from_url(self.url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        return self._async_client
+
+    def online(self, user_id, conversation_id):
+        prefix = f'{conversation_id}|'.encode()
+        try:
+            members = self.client().zrangebyscore(self._key(user_id), time.time(), '+inf')
+        except Exception as e:
+            self._failed(e)
+            return False
+        return any(member.startswith(prefix) for member in members)
+
+    async def aattach(self, user_id, conversation_id, channel_name):
+        await self.arefresh(user_id, conversation_id, channel_name)
+
+    async def arefresh(self, user_id, conversation_id, channel_name):
+        now = time.time()
+        key = self._key(user_id)
+        try:
+            async with self.async_client().pipeline(transaction=False) as pipe:
+                pipe.zadd(key, {self._member(conversation_id, channel_name): now + self.ttl})
+                # 비정상 종료로 남은 항목 정리
+                pipe.zremrangebyscore(key, '-inf', now)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except Exception as e:
+            self._failed(e)
+
+    async def adetach(self, user_id, conversation_id, channel_name):
+        try:
+            await self.async_client().zrem(self._key(user_id), self._member(conversation_id, channel_name))
+        except Exception as e:
+            self._failed(e)
+
+    def _failed(self, error):
+        self.stats['redis_errors'] += 1
+        logger.warning(f"접속 상태 Redis 오류 (오프라인으로 간주): {error!r}")
+
+
+class PendingConversation:
+    """다이제스트의 대화방 한 줄 - 같은 대화방의 메시지는 여기로 합쳐짐"""
+
+    __slots__ = ('count', 'first_sequence', 'last_sequence', 'last_message_id', 'last_sender_id',
+                 'last_message_type', 'last_at')
+
+    def __init__(self, message):
+        self.count = 0
+        self.first_sequence = message.sequence_number
+        self.add(message)
+
+    def add(self, message):
+        self.count += 1
+        self.last_sequence = message.sequence_number
+        self.last_message_id = str(message.id)
+        self.last_sender_id = message.sender_id
+        self.last_message_type = message.message_type
+        self.last_at = message.created_at.isoformat()
+
+    def as_dict(self, conversation_id):
+        return {
+            'conversation_id': conversation_id,
+            'count': self.count,
+            'first_sequence': self.first_sequence,
+            'last_sequence': self.last_sequence,
+            'last_message_id': self.last_message_id,
+            'last_sender_id': self.last_sender_id,
+            'last_message_type': self.last_message_type,
+            'last_at': self.last_at,
+        }
+
+
+class NotificationDigest:
+    """사용자별 대기 알림 + 전송 스레드 (window초마다 모인 알림을 다이제스트 하나로 전송)"""
+
+    def __init__(self, sink, presence, window=60, max_users=100000):
+        self.sink = sink
+        self.presence = presence
+        self.window = window
+        self.max_users = max_users
+        # 사용자 id -> (전송 시각, {대화방 id: PendingConversation}), 먼저 쌓인 사용자가 앞
+        self._pending = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = collections.Counter()
+
+    def add(self, user_id, message):
+        conversation_id = str(message.conversation_id)
+        with self._lock:
+            entry = self._pending.get(user_id)
+            if entry is None:
+                if len(self._pending) >= self.max_users:
+                    self.stats['dropped'] += 1
+                    return
+                entry = self._pending[user_id] = (time.monotonic() + self.window, {})
+            conversations = entry[1]
+            pending = conversations.get(conversation_id)
+            if pending is None:
+                conversations[conversation_id] = PendingConversation(message)
+            else:
+                pending.add(message)
+                self.stats['collapsed'] += 1
+            self.stats['queued'] += 1
+        self._start()
+
+    def discard(self, user_id, conversation_id):
+        """사용자가 대화방에 접속함 - 그 대화방의 대기 알림은 필요 없음"""
+        with self._lock:
+            entry = self._pending.get(user_id)
+            if entry is not None and entry[1].pop(str(conversation_id), None) is not None:
+                self.stats['discarded'] += 1
+                if not entry[1]:
+                    del self._pending[user_id]
+
+    def flush(self, force=False):
+        """전송 시각이 지난 사용자(force면 전부)의 다이제스트 전송, 보낸 다이제스트 수 반환"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._pending:
+                user_id, (deadline, conversations) = next(iter(self._pending.items()))
+                if not force and deadline > now:
+                    break
+                del self._pending[user_id]
+                due.append((user_id, conversations))
+        sent = 0
+        for user_id, conversations in due:
+            items = []
+            for conversation_id, pending in conversations.items():
+                if self.presence.online(user_id, conversation_id):
+                    # 기다리는 동안 (다른 노드에서) 접속함
+                    self.stats['suppressed'] += pending.count
+                    continue
+                items.append(pending.as_dict(conversation_id))
+            if not items:
+                continue
+            digest = {
+                'user_id': user_id,
+                'total': sum(item['count'] for item in items),
+                'conversations': items,
+            }
+            try:
+                self.sink.send(digest)
+            except Exception as e:
+                self.stats['sink_errors'] += 1
+                logger.error(f"알림 다이제스트 전송 실패: user={user_id}, {e!r}")
+                continue
+            self.stats['digests'] += 1
+            self.stats['notifications'] += digest['total']
+            sent += 1
+        return sent
+
+    def snapshot(self):
+        return {'pending_users': len(self._pending), **self.stats}
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='chat-notify-digest', daemon=True)
+            self._thread.start()
+        # 종료할 때 남은 알림도 전송
+        atexit.register(self.flush, force=True)
+
+    def _run(self):
+        # 전송 시각은 window 단위라 1초(짧은 window면 그 1/4) 간격으로 확인하면 충분
+        interval = min(1.0, self.window / 4)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"알림 다이제스트 처리 오류: {e!r}")
+
+
+class LocalNotificationSink:
+    """
+    푸시 서비스 대신 쓰는 로컬 전송 대상
+    다이제스트를 JSON 한 줄씩 파일에 추가하고(path가 있으면), 최근 것은 메모리에 보관
+    """
+
+    def __init__(self, path=None, keep=100):
+        self.path = path
+        self.recent = collections.deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def send(self, digest):
+        self.recent.append(digest)
+        event_logger.info(
+            'notification.digest', user_id=digest['user_id'], total=digest['total'],
+            conversations=len(digest['conversations']),
+        )
+        if self.path:
+            with self._lock, open(self.path, 'a', encoding='utf8') as f:
+                f.write(json.dumps(digest, ensure_ascii=False) + '\n')
+
+
+_presence = None
+_digest = None
+
+
+def get_presence():
+    global _presence
+    if _presence is None:
+        if settings.NOTIFY_PRESENCE_BACKEND == 'redis':
+            _presence = RedisPresence(settings.NOTIFY_PRESENCE_REDIS_URL, ttl=settings.NOTIFY_PRESENCE_TTL)
+        else:
+            _presence = LocalPresence()
+    return _presence
+
+
+def get_digest():
+    global _digest
+    if _digest is None:
+        _digest = NotificationDigest(
+            import_string(settings.NOTIFY_SINK)(**settings.NOTIFY_SINK_OPTIONS),
+            get_presence(),
+            window=settings.NOTIFY_DIGEST_WINDOW,
+            max_users=settings.NOTIFY_DIGEST_MAX_USERS,
+        )
+    return _digest
+
+
+def notify_offline_recipients(message, participants):
+    """
+    메시지 저장 직후 호출 - 보낸 사람이 아닌 참여자 중 이 대화방에 연결이 없는 사용자를 다이제스트에 추가
+    participants: 대화방 참여자 id들 (participant1_id, participant2_id)
+    Redis 접속 상태 조회가 있을 수 있어서 이벤트 루프에서는 실행기로 넘겨서 호출
+    """
+    if not settings.NOTIFY_ENABLED:
+        return
+    presence = get_presence()
+    digest = get_digest()
+    conversation_id = str(message.conversation_id)
+    for user_id in set(participants):
+        if not user_id or user_id == message.sender_id:
+            continue
+        if presence.online(user_id, conversation_id):
+            digest.stats['online'] += 1
+            continue
+        digest.add(user_id, message)
+
+
+def notification_stats():
+    """다이제스트 대기/전송/합친 건수와 접속 상태 오류 수"""
+    return {
+        **(_digest.snapshot() if _digest is not None else {}),
+        **get_presence().stats,
+    }
@@ -0,0 +1,118 @@
+"""
+이미지 미리보기 생성 작업 (프로세스 풀에서 실행)
+spawn된 워커 프로세스에서 import되므로 Django를 import하지 않음 - Pillow만 사용
+
+결과물 경로는 원본 내용 해시 기준이라 같은 이미지를 여러 번 처리해도 결과가 같음 (멱등)
+"""
+
+import math
+import os
+
+BASE83 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+
+# blurhash 계산용 축소 크기 (작아도 결과 차이가 거의 없음)
+BLURHASH_SAMPLE_SIZE = 32
+
+
+class UnprocessableImage(Exception):
+    """이미지로 열 수 없거나 원본이 없음 - 다시 시도해도 결과가 같으므로 재시도하지 않음"""
+
+
+def generate_preview(source_path, thumbnail_path, max_size, blurhash_components=(4, 3)):
+    """
+    썸네일(WebP)을 만들고 원본 크기와 blurhash를 반환
+    thumbnail_path에 이미 파일이 있으면 다시 만들지 않음
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        image = Image.open(source_path)
+    except (FileNotFoundError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise UnprocessableImage(str(e)) from None
+
+    with image:
+        # 휴대폰 사진의 EXIF 회전 정보 반영
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        image = image.convert('RGB')
+        image.thumbnail((max_size, max_size))
+
+        if not os.path.exists(thumbnail_path):
+            os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+            # 다른 워커와 동시에 쓰더라도 반쯤 쓴 파일이 보이지 않도록 임시 파일 후 교체
+            temp_path = f'{thumbnail_path}.{os.getpid()}.tmp'
+            image.save(temp_path, 'WEBP', quality=80, method=4)
+            os.replace(temp_path, thumbnail_path)
+
+        sample = image.resize((BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE))
+        blurhash = encode_blurhash(
+            list(sample.getdata()), BLURHASH_SAMPLE_SIZE, BLURHASH_SAMPLE_SIZE, *blurhash_components
+        )
+
+    return {'width': width, 'height': height, 'blurhash': blurhash}
+
+
+def encode_blurhash(pixels, width, height, x_components, y_components):
+    """blurhash 인코딩 (https://github.com/woltapp/blurhash 알고리즘)"""
+    linear = [(_srgb_to_linear(r), _srgb_to_linear(g), _srgb_to_linear(b)) for r, g, b in pixels]
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            normalisation = 1 if i == 0 and j == 0 else 2
+            r = g = b = 0.0
+            for y in range(height):
+                row = y * width
+                basis_y = cos_y[j][y]
+                for x in range(width):
+                    basis = basis_y * cos_x[i][x]
+                    pr, pg, pb = linear[row + x]
+                    r += basis * pr
+                    g += basis * pg
+                    b += basis * pb
+            scale = normalisation / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    result = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = max(0, min(82, int(math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        result += _base83(quantised_max, 1)
+    else:
+        max_value = 1
+        result += _base83(0, 1)
+
+    result += _base83(
+        (_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4
+    )
+    for factor in ac:
+        quantised = [
+            max(0, min(18, int(math.floor(_sign_pow(value / max_value, 0.5) * 9 + 9.5))))
+            for value in factor
+        ]
+        result += _base83(quantised[0] * 19 * 19 + quantised[1] * 19 + quantised[2], 2)
+    return result
+
+
+def _srgb_to_linear(value):
+    v = value / 255
+    return v / 12.92 if v <= 0.04045 else ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(value):
+    v = max(0.0, min(1.0, value))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * v ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def _base83(value, length):
+    return ''.join(BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
@@ -0,0 +1,226 @@
+"""
+이미지 첨부파일 미리보기(썸네일/크기/blurhash) 생성 파이프라인
+메시지 목록에서 원본 이미지를 통째로 받지 않도록 작은 WebP 썸네일과 자리표시용 blurhash를 만듦
+
+- 이미지 디코딩/리사이즈는 CPU를 오래 쓰므로 ASGI 이벤트 루프나 요청 스레드가 아닌 프로세스 풀에서 실행
+- 대기열 크기 제한 (PREVIEW_QUEUE_SIZE) - 가득 차면 pending으로 남기고 generate_previews 명령으로 백필
+- 실패 시 PREVIEW_MAX_RETRIES번까지 지수 백오프로 재시도, 그래도 실패하면 failed
+- 결과 파일은 원본 sha256 기준 경로라 몇 번을 다시 돌려도 같은 결과 (같은 내용의 다른 첨부파일은 결과 재사용)
+- 완료되면 첨부파일을 참조하는 메시지의 대화방 그룹에 attachment_preview 이벤트 전송
+"""
+
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections
+
+from . import attachments
+from .models import Attachment, Message
+from .preview_worker import UnprocessableImage, generate_preview
+from .serializers import AttachmentSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def is_previewable(content_type):
+    return content_type in settings.PREVIEW_CONTENT_TYPES
+
+
+class PreviewPipeline:
+    """대기열 + 디스패처 스레드 + 프로세스 풀 (디스패처 하나가 작업 하나씩 풀에 맡기고 결과를 저장)"""
+
+    def __init__(self, workers=2, queue_size=1000, max_retries=3, timeout=30, thumbnail_size=320):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.thumbnail_size = thumbnail_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._threads = []
+        self.stats = {'queued': 0, 'dropped': 0, 'ready': 0, 'reused': 0, 'retries': 0, 'failed': 0}
+
+    def enqueue(self, attachment_id, block=False):
+        """미리보기 생성 예약 - 대기열이 가득 차면 False (pending으로 남아서 백필 대상이 됨)"""
+        self._start()
+        try:
+            self._queue.put(attachment_id, block=block)
+        except queue.Full:
+            self.stats['dropped'] += 1
+            logger.warning(f"미리보기 대기열이 가득 참, 나중에 백필: attachment={attachment_id}")
+            return False
+        self.stats['queued'] += 1
+        return True
+
+    def join(self):
+        """대기열의 작업이 모두 끝날 때까지 대기 (백필 명령용)"""
+        self._queue.join()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def snapshot(self):
+        return {'queue_size': self._queue.qsize(), **self.stats}
+
+    def _start(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._run, name=f'chat-preview-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # fork는 부모의 스레드/DB 연결/이벤트 루프 상태를 복사하므로 spawn 사용
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._executor
+
+    def _reset_executor(self, broken):
+        # 워커 프로세스가 죽으면(메모리 초과 등) 풀 전체가 못 쓰게 되므로 새로 만듦
+        with self._lock:
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self):
+        while True:
+            attachment_id = self._queue.get()
+            try:
+                close_old_connections()
+                self.process(attachment_id)
+            except Exception as e:
+                logger.error(f"미리보기 처리 오류: attachment={attachment_id}, {e!r}")
+            finally:
+                close_old_connections()
+                self._queue.task_done()
+
+    def process(self, attachment_id):
+        """첨부파일 하나의 미리보기를 만들고 저장 후 이벤트 전송"""
+        attachment = Attachment.objects.filter(id=attachment_id).first()
+        if attachment is None or attachment.preview_status != 'pending':
+            return
+
+        if not is_previewable(attachment.content_type):
+            Attachment.objects.filter(id=attachment.id).update(preview_status='skipped')
+            return
+
+        # 같은 내용의 이미지가 이미 처리되어 있으면 재사용
+        existing = Attachment.objects.filter(sha256=attachment.sha256, preview_status='ready').exclude(
+            id=attachment.id
+        ).first()
+        if existing is not None and os.path.exists(attachments.media_path(existing.thumbnail_path)):
+            result = {'width': existing.width, 'height': existing.height, 'blurhash': existing.blurhash}
+            thumbnail_path = existing.thumbnail_path
+            self.stats['reused'] += 1
+        else:
+            thumbnail_path = attachments.thumbnail_relative_path(attachment.sha256, self.thumbnail_size)
+            result = self._generate(attachment, thumbnail_path)
+            if result is None:
+                Attachment.objects.filter(id=attachment.id).update(preview_status='failed')
+                self.stats['failed'] += 1
+                return
+
+        attachment.thumbnail_path = thumbnail_path
+        attachment.width = result['width']
+        attachment.height = result['height']
+        attachment.blurhash = result['blurhash']
+        attachment.preview_status = 'ready'
+        attachment.save(update_fields=['thumbnail_path', 'width', 'height', 'blurhash', 'preview_status'])
+        self.stats['ready'] += 1
+        self._notify(attachment)
+
+    def _generate(self, attachment, thumbnail_path):
+        source = attachments.media_path(attachment.storage_path)
+        target = attachments.media_path(thumbnail_path)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats['retries'] += 1
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 10))
+            executor = self._get_executor()
+            try:
+                future = executor.submit(generate_preview, source, target, self.thumbnail_size)
+                return future.result(timeout=self.timeout)
+            except UnprocessableImage as e:
+                logger.info(f"미리보기를 만들 수 없는 파일: attachment={attachment.id}, {e}")
+                return None
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                error = 'worker process died'
+            except Exception as e:
+                error = repr(e)
+            logger.warning(
+                f"미리보기 생성 실패 ({attempt + 1}/{self.max_retries + 1}): attachment={attachment.id}, {error}"
+            )
+        return None
+
+    def _notify(self, attachment):
+        """이 첨부파일을 보낸 메시지가 있는 대화방에 미리보기 준비 알림"""
+        rows = Message.objects.filter(attachment_id=attachment.id, is_deleted=False).order_by().values_list(
+            'id', 'conversation_id'
+        )
+        by_conversation = {}
+        for message_id, conversation_id in rows:
+            by_conversation.setdefault(conversation_id, []).append(str(message_id))
+        if not by_conversation:
+            # 아직 메시지로 보내기 전 - 메시지를 보낼 때 미리보기 정보가 같이 나감
+            return
+
+        channel_layer = get_channel_layer()
+        data = AttachmentSerializer(attachment).data
+        for conversation_id, message_ids in by_conversation.items():
+            try:
+                async_to_sync(channel_layer.group_send)(f'chat_{conversation_id}', {
+                    'type': 'attachment_preview',
+                    'message_ids': message_ids,
+                    'attachment': data,
+                })
+            except Exception as e:
+                logger.warning(f"미리보기 이벤트 전송 실패: conversation={conversation_id}, {e!r}")
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """프로세스 공용 파이프라인 (처음 사용할 때 생성, 스레드/프로세스도 첫 작업 때 시작)"""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = PreviewPipeline(
+                    workers=settings.PREVIEW_WORKERS,
+                    queue_size=settings.PREVIEW_QUEUE_SIZE,
+                    max_retries=settings.PREVIEW_MAX_RETRIES,
+                    timeout=settings.PREVIEW_TIMEOUT,
+                    thumbnail_size=settings.PREVIEW_THUMBNAIL_SIZE,
+                )
+                atexit.register(_pipeline.shutdown)
+    return _pipeline
+
+
+def pipeline_stats():
+    return _pipeline.snapshot() if _pipeline is not None else {}
@@ -0,0 +1,247 @@
+"""
+보낸 사람/대화방 단위 토큰 버킷 rate limit
+한 클라이언트가 chat_message 프레임이나 send_message API를 반복 호출하면 건마다 DB insert + fanout이 생겨서
+노드 전체가 느려지므로, 동작(chat/typing/read)별로 예산을 따로 두고 넘으면 구조화된 오류로 거절
+
+- local: 프로세스 메모리의 버킷 (Redis 왕복 없음, 노드별 한도)
+- redis: 로컬 버킷을 먼저 확인하고(빠른 거절) 통과하면 Redis Lua 스크립트로 노드 전체 한도 확인
+  Redis에서 거절되면 로컬 버킷에서 뺀 토큰은 돌려줌
+  Redis 장애 시에는 로컬 결과만으로 판단 (채팅이 멈추지 않도록), REDIS_RETRY_INTERVAL 동안은 Redis를 건너뜀
+
+예산은 settings.RATE_LIMITS: {동작: {'sender'|'conversation': {'rate': 초당 충전 개수, 'burst': 최대 개수}}}
+"""
+
+import collections
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Redis 오류 후 다시 시도하기까지 로컬 한도만 쓰는 시간 (초)
+REDIS_RETRY_INTERVAL = 5
+
+# 버킷 여러 개를 한 번에 확인하고, 모두 통과할 때만 차감 (일부만 차감되는 일 없음)
+# 노드 간 시계 차이가 없도록 시각은 Redis 서버 시간 사용
+# KEYS: 버킷 키들, ARGV: (rate, burst) * N
+# 반환: {거절된 버킷 번호(0이면 통과), 대기 시간(ms)}
+TOKEN_BUCKET_LUA = """
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local tokens = {}
+    for i=1,#KEYS do
+        local rate = tonumber(ARGV[i * 2 - 1])
+        local burst = tonumber(ARGV[i * 2])
+        local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+        local current = tonumber(state[1]) or burst
+        local ts = tonumber(state[2]) or now
+        current = math.min(burst, current + math.max(0, now - ts) * rate)
+        if current < 1 then
+            return {i, math.ceil((1 - current) / rate * 1000)}
+        end
+        tokens[i] = current
+    end
+    for i=1,#KEYS do
+        local rate = tonumber(ARGV[i * 2 - 1])
+        local burst = tonumber(ARGV[i * 2])
+        redis.call('HSET', KEYS[i], 'tokens', tokens[i] - 1, 'ts', now)
+        redis.call('PEXPIRE', KEYS[i], math.ceil(burst / rate * 1000) + 1000)
+    end
+    return {0, 0}
+"""
+
+
+class RateLimited(Exception):
+    """rate limit 초과 - 소비자/뷰에서 구조화된 오류로 변환"""
+
+    def __init__(self, action, scope, retry_after):
+        self.action = action
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"{action} rate limit exceeded ({scope}), retry after {retry_after:.2f}s")
+
+    def as_dict(self):
+        return {
+            'error': '요청이 너무 많습니다. 잠시 후 다시 시도해주세요.',
+            'code': 'rate_limited',
+            'action': self.action,
+            'scope': self.scope,
+            'retry_after': round(self.retry_after, 3),
+        }
+
+
+@dataclass
+class Bucket:
+    key: str
+    scope: str
+    rate: float
+    burst: float
+
+
+class LocalRateLimiter:
+    """프로세스 메모리 토큰 버킷 (오래 안 쓴 키부터 제거해서 크기 제한)"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # 키 -> [남은 토큰, 마지막 갱신 시각]
+        self._buckets = collections.OrderedDict()
+
+    def hit(self, buckets, now=None):
+        """모두 통과하면 None, 아니면 (거절된 버킷, 대기 시간)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            states = []
+            for bucket in buckets:
+                state = self._buckets.get(bucket.key)
+                if state is None:
+                    state = [bucket.burst, now]
+                else:
+                    self._buckets.move_to_end(bucket.key)
+                tokens = min(bucket.burst, state[0] + (now - state[1]) * bucket.rate)
+                if tokens < 1:
+                    return bucket, (1 - tokens) / bucket.rate
+                states.append((bucket.key, state, tokens))
+            for key, state, tokens in states:
+                state[0] = tokens - 1
+                state[1] = now
+                self._buckets[key] = state
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return None
+
+    def refund(self, buckets):
+        """hit으로 차감한 토큰 1개씩 되돌림 (Redis에서 거절돼 실제로 처리하지 않은 요청)"""
+        with self._lock:
+            for bucket in buckets:
+                state = self._buckets.get(bucket.key)
+                if state is not None:
+                    state[0] = min(bucket.burst, state[0] + 1)
+
+
+class RedisRateLimiter:
+    """여러 노드가 공유하는 Redis 토큰 버킷 (sync/async 클라이언트를 처음 사용할 때 생성)"""
+
+    def __init__(self, url, prefix='chat:ratelimit:'):
+        self.url = url
+        self.prefix = prefix
+        self._client = None
+        self._async_client = None
+
+    def _args(self, buckets):
+        args = []
+        for bucket in buckets:
+            args += [bucket.rate, bucket.burst]
+        return [self.prefix + bucket.key for bucket in buckets], args
+
+    def _result(self, buckets, result):
+        index, wait_ms = int(result[0]), int(result[1])
+        if index == 0:
+            return None
+        return buckets[index - 1], wait_ms / 1000
+
+    def hit(self, buckets):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        keys, args = self._args(buckets)
+        return self._result(buckets, self._client.eval(TOKEN_BUCKET_LUA, len(keys), *keys, *args))
+
+    async def ahit(self, buckets):
+        if self._async_client is None:
+            import redis.asyncio
+            self._async_client = redis.asyncio.Redis.from_url(self.url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        keys, args = self._args(buckets)
+        return self._result(buckets, await self._async_client.eval(TOKEN_BUCKET_LUA, len(keys), *keys, *args))
+
+
+class RateLimiter:
+    """동작별 예산으로 보낸 사람/대화방 버킷을 확인 (초과 시 RateLimited)"""
+
+    def __init__(self, limits, backend='local', redis_url=None):
+        self.limits = limits
+        self.local = LocalRateLimiter()
+        self.shared = RedisRateLimiter(redis_url) if backend == 'redis' else None
+        self._shared_retry_at = 0
+        self.stats = collections.Counter()
+
+    def buckets(self, action, sender_id=None, conversation_id=None):
+        budget = self.limits.get(action, {})
+        buckets = []
+        for scope, ident in (('sender', sender_id), ('conversation', conversation_id)):
+            if ident is None or scope not in budget:
+                continue
+            limit = budget[scope]
+            buckets.append(Bucket(f'{action}:{scope}:{ident}', scope, limit['rate'], limit['burst']))
+        return buckets
+
+    def check(self, action, sender_id=None, conversation_id=None):
+        buckets = self.buckets(action, sender_id, conversation_id)
+        if not buckets:
+            return
+        denied = self.local.hit(buckets)
+        if denied is None and self._use_shared():
+            try:
+                denied = self.shared.hit(buckets)
+            except Exception as e:
+                self._shared_failed(e)
+            else:
+                self._refund_shared_denial(buckets, denied)
+        self._finish(action, denied)
+
+    async def acheck(self, action, sender_id=None, conversation_id=None):
+        buckets = self.buckets(action, sender_id, conversation_id)
+        if not buckets:
+            return
+        # 로컬 확인은 락 하나 잡는 정도라 이벤트 루프에서 바로 실행
+        denied = self.local.hit(buckets)
+        if denied is None and self._use_shared():
+            try:
+                denied = await self.shared.ahit(buckets)
+            except Exception as e:
+                self._shared_failed(e)
+            else:
+                self._refund_shared_denial(buckets, denied)
+        self._finish(action, denied)
+
+    def _use_shared(self):
+        return self.shared is not None and time.monotonic() >= self._shared_retry_at
+
+    def _refund_shared_denial(self, buckets, denied):
+        # 노드 전체 한도에 걸린 요청은 처리하지 않으므로 로컬 버킷에서 뺀 토큰을 돌려줌
+        # (안 돌려주면 거절된 재시도마다 로컬 예산이 줄어서 Redis 한도가 풀린 뒤에도 로컬에서 거절됨)
+        if denied is not None:
+            self.local.refund(buckets)
+            self.stats['local_refunds'] += 1
+
+    def _shared_failed(self, error):
+        self._shared_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+        self.stats['redis_errors'] += 1
+        logger.warning(f"Redis rate limit 확인 실패, 로컬 한도만 적용: {error!r}")
+
+    def _finish(self, action, denied):
+        if denied is None:
+            self.stats['allowed'] += 1
+            return
+        bucket, retry_after = denied
+        self.stats['limited'] += 1
+        self.stats[f'limited_{action}_{bucket.scope}'] += 1
+        raise RateLimited(action, bucket.scope, retry_after)
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    """프로세스 공용 limiter (settings.RATE_LIMITS 기준)"""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter(
+            settings.RATE_LIMITS,
+            backend=settings.RATE_LIMIT_BACKEND,
+            redis_url=settings.RATE_LIMIT_REDIS_URL,
+        )
+    return _limiter
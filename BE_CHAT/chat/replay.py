@@ -0,0 +1,69 @@
+"""
+재접속 시 놓친 메시지 재전송용 버퍼 (프로세스 단위)
+대화방별로 최근 메시지(직렬화된 상태)를 sequence_number 순서로 보관
+재접속한 클라이언트가 last_seq를 보내면 그 이후 메시지를 DB 조회/직렬화 없이 바로 보냄
+
+- 버퍼는 이 프로세스에 그 대화방 연결이 하나라도 붙어 있는 동안만 유지 (연결이 없으면 메시지를 못 받아서 구멍이 생김)
+- 순번이 건너뛰면(채널 용량 초과 등으로 유실) 버퍼를 비우고 다시 시작
+- 요청 구간을 빠짐없이 갖고 있을 때만 사용하고, 아니면 호출한 쪽이 DB에서 조회
+- 모든 호출은 이벤트 루프 스레드에서만 일어나므로 락 없음
+"""
+
+import collections
+
+from django.conf import settings
+
+
+class ReplayBuffers:
+
+    def __init__(self, max_messages=200):
+        self.max_messages = max_messages
+        # 대화방 id -> deque[(sequence_number, 직렬화된 메시지)]
+        self._buffers = {}
+        # 대화방 id -> 이 프로세스의 연결 수
+        self._listeners = collections.Counter()
+        self.stats = collections.Counter()
+
+    def attach(self, conversation_id):
+        self._listeners[conversation_id] += 1
+
+    def detach(self, conversation_id):
+        self._listeners[conversation_id] -= 1
+        if self._listeners[conversation_id] <= 0:
+            del self._listeners[conversation_id]
+            self._buffers.pop(conversation_id, None)
+
+    def record(self, conversation_id, message):
+        """그룹으로 받은 메시지 기록 (같은 프로세스의 연결마다 호출되므로 이미 있는 순번은 무시)"""
+        sequence = message.get('sequence_number')
+        if sequence is None or conversation_id not in self._listeners:
+            return
+        buffer = self._buffers.get(conversation_id)
+        if buffer is None:
+            buffer = self._buffers[conversation_id] = collections.deque(maxlen=self.max_messages)
+        elif sequence <= buffer[-1][0]:
+            return
+        elif sequence != buffer[-1][0] + 1:
+            # 중간 메시지를 못 받음 - 이전 내용은 믿을 수 없으므로 여기서부터 다시 쌓음
+            self.stats['gaps'] += 1
+            buffer.clear()
+        buffer.append((sequence, message))
+
+    def range(self, conversation_id, after, until):
+        """after < 순번 <= until 메시지 목록, 버퍼가 이 구간을 다 갖고 있지 않으면 None"""
+        buffer = self._buffers.get(conversation_id)
+        if not buffer or buffer[0][0] > after + 1 or buffer[-1][0] < until:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        return [message for sequence, message in buffer if after < sequence <= until]
+
+    def snapshot(self):
+        return {
+            'conversations': len(self._buffers),
+            'messages': sum(len(buffer) for buffer in self._buffers.values()),
+            **self.stats,
+        }
+
+
+replay_buffers = ReplayBuffers(settings.CHAT_REPLAY_BUFFER_SIZE)
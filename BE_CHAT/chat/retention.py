@@ -0,0 +1,161 @@
+"""
+메시지 보관 기간 정리 (retention)
+한 번에 DELETE하면 messages → delivery_receipts CASCADE까지 긴 트랜잭션이 되어 MySQL이 몇 분씩 잠기므로
+대화방 단위로 작은 배치를 나눠 지우고 배치 사이에 쉬어서 서비스 트래픽과 같이 돌 수 있게 함
+
+- 정책: settings.RETENTION_POLICIES[대화방 유형]
+    max_age_days: 이보다 오래된 메시지 삭제 (None이면 보관)
+    deleted_grace_days: 소프트 삭제(is_deleted=True)된 뒤 이 기간이 지나면 실제 삭제 (None이면 보관)
+- 대화방을 id 순서로 돌면서 (conversation, created_at, id, is_deleted) 인덱스 범위로 대상 id만 조회
+- 배치마다 한 트랜잭션: 전달 기록 삭제 → 이 메시지에 대한 답장의 reply_to 해제 → 메시지 삭제
+  (ORM delete()의 CASCADE/SET_NULL 수집 과정 없이 인덱스로 바로 처리)
+- 진행 위치(대화방 유형/마지막 대화방 id)를 체크포인트 파일에 저장해서 중단돼도 이어서 실행
+"""
+
+import collections
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import Conversation, DeliveryReceipt, Message
+
+
+class RetentionPurger:
+
+    def __init__(self, policies, batch_size=500, pause=0.1, checkpoint_path=None, max_seconds=None,
+                 dry_run=False, progress=None):
+        self.policies = policies
+        self.batch_size = batch_size
+        self.pause = pause
+        self.checkpoint_path = checkpoint_path
+        self.max_seconds = max_seconds
+        self.dry_run = dry_run
+        # 진행 상황 콜백 (management command 출력용), 인자는 snapshot()
+        self.progress = progress
+        self.db = router.db_for_write(Message)
+        self.stats = collections.Counter()
+        self.started = None
+        self._last_checkpoint = 0
+
+    def run(self):
+        """정책대로 정리, 시간 제한에 걸려 멈췄으면 False (체크포인트에서 이어서 실행)"""
+        self.started = time.monotonic()
+        checkpoint = self.load_checkpoint()
+        now = timezone.now()
+        for conversation_type, policy in self.policies.items():
+            if checkpoint and checkpoint['conversation_type'] != conversation_type:
+                # 체크포인트 이전 유형은 지난 실행에서 끝남
+                continue
+            after = checkpoint['after'] if checkpoint else None
+            checkpoint = None
+            if not self.purge_type(conversation_type, policy, now, after):
+                return False
+        self.clear_checkpoint()
+        return True
+
+    def purge_type(self, conversation_type, policy, now, after=None):
+        age_cutoff = self._cutoff(now, policy.get('max_age_days'))
+        grace_cutoff = self._cutoff(now, policy.get('deleted_grace_days'))
+        if age_cutoff is None and grace_cutoff is None:
+            return True
+        conversations = Conversation.objects.using(self.db).filter(
+            conversation_type=conversation_type
+        ).order_by('id')
+        while True:
+            chunk = conversations.filter(id__gt=after) if after else conversations
+            chunk = list(chunk.values_list('id', 'created_at')[:self.batch_size])
+            for conversation_id, created_at in chunk:
+                # 보관 기간보다 늦게 만든 대화방에는 기간이 지난 메시지가 없음
+                if age_cutoff is not None and created_at < age_cutoff:
+                    self.purge_matching(conversation_id, {'created_at__lt': age_cutoff}, 'expired')
+                if grace_cutoff is not None:
+                    self.purge_matching(
+                        conversation_id, {'is_deleted': True, 'updated_at__lt': grace_cutoff}, 'soft_deleted'
+                    )
+                self.stats['conversations'] += 1
+                after = conversation_id
+                self.save_checkpoint(conversation_type, after)
+                if self._out_of_time():
+                    self.save_checkpoint(conversation_type, after, force=True)
+                    return False
+            if len(chunk) < self.batch_size:
+                return True
+
+    def purge_matching(self, conversation_id, conditions, reason):
+        candidates = Message.objects.using(self.db).filter(conversation_id=conversation_id, **conditions)
+        if self.dry_run:
+            count = candidates.count()
+            self.stats[reason] += count
+            self.stats['messages'] += count
+            return
+        candidates = candidates.order_by('created_at').values_list('id', flat=True)
+        while True:
+            # 지운 행은 다음 조회에서 빠지므로 매번 앞에서부터 배치 크기만큼
+            ids = list(candidates[:self.batch_size])
+            if not ids:
+                return
+            self.delete_batch(ids, reason)
+            if len(ids) < self.batch_size:
+                return
+            time.sleep(self.pause)
+
+    def delete_batch(self, ids, reason):
+        started = time.monotonic()
+        with transaction.atomic(using=self.db):
+            receipts = DeliveryReceipt.objects.using(self.db).filter(message_id__in=ids)._raw_delete(self.db)
+            # 답장은 남기고 원본 참조만 끊음 (on_delete=SET_NULL과 같은 결과)
+            detached = Message.objects.using(self.db).filter(reply_to_id__in=ids).update(reply_to=None)
+            deleted = Message.objects.using(self.db).filter(id__in=ids)._raw_delete(self.db)
+        self.stats[reason] += deleted
+        self.stats['messages'] += deleted
+        self.stats['receipts'] += receipts
+        self.stats['replies_detached'] += detached
+        self.stats['batches'] += 1
+        self.stats['batch_seconds'] += time.monotonic() - started
+        if self.progress and self.stats['batches'] % 20 == 0:
+            self.progress(self.snapshot())
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started if self.started else 0
+        rows = self.stats['messages'] + self.stats['receipts']
+        return {
+            **self.stats,
+            'elapsed': round(elapsed, 2),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed else 0,
+        }
+
+    # 체크포인트 - 대화방 하나를 끝낼 때마다 (최대 1초에 한 번) 기록
+    def load_checkpoint(self):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('conversation_type') not in self.policies:
+            return None
+        return checkpoint
+
+    def save_checkpoint(self, conversation_type, after, force=False):
+        if not self.checkpoint_path or self.dry_run:
+            return
+        if not force and time.monotonic() - self._last_checkpoint < 1:
+            return
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump({'conversation_type': conversation_type, 'after': str(after)}, f)
+        os.replace(temp_path, self.checkpoint_path)
+        self._last_checkpoint = time.monotonic()
+
+    def clear_checkpoint(self):
+        if self.checkpoint_path and not self.dry_run and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def _out_of_time(self):
+        return self.max_seconds is not None and time.monotonic() - self.started >= self.max_seconds
+
+    @staticmethod
+    def _cutoff(now, days):
+        return None if days is None else now - timedelta(days=days)
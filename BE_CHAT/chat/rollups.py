@@ -0,0 +1,370 @@
+"""
+대화방 활동 집계 (activity_rollups)
+브랜드별 일일 메시지 수, 유형별 활성 대화방 수 같은 분석 질의마다 messages/conversations를
+COUNT/GROUP BY 하면 메시지가 쌓일수록 느려지므로, 메시지/대화방 생성 이벤트로 집계 테이블을 증분 갱신
+
+- 집계 단위: (전체 | 대화방 유형 | 브랜드 | 대화방) × (시간 | 일), 구간은 settings.TIME_ZONE 기준 정시/자정
+- 기록: 메시지 저장 이벤트(publish_message_created_event)에서 프로세스 메모리의 (대화방, 구간)별 건수만 더함
+  메시지마다 DB에 쓰지 않고 전송 스레드가 ROLLUP_FLUSH_INTERVAL초마다 한 트랜잭션으로 반영
+- 반영: 행마다 UPDATE ... SET message_count = message_count + n, 갱신된 행이 없으면 INSERT
+  (다른 프로세스가 같은 행을 먼저 INSERT해서 유니크 제약에 걸리면 UPDATE로 다시 시도)
+- 활성 대화방 수: 대화방 단위 행을 이번에 새로 만든 경우에만 그 대화방의 유형/브랜드/전체 행에 1을 더함
+  (다른 프로세스가 먼저 만들었으면 INSERT가 실패하므로 두 번 세지 않음)
+- 대화방 유형/브랜드는 대화방 id별로 캐시 (반영할 때 모르는 id만 primary에서 한 번에 조회)
+- 프로세스가 죽으면 반영 전 건수(최대 ROLLUP_FLUSH_INTERVAL초)는 빠짐 → rebuild_activity_rollups로 구간 재계산
+- 보관 기간 정리(retention)로 지운 메시지는 집계에서 빼지 않음 (생성 시점 기록)
+"""
+
+import atexit
+import collections
+import logging
+import datetime
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, models, router, transaction
+from django.db.models import Count, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest, TruncHour
+from django.utils import timezone
+
+from .db_routers import read_from_primary
+from .models import ActivityRollup, Conversation, Message
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day')
+
+# rebuild_rollups 대상 대화방을 고를 때 updated_at 여유 (메시지 created_at이 updated_at보다 조금 늦음)
+REBUILD_UPDATED_AT_SLACK = datetime.timedelta(minutes=5)
+
+
+def period_starts(moment):
+    """moment가 속한 시간/일 구간 시작 시각 (settings.TIME_ZONE 기준)"""
+    hour = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return {'hour': hour, 'day': hour.replace(hour=0)}
+
+
+def rollup_targets(conversation_type, brand_id):
+    """대화방 하나가 더해지는 상위 집계 대상 (scope, key)"""
+    targets = [('all', ''), ('type', conversation_type)]
+    if brand_id:
+        targets.append(('brand', brand_id))
+    return targets
+
+
+class RollupTotals:
+    """(scope, key, granularity, period_start) -> [메시지 수, 활성 대화방 수, 새 대화방 수, 마지막 메시지 시각]"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, key, messages=0, active=0, new=0, last_at=None):
+        row = self.rows.get(key)
+        if row is None:
+            self.rows[key] = [messages, active, new, last_at]
+            return
+        row[0] += messages
+        row[1] += active
+        row[2] += new
+        if last_at is not None and (row[3] is None or last_at > row[3]):
+            row[3] = last_at
+
+    def items(self):
+        return self.rows.items()
+
+    def __len__(self):
+        return len(self.rows)
+
+
+class RollupRecorder:
+    """프로세스별 대기 건수 + 전송 스레드 (flush_interval초마다, 대기 행이 max_pending을 넘으면 바로 반영)"""
+
+    def __init__(self, flush_interval=10, max_pending=50000, cache_size=100000):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+        # (대화방 id, granularity, period_start) -> [메시지 수, 마지막 메시지 시각]
+        self._messages = {}
+        # 새 대화방 건수 (scope, key, granularity, period_start) -> 건수
+        self._conversations = collections.Counter()
+        # 대화방 id -> (conversation_type, brand_id), 최근에 쓴 것이 뒤
+        self._meta = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # 반영은 한 번에 하나 (atexit와 전송 스레드가 겹치지 않도록)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.stats = collections.Counter()
+
+    def record_message(self, message):
+        conversation_id = str(message.conversation_id)
+        created_at = message.created_at
+        with self._lock:
+            for granularity, period in period_starts(created_at).items():
+                key = (conversation_id, granularity, period)
+                pending = self._messages.get(key)
+                if pending is None:
+                    self._messages[key] = [1, created_at]
+                else:
+                    pending[0] += 1
+                    if created_at > pending[1]:
+                        pending[1] = created_at
+            self.stats['messages'] += 1
+            full = len(self._messages) >= self.max_pending
+        self._start()
+        if full:
+            self._wake.set()
+
+    def record_conversation(self, conversation):
+        targets = rollup_targets(conversation.conversation_type, conversation.brand_id)
+        with self._lock:
+            self._remember(str(conversation.id), (conversation.conversation_type, conversation.brand_id))
+            for granularity, period in period_starts(conversation.created_at).items():
+                for scope, key in targets:
+                    self._conversations[(scope, key, granularity, period)] += 1
+            self.stats['conversations'] += 1
+        self._start()
+
+    def _remember(self, conversation_id, meta):
+        self._meta[conversation_id] = meta
+        self._meta.move_to_end(conversation_id)
+        while len(self._meta) > self.cache_size:
+            self._meta.popitem(last=False)
+
+    def flush(self):
+        """대기 건수를 DB에 반영, 반영한 행 수 반환 (실패하면 다음 주기에 다시 반영)"""
+        with self._flush_lock:
+            with self._lock:
+                messages, self._messages = self._messages, {}
+                conversations, self._conversations = self._conversations, collections.Counter()
+            if not messages and not conversations:
+                return 0
+            try:
+                rows = self._apply(messages, conversations)
+            except Exception as e:
+                self._restore(messages, conversations)
+                self.stats['errors'] += 1
+                logger.error(f"활동 집계 반영 실패 (다음 주기에 다시 반영): {e!r}")
+                return 0
+            self.stats['flushes'] += 1
+            self.stats['rows'] += rows
+            return rows
+
+    def _restore(self, messages, conversations):
+        with self._lock:
+            for key, (count, last_at) in messages.items():
+                pending = self._messages.get(key)
+                if pending is None:
+                    self._messages[key] = [count, last_at]
+                else:
+                    pending[0] += count
+                    pending[1] = max(pending[1], last_at)
+            self._conversations.update(conversations)
+
+    def _apply(self, messages, conversations):
+        meta = self._conversation_meta({conversation_id for conversation_id, _, _ in messages})
+        totals = RollupTotals()
+        for key, count in conversations.items():
+            totals.add(key, new=count)
+        db = router.db_for_write(ActivityRollup)
+        with transaction.atomic(using=db):
+            # 대화방 단위 먼저 - 새로 만든 행이면 이 구간에 처음 활동한 대화방
+            for (conversation_id, granularity, period), (count, last_at) in messages.items():
+                created = upsert_rollup(db, ('conversation', conversation_id, granularity, period), count, 0, 0, last_at)
+                if conversation_id not in meta:
+                    # 이미 삭제된 대화방 - 상위 집계는 건너뜀
+                    self.stats['unknown_conversations'] += 1
+                    continue
+                for scope, key in rollup_targets(*meta[conversation_id]):
+                    totals.add((scope, key, granularity, period), count, int(created), 0, last_at)
+            for key, (count, active, new, last_at) in totals.items():
+                upsert_rollup(db, key, count, active, new, last_at)
+        return len(messages) + len(totals)
+
+    def _conversation_meta(self, conversation_ids):
+        with self._lock:
+            meta = {conversation_id: self._meta[conversation_id]
+                    for conversation_id in conversation_ids if conversation_id in self._meta}
+        missing = list(conversation_ids - meta.keys())
+        if not missing:
+            return meta
+        self.stats['meta_queries'] += 1
+        # 방금 만든 대화방이 레플리카에 아직 없을 수 있음
+        with read_from_primary():
+            for start in range(0, len(missing), 500):
+                rows = Conversation.objects.filter(id__in=missing[start:start + 500]).values_list(
+                    'id', 'conversation_type', 'brand_id'
+                )
+                for conversation_id, conversation_type, brand_id in rows:
+                    meta[str(conversation_id)] = (conversation_type, brand_id)
+        with self._lock:
+            for conversation_id in missing:
+                if conversation_id in meta:
+                    self._remember(conversation_id, meta[conversation_id])
+        return meta
+
+    def snapshot(self):
+        return {'pending_rows': len(self._messages) + len(self._conversations), **self.stats}
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='chat-activity-rollups', daemon=True)
+            self._thread.start()
+        # 종료할 때 남은 건수도 반영
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            # 오래 쉬는 스레드라 끊긴 DB 연결을 요청 주기처럼 정리
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"활동 집계 처리 오류: {e!r}")
+
+
+def upsert_rollup(db, key, messages=0, active=0, new=0, last_at=None):
+    """집계 행 하나에 더함, 이번에 새로 만들었으면 True"""
+    scope, rollup_key, granularity, period = key
+    rows = ActivityRollup.objects.using(db).filter(
+        scope=scope, key=rollup_key, granularity=granularity, period_start=period
+    )
+    changes = {
+        'message_count': F('message_count') + messages,
+        'active_conversations': F('active_conversations') + active,
+        'new_conversations': F('new_conversations') + new,
+    }
+    if last_at is not None:
+        value = Value(last_at, output_field=models.DateTimeField())
+        changes['last_message_at'] = Greatest(Coalesce('last_message_at', value), value)
+    if rows.update(**changes):
+        return False
+    try:
+        with transaction.atomic(using=db):
+            ActivityRollup.objects.using(db).create(
+                scope=scope, key=rollup_key, granularity=granularity, period_start=period,
+                message_count=messages,
+                # 대화방 단위 행은 그 구간에 활동한 대화방 자신 하나
+                active_conversations=1 if scope == 'conversation' else active,
+                new_conversations=new,
+                last_message_at=last_at,
+            )
+    except IntegrityError:
+        # 다른 프로세스가 먼저 만듦
+        rows.update(**changes)
+        return False
+    return True
+
+
+def rebuild_rollups(since, until, batch_size=1000):
+    """
+    [since, until) 구간의 집계를 messages/conversations에서 다시 계산해서 교체 (since/until은 자정)
+    메시지는 created_at 단독 인덱스가 없으므로 (42번에서 제거) 대화방 단위로 messages_timeline_idx
+    (conversation, created_at) 범위를 읽음 - 대상 대화방은 updated_at 인덱스로 이 구간 이후에 갱신된 것만
+    (메시지를 저장하면 대화방 updated_at이 올라가므로 구간 안에 메시지가 있는 대화방은 모두 포함됨)
+    집계 쿼리는 대화방 batch_size개마다 한 번 (대화방·시간별 GROUP BY), 일 단위와 상위 집계는 그 결과로 계산
+    반환: 새로 쓴 행 수
+    """
+    tz = timezone.get_current_timezone()
+    totals = RollupTotals()
+    # 순번 발급(updated_at 갱신) 직후에 메시지 created_at이 정해지므로 자정 직전 갱신도 포함되도록 여유를 둠
+    candidates = Conversation.objects.filter(
+        updated_at__gte=since - REBUILD_UPDATED_AT_SLACK
+    ).order_by('id').values_list('id', 'conversation_type', 'brand_id')
+    batch = []
+    for row in candidates.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            rebuild_conversation_activity(totals, batch, since, until, tz)
+            batch = []
+    if batch:
+        rebuild_conversation_activity(totals, batch, since, until, tz)
+
+    created = (
+        Conversation.objects.filter(created_at__gte=since, created_at__lt=until)
+        .annotate(period=TruncHour('created_at', tzinfo=tz))
+        .values('conversation_type', 'brand_id', 'period')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    for row in created.iterator(chunk_size=batch_size):
+        hour = timezone.localtime(row['period'], tz)
+        for scope, key in rollup_targets(row['conversation_type'], row['brand_id']):
+            totals.add((scope, key, 'hour', hour), new=row['count'])
+            totals.add((scope, key, 'day', hour.replace(hour=0)), new=row['count'])
+
+    db = router.db_for_write(ActivityRollup)
+    with transaction.atomic(using=db):
+        ActivityRollup.objects.using(db).filter(period_start__gte=since, period_start__lt=until).delete()
+        ActivityRollup.objects.using(db).bulk_create(
+            (
+                ActivityRollup(
+                    scope=scope, key=key, granularity=granularity, period_start=period,
+                    message_count=count, active_conversations=active, new_conversations=new,
+                    last_message_at=last_at,
+                )
+                for (scope, key, granularity, period), (count, active, new, last_at) in totals.items()
+            ),
+            batch_size=batch_size,
+        )
+    return len(totals)
+
+
+def rebuild_conversation_activity(totals, conversations, since, until, tz):
+    """대화방 묶음의 [since, until) 메시지 건수를 시간/일 단위로 totals에 더함 (대화방마다 timeline 인덱스 범위 조회)"""
+    meta = {str(conversation_id): (conversation_type, brand_id)
+            for conversation_id, conversation_type, brand_id in conversations}
+    hourly = (
+        Message.objects.filter(
+            conversation_id__in=[conversation_id for conversation_id, _, _ in conversations],
+            created_at__gte=since, created_at__lt=until,
+        )
+        .annotate(period=TruncHour('created_at', tzinfo=tz))
+        .values('conversation_id', 'period')
+        .annotate(count=Count('id'), last_at=Max('created_at'))
+        .order_by()
+    )
+    for row in hourly:
+        conversation_id = str(row['conversation_id'])
+        hour = timezone.localtime(row['period'], tz)
+        targets = rollup_targets(*meta[conversation_id])
+        for granularity, period in (('hour', hour), ('day', hour.replace(hour=0))):
+            key = ('conversation', conversation_id, granularity, period)
+            # 대화방 단위 행은 구간마다 한 번만 활성으로 셈 (일 단위는 시간 행 여러 개가 합쳐짐)
+            active = int(key not in totals.rows)
+            totals.add(key, row['count'], active, 0, row['last_at'])
+            for scope, rollup_key in targets:
+                totals.add((scope, rollup_key, granularity, period), row['count'], active, 0, row['last_at'])
+
+
+_recorder = None
+
+
+def get_recorder():
+    global _recorder
+    if _recorder is None:
+        _recorder = RollupRecorder(settings.ROLLUP_FLUSH_INTERVAL, settings.ROLLUP_MAX_PENDING)
+    return _recorder
+
+
+def record_message_activity(message):
+    """메시지 저장 직후 호출 (메모리에 건수만 더함)"""
+    if settings.ROLLUPS_ENABLED:
+        get_recorder().record_message(message)
+
+
+def record_conversation_activity(conversation):
+    """대화방 생성 직후 호출"""
+    if settings.ROLLUPS_ENABLED:
+        get_recorder().record_conversation(conversation)
+
+
+def rollup_stats():
+    """대기 행 수, 반영 횟수/행 수, 실패 횟수"""
+    return _recorder.snapshot() if _recorder is not None else {}
@@ -1,9 +1,17 @@
 from django.urls import path
 from . import consumers
+from .auth import TokenAuthMiddleware
 
 # WebSocket URL 라우팅 설정 (Django Channels)
 websocket_urlpatterns = [
     # 실시간 채팅용 WebSocket 엔드포인트
     # ws://localhost:8000/ws/chat/{conversation_id}/ 형태로 연결
     path('ws/chat/<uuid:conversation_id>/', consumers.ChatConsumer.as_asgi()),
-]
\ No newline at end of file
+]
+# HTTP 스트리밍 URL 라우팅 (Django 뷰보다 먼저 매칭, 나머지 HTTP 요청은 Django로)
+http_urlpatterns = [
+    # WebSocket이 막힌 클라이언트용 Server-Sent Events (폴링 대신 연결 하나 유지)
+    # EventSource는 헤더를 못 붙이므로 토큰은 ?token=
+    path('api/chat/conversations/<uuid:conversation_id>/events/',
+         TokenAuthMiddleware(consumers.ChatEventStreamConsumer.as_asgi())),
+]
@@ -1,17 +1,78 @@
 from rest_framework import serializers
 from rest_framework.pagination import PageNumberPagination
-from .models import Conversation, Message, DeliveryReceipt
+from django.conf import settings
+from django.urls import reverse
+from .models import Conversation, Message, DeliveryReceipt, Attachment, AttachmentUpload
+
+
+class AttachmentSerializer(serializers.ModelSerializer):
+    """첨부파일 직렬화 클래스 - 메시지에 포함되는 첨부파일 정보"""
+
+    # 썸네일이 준비되기 전에는 None (준비되면 attachment_preview 이벤트로 알림)
+    thumbnail_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Attachment
+        fields = ['id', 'file_name', 'content_type', 'size', 'sha256', 'preview_status',
+                  'thumbnail_url', 'width', 'height', 'blurhash', 'created_at']
+        read_only_fields = fields
+
+    def get_thumbnail_url(self, obj):
+        if obj.preview_status != 'ready':
+            return None
+        return reverse('attachment-thumbnail', kwargs={'attachment_id': obj.id})
+
+
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    """분할 업로드 세션 직렬화 클래스"""
+    
+    offset = serializers.IntegerField(source='received_size', read_only=True)
+    attachment = AttachmentSerializer(read_only=True)
+    
+    class Meta:
+        model = AttachmentUpload
+        fields = ['id', 'uploader_id', 'file_name', 'content_type', 'total_size', 'offset', 'status', 'attachment']
+        read_only_fields = ['id', 'offset', 'status', 'attachment']
+    
+    def validate_content_type(self, value):
+        """허용 목록에 있는 형식만 (파라미터는 떼고 소문자로 저장)"""
+        content_type = value.split(';', 1)[0].strip().lower()
+        if content_type not in settings.ATTACHMENT_ALLOWED_CONTENT_TYPES:
+            raise serializers.ValidationError(f'허용되지 않는 파일 형식입니다: {content_type}')
+        return content_type
 
 
 class MessageSerializer(serializers.ModelSerializer):
     """메시지 직렬화 클래스 - JSON과 모델 간 변환"""
     
+    # 응답에는 첨부파일 정보를, 요청에는 첨부파일 id(attachment_id)를 사용
+    attachment = AttachmentSerializer(read_only=True)
+    attachment_id = serializers.PrimaryKeyRelatedField(
+        source='attachment', queryset=Attachment.objects.all(),
+        write_only=True, required=False, allow_null=True
+    )
+    
     class Meta:
         model = Message
         # API 응답에 포함될 필드들
-        fields = ['id', 'sender_id', 'content', 'message_type', 'created_at', 'updated_at', 'is_deleted']
+        fields = ['id', 'sender_id', 'content', 'message_type', 'attachment', 'attachment_id', 'client_msg_id', 'sequence_number', 'created_at', 'updated_at', 'is_deleted']
         # 읽기 전용 필드들 (API 요청시 수정 불가)
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'sequence_number', 'created_at', 'updated_at']
+    
+    def validate_client_msg_id(self, value):
+        """빈 문자열은 id 없음(NULL)으로 저장 - ''로 저장되면 다음 전송이 중복으로 처리됨 (웹소켓과 동일)"""
+        return value or None
+    
+    def validate(self, attrs):
+        """내용이나 첨부파일 중 하나는 있어야 함"""
+        if not attrs.get('content') and not attrs.get('attachment'):
+            raise serializers.ValidationError('content 또는 attachment_id가 필요합니다.')
+        return attrs
+    
+    def create(self, validated_data):
+        """대화방 순번을 발급해서 저장 (웹소켓 전송과 같은 경로)"""
+        conversation = validated_data.pop('conversation')
+        return Message.objects.create_sequenced(conversation_id=conversation.id, **validated_data)
 
 
 class ConversationSerializer(serializers.ModelSerializer):
@@ -31,12 +92,50 @@ class ConversationSerializer(serializers.ModelSerializer):
     def get_last_message(self, obj):
         """대화방의 마지막 메시지를 반환하는 메서드"""
         # 삭제되지 않은 메시지 중 가장 최근 메시지 조회
-        last_message = obj.messages.filter(is_deleted=False).order_by('-created_at').first()
+        last_message = obj.messages.filter(is_deleted=False).order_by('-created_at', '-id').first()
         if last_message:
             return MessageSerializer(last_message).data
         return None
 
 
+class MessageSummarySerializer(serializers.ModelSerializer):
+    """대화방 요약용 마지막 메시지 (첨부파일/읽음 상태 없이)"""
+    
+    class Meta:
+        model = Message
+        fields = ['id', 'sender_id', 'content', 'message_type', 'attachment_id', 'sequence_number', 'created_at']
+        read_only_fields = fields
+
+
+class ConversationSummarySerializer(serializers.ModelSerializer):
+    """
+    다른 서비스용 대화방 요약 - 메시지 목록 없이 메타데이터만
+    fields 인자로 필요한 필드만 골라서 직렬화 (없으면 DEFAULT_FIELDS)
+    last_message는 뷰에서 미리 조회해서 obj.latest_message에 붙여둔 메시지를 사용 (추가 쿼리 없음)
+    """
+    
+    DEFAULT_FIELDS = ['id', 'participant1_id', 'participant2_id', 'conversation_type', 'updated_at']
+    
+    last_message = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Conversation
+        fields = ['id', 'participant1_id', 'participant2_id', 'conversation_type', 'brand_id', 'is_active',
+                  'created_at', 'updated_at', 'last_sequence', 'last_message']
+        read_only_fields = fields
+    
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in set(self.fields) - set(fields or self.DEFAULT_FIELDS):
+            self.fields.pop(name)
+    
+    def get_last_message(self, obj):
+        message = getattr(obj, 'latest_message', None)
+        if message is not None:
+            return MessageSummarySerializer(message).data
+        return None
+
+
 class DeliveryReceiptSerializer(serializers.ModelSerializer):
     """메시지 읽음 확인 직렬화 클래스"""
     
@@ -50,10 +149,11 @@ class MessagePaginatedSerializer(serializers.ModelSerializer):
     """페이지네이션용 메시지 직렬화 클래스 - 읽음 상태 포함"""
     
     delivery_status = serializers.SerializerMethodField()
+    attachment = AttachmentSerializer(read_only=True)
     
     class Meta:
         model = Message
-        fields = ['id', 'sender_id', 'content', 'message_type', 'created_at', 'updated_at', 'delivery_status']
+        fields = ['id', 'sender_id', 'content', 'message_type', 'attachment', 'sequence_number', 'created_at', 'updated_at', 'delivery_status']
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_delivery_status(self, obj):
@@ -82,7 +182,7 @@ class ConversationDetailSerializer(serializers.ModelSerializer):
     
     def get_last_message(self, obj):
         """대화방의 마지막 메시지를 반환"""
-        last_message = obj.messages.filter(is_deleted=False).order_by('-created_at').first()
+        last_message = obj.messages.filter(is_deleted=False).order_by('-created_at', '-id').first()
         if last_message:
             return MessagePaginatedSerializer(last_message).data
         return None
@@ -0,0 +1,172 @@
+"""
+비동기 구조화 로깅 (structlog + QueueHandler/QueueListener)
+기존 FileHandler는 로그를 남기는 스레드(이벤트 루프, 요청 스레드)에서 바로 디스크에 써서
+디스크가 느려지면 consumer/요청 처리도 같이 멈춤
+
+- 호출한 쪽: structlog 프로세서(레벨 필터/샘플링/내용 가리기/시각)만 실행하고 큐에 넣음
+  큐가 가득 차면(디스크가 계속 느림) 기다리지 않고 버린 뒤 개수만 셈
+- 리스너 스레드: 한 줄짜리 JSON으로 변환해서 파일/콘솔에 씀
+- stdlib logging.getLogger()로 남긴 기존 로그도 같은 핸들러를 거쳐 JSON으로 기록
+
+settings.LOGGING에서 핸들러로 사용하고, structlog 설정은 ChatConfig.ready()에서 configure() 호출
+이 모듈은 logging 설정 단계(앱 로딩 전)에 import되므로 Django 모델을 import하지 않음
+"""
+
+import atexit
+import collections
+import copy
+import logging
+import logging.handlers
+import queue
+import random
+from datetime import datetime, timezone
+
+import structlog
+
+# 기본 샘플링 비율 (이벤트 이름 -> 남길 비율), 경고 이상은 항상 남김
+DEFAULT_SAMPLE_RATES = {
+    'message.created': 0.1,
+}
+# 값을 가리는 키 (메시지 본문, 인증 정보)
+DEFAULT_REDACT_KEYS = ('content', 'token', 'password', 'authorization')
+
+stats = collections.Counter()
+_handlers = []
+
+
+def add_record_time(logger, method_name, event_dict):
+    """기존 logging 레코드는 기록 시점이 아니라 로그를 남긴 시점(record.created)을 사용"""
+    created = datetime.fromtimestamp(event_dict['_record'].created, tz=timezone.utc)
+    event_dict['timestamp'] = created.isoformat().replace('+00:00', 'Z')
+    return event_dict
+
+
+def json_formatter():
+    """리스너 스레드에서 레코드를 한 줄 JSON으로 변환하는 포매터 (settings.LOGGING의 '()'로 사용)"""
+    return structlog.stdlib.ProcessorFormatter(
+        processors=[
+            structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(separators=(',', ':'), ensure_ascii=False),
+        ],
+        # structlog를 거치지 않은 기존 logging 호출용
+        foreign_pre_chain=[
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            add_record_time,
+        ],
+    )
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    레코드를 크기 제한 큐에 넣기만 하는 핸들러 (호출한 스레드는 디스크 I/O를 기다리지 않음)
+    실제 쓰기는 QueueListener 스레드의 파일/콘솔 핸들러가 담당
+    """
+
+    def __init__(self, filename=None, console=False, queue_size=10000):
+        super().__init__(queue.Queue(maxsize=queue_size))
+        targets = []
+        if filename:
+            targets.append(logging.FileHandler(filename, encoding='utf8', delay=True))
+        if console:
+            targets.append(logging.StreamHandler())
+        for target in targets:
+            target.setFormatter(json_formatter())
+        self.listener = logging.handlers.QueueListener(self.queue, *targets, respect_handler_level=True)
+        self.listener.start()
+        _handlers.append(self)
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # 기본 구현은 여기서 포맷까지 하지만, JSON 변환은 리스너 스레드로 미룸
+        # 인자만 확정해서 (나중에 바뀔 수 있는 객체를 참조하지 않도록) 복사본을 큐에 넣음
+        record = copy.copy(record)
+        if not isinstance(record.msg, dict):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            stats['dropped'] += 1
+        else:
+            stats['queued'] += 1
+
+    def stop(self):
+        """남은 레코드를 모두 쓰고 리스너 종료 (여러 번 호출해도 됨)"""
+        if self.listener._thread is not None:
+            self.listener.stop()
+            for target in self.listener.handlers:
+                target.close()
+
+    def close(self):
+        self.stop()
+        super().close()
+
+
+class EventSampler:
+    """이벤트 이름별 비율만큼만 남기는 structlog 프로세서 (경고 이상은 항상 남김)"""
+
+    ALWAYS = ('warning', 'warn', 'error', 'exception', 'critical')
+
+    def __init__(self, rates):
+        self.rates = rates
+
+    def __call__(self, logger, method_name, event_dict):
+        rate = self.rates.get(event_dict.get('event'))
+        if rate is None or rate >= 1 or method_name in self.ALWAYS:
+            return event_dict
+        if random.random() >= rate:
+            stats['sampled_out'] += 1
+            raise structlog.DropEvent
+        event_dict['sample_rate'] = rate
+        return event_dict
+
+
+class Redactor:
+    """지정한 키의 값을 길이만 남기고 가리는 structlog 프로세서 (중첩 dict 포함)"""
+
+    def __init__(self, keys):
+        self.keys = frozenset(keys)
+
+    def __call__(self, logger, method_name, event_dict):
+        return self._redact(event_dict)
+
+    def _redact(self, data):
+        for key, value in data.items():
+            if key in self.keys and value is not None:
+                data[key] = f'[redacted:{len(str(value))}]'
+            elif isinstance(value, dict):
+                data[key] = self._redact(dict(value))
+        return data
+
+
+def configure(sample_rates=None, redact_keys=None):
+    """structlog를 stdlib logging(→ QueueLogHandler)으로 연결"""
+    structlog.configure(
+        processors=[
+            structlog.stdlib.filter_by_level,  # 꺼진 레벨은 나머지 처리 없이 바로 버림
+            EventSampler(DEFAULT_SAMPLE_RATES if sample_rates is None else sample_rates),
+            Redactor(DEFAULT_REDACT_KEYS if redact_keys is None else redact_keys),
+            structlog.stdlib.add_log_level,
+            structlog.stdlib.add_logger_name,
+            structlog.processors.TimeStamper(fmt='iso', utc=True),
+            # 예외 정보는 호출한 스레드에서만 알 수 있으므로 여기서 문자열로 변환
+            structlog.processors.format_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+
+def logging_stats():
+    """큐 적재/버림/샘플링 횟수와 현재 대기 중인 레코드 수"""
+    return {
+        'pending': sum(handler.queue.qsize() for handler in _handlers),
+        **stats,
+    }
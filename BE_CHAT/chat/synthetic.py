@@ -0,0 +1,426 @@
+"""
+성능 작업용 합성 데이터 (seed_chat_data, bench_message_indexes)
+대화방마다 메시지 수가 비슷한 균등한 시드로는 실제 부하(소수의 큰 대화방, 인기 브랜드 상담방, 읽지 않은 꼬리)가 재현되지 않으므로
+운영 분포를 흉내 낸 데이터를 같은 시드면 같은 내용으로 생성
+
+- 대화방 크기: 파레토(α≈1.16, 80/20) - 대부분 몇 개~수십 개, 소수가 수천~수만 개 (한 대화방은 전체의 2%까지)
+- 사용자/브랜드 인기도: 앞 번호일수록 자주 뽑히는 거듭제곱 분포 → 활동 많은 사용자, 상담이 몰리는 인기 브랜드
+  브랜드 상담방은 전체의 brand_share, 인기 브랜드일수록 대화방도 큼
+- 메시지 간격: 대화 중(85%)은 평균 40초, 대화 사이(15%)는 평균 8시간 - days 기간 안에 들어가도록 대화방마다 맞춤
+- 메시지 종류: 텍스트 대부분, 이미지 6%/파일 2%(첨부파일 행 포함, 일부는 같은 파일 공유), 스티커/위치, 브랜드방의 브랜드 카드
+- 답장 4% (같은 대화방 최근 20개 중), 소프트 삭제 2%, client_msg_id 85%
+- 전달 기록: 수신자 한 명, 대화방 끝의 읽지 않은 몇 개를 빼고 읽음 (읽은 시각은 메시지 뒤 평균 10분)
+- id는 메시지 시각으로 만든 UUIDv7 (운영처럼 id 순서 ≈ 시간 순서)
+- 행은 모델 필드 순서로 executemany (ORM 객체를 만들지 않음), batch_size 행마다 트랜잭션 하나
+  sqlite/MySQL 모두 Django 값 변환(adapt_*)을 거치므로 DB별 형식 차이 없음
+"""
+
+import collections
+import datetime
+import math
+import operator
+import random
+import time
+import uuid
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import Attachment, Conversation, DeliveryReceipt, Message
+
+# 대화방 하나의 최대 크기 (전체 메시지 대비)
+MAX_CONVERSATION_SHARE = 0.02
+
+
+def popular_index(rng, count, skew=3.0):
+    """0..count-1 중 하나, 앞 번호일수록 자주 (skew가 클수록 쏠림)"""
+    return min(count - 1, int(count * rng.random() ** skew))
+
+
+def synthetic_uuid7(moment, rng):
+    """moment 시각의 UUIDv7 (chat/ids.py와 같은 비트 구성, 나머지 비트는 rng)"""
+    timestamp_ms = int(moment.timestamp() * 1000)
+    return uuid.UUID(int=(timestamp_ms << 80) | (0x7 << 76) | (rng.getrandbits(12) << 64)
+                     | (0b10 << 62) | rng.getrandbits(62))
+
+
+class RowWriter:
+    """모델 하나의 INSERT executemany (필드 attname -> 값 dict → 필드 순서 튜플 → DB 값)"""
+
+    def __init__(self, model, using):
+        self.connection = connections[using]
+        fields = model._meta.concrete_fields
+        ops = self.connection.ops
+        columns = ', '.join(ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        self.sql = f'INSERT INTO {ops.quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})'
+        self.values = operator.itemgetter(*(field.attname for field in fields))
+        self.converters = [self._converter(field) for field in fields]
+        # 변환이 필요한 컬럼만 (문자열/정수/불리언은 드라이버가 그대로 받음)
+        self.converted = [(index, converter) for index, converter in enumerate(self.converters) if converter]
+
+    def _converter(self, field):
+        connection = self.connection
+        internal_type = field.target_field.get_internal_type() if field.is_relation else field.get_internal_type()
+        if internal_type == 'UUIDField' and not connection.features.has_native_uuid_field:
+            return lambda value: value.hex if value is not None else None
+        if internal_type == 'DateTimeField':
+            return connection.ops.adapt_datetimefield_value
+        if internal_type in ('CharField', 'TextField', 'BigIntegerField', 'PositiveIntegerField', 'BooleanField'):
+            return None
+        return lambda value: field.get_db_prep_save(value, connection)
+
+    def write(self, rows):
+        if not rows:
+            return
+        params = []
+        for row in rows:
+            values = list(self.values(row))
+            for index, converter in self.converted:
+                values[index] = converter(values[index])
+            params.append(values)
+        with self.connection.cursor() as cursor:
+            cursor.executemany(self.sql, params)
+
+
+class SyntheticDataset:
+
+    def __init__(self, messages=100000, conversations=None, users=None, brands=50, brand_share=0.2, days=180,
+                 end=None, seed=42, prefix='seed_', batch_size=5000, receipts=True, progress=None):
+        self.total_messages = messages
+        self.conversation_count = conversations or max(1, messages // 40)
+        self.user_count = users or max(2, self.conversation_count // 2)
+        self.brand_count = max(1, brands)
+        self.brand_share = brand_share
+        self.days = days
+        # 같은 시드로 같은 데이터가 나오도록 끝 시각도 고정 (기본: 오늘 자정, settings.TIME_ZONE)
+        self.end = end or timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time()))
+        self.seed = seed
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.receipts = receipts
+        # 진행 상황 콜백 (management command 출력용), 인자는 snapshot()
+        self.progress = progress
+        self.db = router.db_for_write(Message)
+        self.stats = collections.Counter()
+        self.started = None
+        self.sizes = []
+        self.brand_sizes = collections.Counter()
+
+    def generate(self):
+        """데이터 생성, 만든 대화방 id 목록 반환 (대화방 크기 큰 순)"""
+        self.started = time.monotonic()
+        # prefix도 시드에 섞음 - 같은 시드로 prefix만 다르게 여러 벌 만들어도 id가 겹치지 않음
+        rng = random.Random(f'{self.prefix}:{self.seed}')
+        self.vocabulary = self._vocabulary(rng)
+        plans = self.plan_conversations(rng)
+        self.write_conversations(plans)
+        writers = {
+            'messages': RowWriter(Message, self.db),
+            'receipts': RowWriter(DeliveryReceipt, self.db),
+            'attachments': RowWriter(Attachment, self.db),
+        }
+        buffers = {name: [] for name in writers}
+        shared_files = []
+        for plan in plans:
+            for message, receipt, attachment in self.conversation_messages(rng, plan, shared_files):
+                if attachment is not None:
+                    buffers['attachments'].append(attachment)
+                buffers['messages'].append(message)
+                if receipt is not None:
+                    buffers['receipts'].append(receipt)
+                if len(buffers['messages']) >= self.batch_size:
+                    self.flush(writers, buffers)
+        self.flush(writers, buffers)
+        self.touch_conversations(plans)
+        self.sizes = [plan['size'] for plan in plans]
+        self.brand_sizes = collections.Counter()
+        for plan in plans:
+            if plan['brand_id']:
+                self.brand_sizes[plan['brand_id']] += plan['size']
+        return [plan['id'] for plan in sorted(plans, key=lambda plan: -plan['size'])]
+
+    def _vocabulary(self, rng):
+        words = [''.join(chr(0xAC00 + rng.randrange(11172)) for _ in range(rng.randint(1, 4))) for _ in range(3000)]
+        words += ['ㅋㅋㅋ', 'ㅎㅎ', '네', '감사합니다', 'ok', '👍', '😂', '?', '!!', 'https://www.example.com/item/123']
+        return words
+
+    def plan_conversations(self, rng):
+        """대화방별 참여자/유형/크기/시작 시각"""
+        weights = []
+        plans = []
+        pairs = set()
+        for index in range(self.conversation_count):
+            weight = rng.paretovariate(1.16)
+            if rng.random() < self.brand_share:
+                brand = popular_index(rng, self.brand_count, 2.0)
+                brand_id = f'{self.prefix}brand{brand}'
+                pair = (self._user(rng), brand_id)
+                # 인기 브랜드 상담방은 더 큼
+                weight *= 1 + 4 / (brand + 1)
+                conversation_type = 'user_to_brand'
+            else:
+                brand_id = None
+                pair = (self._user(rng), self._user(rng))
+                conversation_type = 'user_to_user'
+            for _ in range(10):
+                if pair[0] != pair[1] and pair not in pairs and pair[::-1] not in pairs:
+                    break
+                pair = (self._user(rng), pair[1]) if brand_id else (self._user(rng), self._user(rng))
+            else:
+                # 사용자 수에 비해 대화방이 너무 많음 - 새 사용자로
+                pair = (f'{self.prefix}user_extra{index}', pair[1])
+            pairs.add(pair)
+            weights.append(weight)
+            plans.append({
+                'participants': pair,
+                'brand_id': brand_id,
+                'conversation_type': conversation_type,
+                'start': self.end - datetime.timedelta(seconds=rng.random() * self.days * 86400),
+            })
+        for plan, size in zip(plans, self.conversation_sizes(weights)):
+            plan['size'] = size
+            plan['id'] = synthetic_uuid7(plan['start'], rng)
+        return plans
+
+    def conversation_sizes(self, weights):
+        """가중치 비율로 전체 메시지 수를 나눔 (대화방마다 1개 이상, 한 대화방 상한)
+        상한에 걸려 남은 메시지는 상한 아래 대화방에 다시 가중치 비율로, 반올림 차이는 큰 대화방부터 1개씩 조정"""
+        cap = max(1, int(self.total_messages * MAX_CONVERSATION_SHARE))
+        sizes = [0] * len(weights)
+        remaining = self.total_messages
+        while remaining > 0:
+            open_indexes = [index for index, size in enumerate(sizes) if size < cap]
+            if not open_indexes:
+                break
+            scale = remaining / sum(weights[index] for index in open_indexes)
+            for index in open_indexes:
+                sizes[index] = min(cap, sizes[index] + int(weights[index] * scale))
+            added = self.total_messages - sum(sizes)
+            if added == remaining:
+                # 한 번에 1개도 못 나눌 만큼 남음 - 큰 대화방부터 1개씩
+                for index in sorted(open_indexes, key=lambda index: -weights[index])[:remaining]:
+                    sizes[index] += 1
+                break
+            remaining = added
+        # 빈 대화방은 1개로 (그만큼 큰 대화방에서 뺌)
+        excess = 0
+        for index, size in enumerate(sizes):
+            if not size:
+                sizes[index] = 1
+                excess += 1
+        for index in sorted(range(len(weights)), key=lambda index: -weights[index]):
+            if not excess:
+                break
+            taken = min(excess, sizes[index] - 1)
+            sizes[index] -= taken
+            excess -= taken
+        return sizes
+
+    def _user(self, rng):
+        return f'{self.prefix}user{popular_index(rng, self.user_count)}'
+
+    def message_times(self, rng, plan):
+        """대화방 메시지 시각 (시작 ~ 기간 끝 안으로 맞춤)"""
+        gaps = [rng.expovariate(1 / 40) if rng.random() < 0.85 else rng.expovariate(1 / 28800)
+                for _ in range(plan['size'] - 1)]
+        available = (self.end - plan['start']).total_seconds() - 1
+        span = sum(gaps)
+        factor = min(1.0, available / span) if span else 1.0
+        moment = plan['start']
+        times = [moment]
+        for gap in gaps:
+            moment += datetime.timedelta(seconds=gap * factor)
+            times.append(moment)
+        return times
+
+    def write_conversations(self, plans):
+        writer = RowWriter(Conversation, self.db)
+        rows = []
+        for plan in plans:
+            participant1_id, participant2_id = plan['participants']
+            rows.append({
+                'id': plan['id'],
+                'participant1_id': participant1_id,
+                'participant2_id': participant2_id,
+                'created_at': plan['start'],
+                # 마지막 메시지 시각은 메시지를 만들 때 정해지므로 여기서는 시작 시각, 끝나고 한 번에 갱신
+                'updated_at': plan['start'],
+                'is_active': True,
+                'brand_id': plan['brand_id'],
+                'conversation_type': plan['conversation_type'],
+                'last_sequence': plan['size'],
+            })
+        with transaction.atomic(using=self.db):
+            for start in range(0, len(rows), self.batch_size):
+                writer.write(rows[start:start + self.batch_size])
+        self.stats['conversations'] += len(rows)
+
+    def conversation_messages(self, rng, plan, shared_files):
+        """(메시지 행, 전달 기록 행 또는 None, 첨부파일 행 또는 None) 생성"""
+        times = self.message_times(rng, plan)
+        participants = plan['participants']
+        is_brand = plan['brand_id'] is not None
+        unread = 0 if rng.random() < 0.7 else rng.randint(1, 10)
+        recent = collections.deque(maxlen=20)
+        sender = rng.randrange(2)
+        for sequence, created_at in enumerate(times, start=1):
+            # 60%는 상대가 이어서 말함
+            if rng.random() < 0.6:
+                sender = 1 - sender
+            sender_id, recipient_id = participants[sender], participants[1 - sender]
+            message_id = synthetic_uuid7(created_at, rng)
+            message_type, attachment = self._message_type(rng, is_brand, sender_id, created_at, shared_files)
+            deleted = rng.random() < 0.02
+            message = {
+                'id': message_id,
+                'conversation_id': plan['id'],
+                'sender_id': sender_id,
+                'content': self._content(rng) if message_type in ('text', 'image') else '',
+                'message_type': message_type,
+                'created_at': created_at,
+                'updated_at': created_at + datetime.timedelta(minutes=rng.randint(1, 600)) if deleted else created_at,
+                'is_deleted': deleted,
+                'reply_to_id': rng.choice(recent) if recent and rng.random() < 0.04 else None,
+                'brand_id': plan['brand_id'] if message_type == 'brand_card' else None,
+                'attachment_id': attachment['id'] if attachment else None,
+                'sequence_number': sequence,
+                'client_msg_id': f'{rng.getrandbits(128):032x}' if rng.random() < 0.85 else None,
+            }
+            recent.append(message_id)
+            receipt = None
+            if self.receipts:
+                read = sequence <= plan['size'] - unread
+                receipt = {
+                    'id': synthetic_uuid7(created_at, rng),
+                    'message_id': message_id,
+                    'user_id': recipient_id,
+                    'status': 'read' if read else rng.choice(('sent', 'delivered')),
+                    'timestamp': created_at + datetime.timedelta(seconds=rng.expovariate(1 / 600)) if read else created_at,
+                }
+            yield message, receipt, attachment
+        plan['last_at'] = times[-1]
+
+    def _message_type(self, rng, is_brand, sender_id, created_at, shared_files):
+        roll = rng.random()
+        if roll < 0.06:
+            return 'image', self._attachment(rng, sender_id, created_at, shared_files, image=True)
+        if roll < 0.08:
+            return 'file', self._attachment(rng, sender_id, created_at, shared_files, image=False)
+        if roll < 0.105:
+            return 'sticker', None
+        if roll < 0.11:
+            return 'location', None
+        if is_brand and roll < 0.14:
+            return 'brand_card', None
+        return 'text', None
+
+    def _attachment(self, rng, sender_id, created_at, shared_files, image):
+        # 10%는 이미 올라온 파일을 다시 보냄 (같은 sha256 → 저장 경로 공유)
+        if shared_files and rng.random() < 0.1:
+            sha256, size = rng.choice(shared_files)
+        else:
+            sha256 = f'{rng.getrandbits(256):064x}'
+            size = int(rng.lognormvariate(12.5, 1.2)) + 1
+            if len(shared_files) < 1000:
+                shared_files.append((sha256, size))
+        return {
+            'id': uuid.UUID(int=rng.getrandbits(128), version=4),
+            'uploaded_by': sender_id,
+            'file_name': f'{sha256[:8]}.{"jpg" if image else "pdf"}',
+            'content_type': 'image/jpeg' if image else 'application/pdf',
+            'size': size,
+            'sha256': sha256,
+            'storage_path': f'attachments/{sha256[:2]}/{sha256[2:4]}/{sha256}',
+            'preview_status': 'ready' if image else 'skipped',
+            'thumbnail_path': f'attachments/thumbnails/{sha256}.webp' if image else '',
+            'width': rng.choice((1080, 1440, 3024)) if image else None,
+            'height': rng.choice((1080, 1920, 4032)) if image else None,
+            'blurhash': '',
+            'created_at': created_at,
+        }
+
+    def _content(self, rng):
+        length = max(1, int(rng.lognormvariate(1.3, 0.8)))
+        return ' '.join(rng.choice(self.vocabulary) for _ in range(length))
+
+    def flush(self, writers, buffers):
+        if not buffers['messages']:
+            return
+        with transaction.atomic(using=self.db):
+            # 외래키 순서 - 첨부파일 → 메시지(답장은 같은 대화방의 앞 메시지라 이미 있거나 같은 배치) → 전달 기록
+            writers['attachments'].write(buffers['attachments'])
+            writers['messages'].write(buffers['messages'])
+            writers['receipts'].write(buffers['receipts'])
+        self.stats['messages'] += len(buffers['messages'])
+        self.stats['receipts'] += len(buffers['receipts'])
+        self.stats['attachments'] += len(buffers['attachments'])
+        self.stats['batches'] += 1
+        for rows in buffers.values():
+            rows.clear()
+        if self.progress and self.stats['batches'] % 20 == 0:
+            self.progress(self.snapshot())
+
+    def touch_conversations(self, plans):
+        """대화방 updated_at을 마지막 메시지 시각으로 (대화방 목록 정렬 기준)"""
+        connection = connections[self.db]
+        ops = connection.ops
+        sql = (f'UPDATE {ops.quote_name(Conversation._meta.db_table)} SET {ops.quote_name("updated_at")} = %s '
+               f'WHERE {ops.quote_name("id")} = %s')
+        convert_id = RowWriter(Conversation, self.db).converters[0] or (lambda value: value)
+        params = [(ops.adapt_datetimefield_value(plan['last_at']), convert_id(plan['id'])) for plan in plans]
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            for start in range(0, len(params), self.batch_size):
+                cursor.executemany(sql, params[start:start + self.batch_size])
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return {
+            **self.stats,
+            'elapsed': round(elapsed, 2),
+            'rows_per_sec': round((self.stats['messages'] + self.stats['receipts']) / elapsed, 1) if elapsed else 0,
+        }
+
+
+    def distribution(self):
+        """만든 데이터의 분포 요약 (대화방 크기, 브랜드 상담방 비중, 상위 5개 브랜드 비중)"""
+        brand_total = sum(self.brand_sizes.values())
+        top_brands = sum(size for _, size in self.brand_sizes.most_common(5))
+        return {
+            **size_summary(self.sizes),
+            'brand_message_share': round(brand_total / (sum(self.sizes) or 1), 3),
+            'top5_brand_share': round(top_brands / brand_total, 3) if brand_total else 0,
+        }
+
+
+def size_summary(sizes):
+    """대화방 크기 분포 요약 (p50/p90/p99/최대, 상위 1% 대화방의 메시지 비중)"""
+    sizes = sorted(sizes)
+    total = sum(sizes) or 1
+    top = sizes[-max(1, math.ceil(len(sizes) / 100)):]
+
+    def percentile(p):
+        return sizes[min(len(sizes) - 1, int(len(sizes) * p))]
+    return {
+        'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99), 'max': sizes[-1],
+        'top1pct_share': round(sum(top) / total, 3),
+    }
+
+
+def delete_dataset(prefix, using=None):
+    """prefix로 만든 합성 데이터 삭제 (대화방 단위로 전달 기록 → 메시지 → 대화방, 첨부파일), 지운 메시지 수 반환"""
+    using = using or router.db_for_write(Message)
+    conversation_ids = list(Conversation.objects.using(using).filter(
+        participant1_id__startswith=prefix
+    ).values_list('id', flat=True))
+    deleted = 0
+    for start in range(0, len(conversation_ids), 100):
+        chunk = conversation_ids[start:start + 100]
+        with transaction.atomic(using=using):
+            messages = Message.objects.using(using).filter(conversation_id__in=chunk)
+            DeliveryReceipt.objects.using(using).filter(message__conversation_id__in=chunk)._raw_delete(using)
+            messages.exclude(reply_to=None).update(reply_to=None)
+            deleted += messages._raw_delete(using)
+            Conversation.objects.using(using).filter(id__in=chunk)._raw_delete(using)
+    Attachment.objects.using(using).filter(uploaded_by__startswith=prefix)._raw_delete(using)
+    return deleted
@@ -1,3 +1,445 @@
-from django.test import TestCase
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import ApplicationCommunicator, WebsocketCommunicator
+from django.db import close_old_connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from . import attachments, db_routers
+from .auth import TokenAuthMiddleware, issue_token
+from .history_import import ChatHistoryImporter
+from .ratelimit import RateLimited, RateLimiter
+from .consumers import ChatEventStreamConsumer
+from .models import Attachment, AttachmentUpload, Conversation, Message
+from .moderation import ContentFilter
+from .replay import replay_buffers
+from .routing import http_urlpatterns, websocket_urlpatterns
+
+IN_MEMORY_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+def websocket_app():
+    return TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+
+def sse_app():
+    return URLRouter(http_urlpatterns)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, CHAT_WS_AUTH_REQUIRED=True)
+class ConversationAccessTests(TransactionTestCase):
+    """토큰이 유효해도 대화방 참여자가 아니면 WebSocket/SSE 모두 거절"""
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(participant1_id='alice', participant2_id='bob')
+
+    async def connect_websocket(self, user_id):
+        communicator = WebsocketCommunicator(
+            websocket_app(), f'/ws/chat/{self.conversation.id}/?token={issue_token(user_id)}'
+        )
+        connected, code = await communicator.connect()
+        return communicator, connected, code
+
+    async def open_sse(self, user_id):
+        path = f'/api/chat/conversations/{self.conversation.id}/events/'
+        communicator = ApplicationCommunicator(sse_app(), {
+            'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': f'token={issue_token(user_id)}'.encode(), 'headers': [],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        return communicator, await communicator.receive_output(timeout=3)
+
+    async def test_websocket_participant_connects(self):
+        communicator, connected, _ = await self.connect_websocket('alice')
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+    async def test_websocket_non_participant_rejected(self):
+        communicator, connected, code = await self.connect_websocket('mallory')
+        self.assertFalse(connected)
+        self.assertEqual(code, 4403)
+
+    async def test_sse_participant_streams(self):
+        communicator, start = await self.open_sse('bob')
+        self.assertEqual(start['status'], 200)
+        await communicator.send_input({'type': 'http.disconnect'})
+        await communicator.wait(timeout=3)
+
+    async def test_sse_non_participant_rejected(self):
+        communicator, start = await self.open_sse('mallory')
+        self.assertEqual(start['status'], 403)
+        await communicator.wait(timeout=3)
+
+    @override_settings(SSE_HEARTBEAT_INTERVAL=0.2)
+    async def test_sse_token_expiry_leaves_group_and_stops(self):
+        open_streams = ChatEventStreamConsumer.stats['open']
+        path = f'/api/chat/conversations/{self.conversation.id}/events/'
+        communicator = ApplicationCommunicator(sse_app(), {
+            'type': 'http', 'method': 'GET', 'path': path,
+            'query_string': f'token={issue_token("bob", ttl=1)}'.encode(), 'headers': [],
+        })
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        self.assertEqual((await communicator.receive_output(timeout=3))['status'], 200)
+        self.assertIn(str(self.conversation.id), replay_buffers._listeners)
+
+        # 토큰이 만료되면 오류 이벤트 후 본문을 끝내고, http.disconnect 없이도 그룹/버퍼/접속 상태에서 빠지고 종료
+        while True:
+            chunk = await communicator.receive_output(timeout=5)
+            if not chunk.get('more_body'):
+                break
+            last_body = chunk['body']
+        self.assertIn(b'token_expired', last_body)
+        await communicator.wait(timeout=3)
+        self.assertNotIn(str(self.conversation.id), replay_buffers._listeners)
+        self.assertEqual(ChatEventStreamConsumer.stats['open'], open_streams)
+        layer = get_channel_layer()
+        self.assertFalse(layer.groups.get(f'chat_{self.conversation.id}'))
+
+
+class AttachmentTests(TestCase):
+    """분할 업로드 오프셋 처리와 다운로드 응답 형식"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        overrides = override_settings(MEDIA_ROOT=media_root, ATTACHMENT_CHUNK_SIZE=1000)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def start_upload(self, content_type, total_size):
+        return self.client.post('/api/chat/attachments/uploads/', {
+            'uploader_id': 'alice', 'file_name': 'a.bin', 'content_type': content_type, 'total_size': total_size,
+        }, content_type='application/json')
+
+    def send_chunk(self, upload_id, offset, data):
+        return self.client.patch(
+            f'/api/chat/attachments/uploads/{upload_id}/', data,
+            content_type='application/octet-stream', headers={'Upload-Offset': str(offset)},
+        )
+
+    def stored_attachment(self, content_type, data=b'<script>alert(1)</script>'):
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = attachments.blob_relative_path(sha256)
+        os.makedirs(os.path.dirname(attachments.media_path(path)))
+        with open(attachments.media_path(path), 'wb') as f:
+            f.write(data)
+        return Attachment.objects.create(
+            uploaded_by='alice', file_name='a.html', content_type=content_type, size=len(data),
+            sha256=sha256, storage_path=path, preview_status='skipped',
+        )
+
+    def test_upload_rejects_executable_content_type(self):
+        for content_type in ('text/html', 'image/svg+xml', 'application/javascript'):
+            self.assertEqual(self.start_upload(content_type, 10).status_code, 400, content_type)
+        response = self.start_upload('Image/PNG; charset=binary', 10)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['content_type'], 'image/png')
+
+    def test_chunks_complete_and_stale_retry_conflicts(self):
+        data = os.urandom(2500)
+        upload_id = self.start_upload('application/zip', len(data)).json()['id']
+        self.assertEqual(self.send_chunk(upload_id, 0, data[:1000]).json()['offset'], 1000)
+
+        # 이미 반영된 오프셋으로 다시 보낸 청크는 409, 반영된 내용은 그대로
+        response = self.send_chunk(upload_id, 0, b'stale')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 1000)
+        with open(attachments.upload_temp_path(upload_id), 'rb') as f:
+            self.assertEqual(f.read(), data[:1000])
+
+        self.send_chunk(upload_id, 1000, data[1000:2000])
+        result = self.send_chunk(upload_id, 2000, data[2000:]).json()
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['attachment']['sha256'], hashlib.sha256(data).hexdigest())
+        # 요청별 청크 파일은 남지 않음
+        self.assertEqual(glob.glob(attachments.upload_chunk_path(upload_id, '*')), [])
+
+    def test_concurrent_chunk_loses_compare_and_set(self):
+        data = os.urandom(1500)
+        upload_id = self.start_upload('application/zip', len(data)).json()['id']
+        receive_chunk = attachments.receive_chunk
+
+        def receive_while_other_request_commits(*args):
+            # 본문을 받는 동안 같은 오프셋의 다른 요청이 먼저 반영함
+            result = receive_chunk(*args)
+            AttachmentUpload.objects.filter(id=upload_id).update(received_size=1000)
+            return result
+
+        with mock.patch.object(attachments, 'receive_chunk', receive_while_other_request_commits):
+            response = self.send_chunk(upload_id, 0, data[:1000])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 1000)
+        # 진 요청은 업로드 파일에 쓰지 않고 청크 파일도 남기지 않음
+        self.assertFalse(os.path.exists(attachments.upload_temp_path(upload_id)))
+        self.assertEqual(glob.glob(attachments.upload_chunk_path(upload_id, '*')), [])
+
+    def test_unsafe_type_downloads_as_attachment(self):
+        attachment = self.stored_attachment('text/html')
+        response = self.client.get(f'/api/chat/attachments/{attachment.id}/')
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment;'))
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+    def test_raster_image_served_inline(self):
+        attachment = self.stored_attachment('image/png', b'\x89PNG fake')
+        response = self.client.get(f'/api/chat/attachments/{attachment.id}/')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response['Content-Disposition'].startswith('inline;'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_0'])
+class ReplicaStickinessTests(TestCase):
+    """consumer용 sticky 기록/확인은 공유 캐시(동기 Redis)를 이벤트 루프 밖에서 호출"""
+
+    def setUp(self):
+        db_routers._local_sticky.clear()
+        self.addCleanup(db_routers._local_sticky.clear)
+        self.cache_threads = []
+        fake_cache = mock.Mock()
+        fake_cache.set.side_effect = lambda *args, **kwargs: self.cache_threads.append(threading.get_ident())
+        fake_cache.get.side_effect = lambda *args, **kwargs: self.cache_threads.append(threading.get_ident()) or 1
+        patcher = mock.patch.object(db_routers, 'cache', fake_cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_async_stickiness_runs_cache_calls_off_the_loop(self):
+        loop_thread = threading.get_ident()
+        # 다른 노드에서 쓴 사용자 - 로컬 기록이 없어서 공유 캐시를 조회
+        async with db_routers.asticky_reads('alice'):
+            self.assertTrue(db_routers._use_primary.get())
+        await db_routers.arecord_write('bob')
+        self.assertEqual(len(self.cache_threads), 2)
+        self.assertNotIn(loop_thread, self.cache_threads)
+        self.assertFalse(db_routers._use_primary.get())
+
+    async def test_local_write_skips_shared_lookup(self):
+        await db_routers.arecord_write('alice')
+        self.cache_threads.clear()
+        self.assertTrue(await db_routers.ais_sticky('alice'))
+        self.assertEqual(self.cache_threads, [])
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS)
+class SendMessageTests(TestCase):
+    """REST 메시지 전송의 client_msg_id 중복 처리"""
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(participant1_id='alice', participant2_id='bob')
+
+    def send(self, **data):
+        return self.client.post(
+            f'/api/chat/conversations/{self.conversation.id}/messages/send/',
+            {'sender_id': 'alice', 'content': 'hi', **data}, content_type='application/json',
+        )
+
+    def test_empty_client_msg_id_is_not_deduplicated(self):
+        first = self.send(client_msg_id='')
+        second = self.send(client_msg_id='')
+        self.assertEqual((first.status_code, second.status_code), (201, 201))
+        self.assertNotEqual(first.json()['id'], second.json()['id'])
+        self.assertIsNone(first.json()['client_msg_id'])
+
+    def test_retry_with_client_msg_id_returns_stored_message(self):
+        first = self.send(client_msg_id='m-1')
+        retry = self.send(client_msg_id='m-1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(first.json()['id'], retry.json()['id'])
+
+    def test_retry_is_answered_before_rate_limit(self):
+        limiter = RateLimiter({'chat': {'sender': {'rate': 0.001, 'burst': 1}}})
+        with mock.patch('chat.views.get_rate_limiter', return_value=limiter):
+            first = self.send(client_msg_id='m-1')
+            # 예산을 다 쓴 뒤에도 이미 저장된 메시지의 재전송은 기존 메시지로 응답
+            retry = self.send(client_msg_id='m-1')
+            limited = self.send(client_msg_id='m-2')
+        self.assertEqual((first.status_code, retry.status_code, limited.status_code), (201, 200, 429))
+        self.assertEqual(first.json()['id'], retry.json()['id'])
+
+
+class RateLimiterTests(TestCase):
+    """로컬 버킷 + 공유(Redis) 버킷 조합"""
+
+    def test_shared_denial_refunds_local_bucket(self):
+        limiter = RateLimiter({'chat': {'sender': {'rate': 0.001, 'burst': 2}}})
+        limiter.shared = mock.Mock()
+        buckets = limiter.buckets('chat', 'alice')
+        # 노드 전체 한도에 걸린 요청은 로컬 예산을 쓰지 않음
+        limiter.shared.hit.return_value = (buckets[0], 1.0)
+        for _ in range(3):
+            with self.assertRaises(RateLimited):
+                limiter.check('chat', 'alice')
+        limiter.shared.hit.return_value = None
+        limiter.check('chat', 'alice')
+        limiter.check('chat', 'alice')
+        self.assertEqual(limiter.shared.hit.call_count, 5)
+        with self.assertRaises(RateLimited):
+            limiter.check('chat', 'alice')
+        self.assertEqual(limiter.shared.hit.call_count, 5)
+
+
+class HistoryImportTests(TestCase):
+    """옛 메시지는 실시간 메시지가 없는 대화방에만 가져옴 (순번이 실시간 메시지보다 커지지 않도록)"""
+
+    def write_rows(self, rows):
+        fd, path = tempfile.mkstemp(suffix='.jsonl')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, 'w') as f:
+            for index, (first, second) in enumerate(rows):
+                f.write(json.dumps({
+                    'legacy_id': f'm-{index}', 'participants': [first, second], 'sender_id': first,
+                    'content': f'old {index}', 'created_at': f'2023-05-01T12:00:{index:02d}+09:00',
+                }) + '\n')
+        return path
+
+    def test_conversation_with_live_messages_is_rejected(self):
+        live = Conversation.objects.create(participant1_id='alice', participant2_id='bob')
+        Message.objects.create_sequenced(conversation_id=live.id, sender_id='alice', content='live')
+        importer = ChatHistoryImporter(self.write_rows([('alice', 'bob'), ('carol', 'dave'), ('dave', 'carol')]))
+        self.assertTrue(importer.run())
+        self.assertEqual(importer.stats['invalid_conflict'], 1)
+        self.assertEqual(importer.stats['messages'], 2)
+        self.assertEqual(list(live.messages.values_list('content', flat=True)), ['live'])
+        imported = Conversation.objects.get(participant1_id='carol')
+        self.assertEqual(list(imported.messages.order_by('sequence_number').values_list('sequence_number', flat=True)), [1, 2])
+
+    def test_live_message_during_import_stops_that_conversation(self):
+        path = self.write_rows([('alice', 'bob')] * 4)
+        importer = ChatHistoryImporter(path, batch_size=2)
+        import_batch = importer.import_batch
+
+        def batch_then_live_send(rows):
+            import_batch(rows)
+            if importer.stats['batches'] == 1:
+                conversation = Conversation.objects.get(participant1_id='alice')
+                Message.objects.create_sequenced(conversation_id=conversation.id, sender_id='bob', content='live')
+
+        with mock.patch.object(importer, 'import_batch', batch_then_live_send):
+            importer.run()
+        self.assertEqual((importer.stats['messages'], importer.stats['invalid_conflict']), (2, 2))
+        conversation = Conversation.objects.get(participant1_id='alice')
+        self.assertEqual(conversation.messages.order_by('-sequence_number').first().content, 'live')
+
+    def test_rerun_continues_import_only_conversation(self):
+        path = self.write_rows([('alice', 'bob')] * 3)
+        ChatHistoryImporter(path, batch_size=2, max_rows=2).run()
+        # 새 프로세스(대화방 순번 기록 없음)에서도 가져오기 메시지만 있는 대화방은 이어서 가져옴
+        importer = ChatHistoryImporter(self.write_rows([('alice', 'bob')] * 5))
+        importer.run()
+        self.assertEqual((importer.stats['messages'], importer.stats['duplicates']), (3, 2))
+        self.assertEqual(Conversation.objects.get(participant1_id='alice').last_sequence, 5)
+
+
+class ContentFilterTests(SimpleTestCase):
+    """금칙어 정규화 - 끼워 넣은 구분자로는 못 피하고, 단어 경계를 넘어서는 걸리지 않음"""
+
+    def setUp(self):
+        self.content_filter = ContentFilter()
+        self.content_filter.load(['ass', '바보', 'bad word'], [])
+
+    def test_separator_evasion_is_blocked(self):
+        for text in ('you ass!', 'a s s', 'a.s.s', 'ＡＳＳ', '바 보', '바.보', '바\u200b보야', '바보야', 'ｂａｄ　ｗｏｒｄ', 'so BAD, word'):
+            self.assertTrue(self.content_filter.find(text), text)
+
+    def test_words_are_not_joined_into_terms(self):
+        for text in ('I was sad today', 'class assessment', 'a bass guitar', 'passes', '바다 보자', 'bad words'):
+            self.assertEqual(self.content_filter.find(text), [], text)
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYERS, CHAT_WS_AUTH_REQUIRED=True)
+class ResumeTests(TransactionTestCase):
+    """재접속 시 last_seq 이후 메시지 - 재전송 버퍼에 구간이 다 있으면 버퍼, 순번이 건너뛰었으면 DB"""
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create(participant1_id='alice', participant2_id='bob')
+
+    async def connect(self, user_id, query=''):
+        communicator = WebsocketCommunicator(
+            websocket_app(), f'/ws/chat/{self.conversation.id}/?token={issue_token(user_id)}{query}'
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def send_message(self, communicator, content):
+        """메시지 전송 후 ack와 자기에게 돌아온 브로드캐스트까지 받음 (버퍼에 기록됨)"""
+        await communicator.send_json_to({'type': 'chat_message', 'sender_id': 'alice', 'content': content})
+        frames = [await communicator.receive_json_from(timeout=3) for _ in range(2)]
+        self.assertEqual([frame['type'] for frame in frames], ['ack', 'chat_message'])
+        return frames[1]['message']['sequence_number']
+
+    async def test_resume_without_gap_uses_buffer(self):
+        alice = await self.connect('alice')
+        await alice.receive_json_from(timeout=3)  # recent_messages
+        sequences = [await self.send_message(alice, f'm{i}') for i in range(3)]
+        self.assertEqual(sequences, [1, 2, 3])
+
+        bob = await self.connect('bob', '&last_seq=1')
+        frame = await bob.receive_json_from(timeout=3)
+        self.assertEqual((frame['type'], frame['source'], frame['from_seq'], frame['last_seq']), ('missed_messages', 'buffer', 1, 3))
+        self.assertEqual([message['content'] for message in frame['messages']], ['m1', 'm2'])
+        await bob.disconnect()
+        await alice.disconnect()
+
+    async def test_resume_after_gap_falls_back_to_db(self):
+        alice = await self.connect('alice')
+        await alice.receive_json_from(timeout=3)
+        await self.send_message(alice, 'm0')
+        # 그룹으로 오지 않은 메시지 (채널 용량 초과 등으로 유실된 경우) - 다음 메시지에서 순번이 건너뜀
+        await sync_to_async(Message.objects.create_sequenced)(
+            conversation_id=self.conversation.id, sender_id='bob', content='lost'
+        )
+        gaps = replay_buffers.stats['gaps']
+        self.assertEqual(await self.send_message(alice, 'm2'), 3)
+        self.assertEqual(replay_buffers.stats['gaps'], gaps + 1)
+
+        bob = await self.connect('bob', '&resume=1')
+        await bob.send_json_to({'type': 'resume', 'last_seq': 1})
+        frame = await bob.receive_json_from(timeout=3)
+        self.assertEqual((frame['type'], frame['source']), ('missed_messages', 'db'))
+        self.assertEqual([message['content'] for message in frame['messages']], ['lost', 'm2'])
+        await bob.disconnect()
+        await alice.disconnect()
+
+    @override_settings(CHAT_RESUME_MAX_MESSAGES=1)
+    async def test_resume_too_far_behind_requires_resync(self):
+        alice = await self.connect('alice')
+        await alice.receive_json_from(timeout=3)
+        for i in range(3):
+            await self.send_message(alice, f'm{i}')
+        bob = await self.connect('bob', '&last_seq=0')
+        self.assertEqual(await bob.receive_json_from(timeout=3), {'type': 'resync_required', 'last_seq': 3})
+        await bob.disconnect()
+        await alice.disconnect()
+
+
+class SequenceTests(TransactionTestCase):
+    """같은 대화방에 동시에 저장해도 순번이 겹치거나 비지 않음"""
+
+    def test_concurrent_create_sequenced(self):
+        conversation = Conversation.objects.create(participant1_id='alice', participant2_id='bob')
+        start = threading.Barrier(8)
+
+        def send(index):
+            start.wait()
+            try:
+                return Message.objects.create_sequenced(
+                    conversation_id=conversation.id, sender_id='alice', content=f'm{index}'
+                ).sequence_number
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            sequences = list(pool.map(send, range(8)))
+        self.assertEqual(sorted(sequences), list(range(1, 9)))
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.last_sequence, 8)
@@ -8,6 +8,7 @@ urlpatterns = [
     
     # MSA 외부 제공 API (다른 서비스에서 호출)
     path('conversations/<uuid:id>/', views.ConversationDetailView.as_view(), name='conversation-detail'),
+    path('conversations/batch/', views.conversations_batch, name='conversations-batch'),  # 여러 대화방 요약 한 번에
     
     # 내부 서비스 API들
     path('users/<str:user_id>/conversations/', views.user_conversations, name='user-conversations'),  # 사용자 대화방 목록
@@ -20,4 +21,16 @@ urlpatterns = [
     path('conversations/<uuid:conversation_id>/messages/after/', views.conversation_messages_after, name='conversation-messages-after'),  # 특정 메시지 이후 조회
     path('conversations/<uuid:conversation_id>/messages/send/', views.send_message, name='send-message'),  # 메시지 전송
     path('messages/<uuid:message_id>/read/', views.mark_message_as_read, name='mark-message-read'),  # 메시지 읽음 처리
+    
+    # 첨부파일 API (분할 업로드 / 다운로드)
+    path('attachments/uploads/', views.create_attachment_upload, name='attachment-upload-create'),  # 업로드 시작
+    path('attachments/uploads/<uuid:upload_id>/', views.attachment_upload_chunk, name='attachment-upload-chunk'),  # 청크 전송/오프셋 조회
+    path('attachments/<uuid:attachment_id>/', views.download_attachment, name='attachment-download'),  # 다운로드 (Range 지원)
+    path('attachments/<uuid:attachment_id>/thumbnail/', views.attachment_thumbnail, name='attachment-thumbnail'),  # 이미지 썸네일
+    
+    # 분석용 활동 집계 (집계 테이블에서 조회)
+    path('analytics/activity/', views.activity_rollups, name='activity-rollups'),  # 시간/일 단위 메시지 수·활성 대화방 수
+    
+    # 운영용 지표
+    path('metrics/', views.service_metrics, name='service-metrics'),  # 연결 풀 등 프로세스 지표
 ]
\ No newline at end of file
@@ -2,24 +2,111 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from django.shortcuts import get_object_or_404, render
-from django.db.models import Q, Prefetch
+from django.db.models import Q, Prefetch, OuterRef, Subquery
 from django.core.paginator import Paginator
-from .models import Conversation, Message, DeliveryReceipt
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import require_GET
+from .models import ActivityRollup, Conversation, Message, DeliveryReceipt, Attachment, AttachmentUpload
 from .serializers import (
     ConversationSerializer, MessageSerializer, DeliveryReceiptSerializer,
-    MessagePaginatedSerializer, ConversationDetailSerializer, MessagePagination
+    MessagePaginatedSerializer, ConversationDetailSerializer, MessagePagination,
+    AttachmentUploadSerializer, ConversationSummarySerializer
 )
-from .events import publish_message_created_event
+from . import attachments
+from .previews import get_pipeline, is_previewable, pipeline_stats
+from .ratelimit import RateLimited, get_rate_limiter
+from .replay import replay_buffers
+from .auth import get_verifier
+from .structured_logging import logging_stats
+from .consumers import ChatEventStreamConsumer
+from .events import publish_conversation_created_event, publish_message_created_event
+from .notifications import notification_stats, notify_offline_recipients
+from .moderation import ContentBlocked, check_content, get_content_filter
+from .heartbeat import get_connection_monitor
+from .rollups import rollup_stats
+from .db_routers import read_from_primary, record_write
+from .db_pool import pool_stats
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+import datetime
 import json
+import logging
+import math
+import uuid
+
+logger = logging.getLogger(__name__)
 
 
 class ConversationDetailView(generics.RetrieveAPIView):
     """특정 대화방 조회 - MSA 외부 제공 API"""
-    queryset = Conversation.objects.all()
+    queryset = Conversation.objects.prefetch_related(
+        Prefetch('messages', queryset=Message.objects.select_related('attachment'))
+    )
     serializer_class = ConversationSerializer
     lookup_field = 'id'  # URL에서 id 파라미터로 조회
 
 
+@api_view(['GET', 'POST'])
+def conversations_batch(request):
+    """
+    여러 대화방 요약을 한 번에 조회 - MSA 외부 제공 API (대화방마다 HTTP 호출하지 않도록)
+    GET ?ids=a,b,c&fields=id,participant1_id,last_message 또는 POST {"ids": [...], "fields": [...]}
+    쿼리: 대화방 1번 (+ last_message를 요청하면 메시지 1번)
+    """
+    params = request.data if request.method == 'POST' else request.query_params
+    ids = params.get('ids') or []
+    fields = params.get('fields') or ConversationSummarySerializer.DEFAULT_FIELDS
+    if isinstance(ids, str):
+        ids = [value for value in ids.split(',') if value]
+    if isinstance(fields, str):
+        fields = [value for value in fields.split(',') if value]
+    
+    if not isinstance(ids, list) or not ids:
+        return Response({'error': 'ids가 필요합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > settings.CONVERSATION_BATCH_MAX_IDS:
+        return Response({'error': f'ids는 최대 {settings.CONVERSATION_BATCH_MAX_IDS}개까지 조회할 수 있습니다.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(fields, list):
+        return Response({'error': 'fields는 필드 이름 목록이어야 합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    unknown = [str(field) for field in fields if field not in ConversationSummarySerializer.Meta.fields]
+    if unknown:
+        return Response({'error': f"지원하지 않는 필드: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # 요청 순서 유지 + 중복 제거
+        ids = list(dict.fromkeys(uuid.UUID(str(value)) for value in ids))
+    except ValueError:
+        return Response({'error': 'ids는 UUID 목록이어야 합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # 요청한 필드의 컬럼만 조회
+    columns = {'id'} | (set(fields) - {'last_message'})
+    conversations = Conversation.objects.filter(id__in=ids).only(*columns)
+    if 'last_message' in fields:
+        # 대화방별 마지막 메시지 id를 (conversation, created_at, id, is_deleted) 인덱스로 같은 쿼리에서 구함
+        conversations = conversations.annotate(latest_message_id=Subquery(
+            Message.objects.filter(conversation=OuterRef('pk'), is_deleted=False)
+            .order_by('-created_at', '-id').values('id')[:1]
+        ))
+    found = {conversation.id: conversation for conversation in conversations}
+    
+    if 'last_message' in fields:
+        latest = Message.objects.only(
+            'id', 'sender_id', 'content', 'message_type', 'attachment_id', 'sequence_number', 'created_at'
+        ).in_bulk([c.latest_message_id for c in found.values() if c.latest_message_id])
+        for conversation in found.values():
+            conversation.latest_message = latest.get(conversation.latest_message_id)
+    
+    serializer = ConversationSummarySerializer(
+        [found[conversation_id] for conversation_id in ids if conversation_id in found], many=True, fields=fields
+    )
+    return Response({
+        'conversations': serializer.data,
+        'missing': [str(conversation_id) for conversation_id in ids if conversation_id not in found],
+    })
+
+
 @api_view(['GET'])
 def user_conversations(request, user_id):
     """특정 유저의 모든 대화방 조회"""
@@ -27,6 +114,8 @@ def user_conversations(request, user_id):
     conversations = Conversation.objects.filter(
         Q(participant1_id=user_id) | Q(participant2_id=user_id),
         is_active=True
+    ).prefetch_related(
+        Prefetch('messages', queryset=Message.objects.select_related('attachment'))
     ).order_by('-updated_at')  # 최근 업데이트된 순으로 정렬
     
     serializer = ConversationSerializer(conversations, many=True)
@@ -34,6 +123,7 @@ def user_conversations(request, user_id):
 
 
 @api_view(['POST'])
+@read_from_primary()  # 중복 체크는 레플리카 지연 없이 primary에서
 def create_conversation(request):
     """새로운 대화방 생성 (중복 방지 로직 포함)"""
     participant1_id = request.data.get('participant1_id')
@@ -60,6 +150,8 @@ def create_conversation(request):
         participant1_id=participant1_id,
         participant2_id=participant2_id
     )
+    record_write(participant1_id)
+    publish_conversation_created_event(conversation)
     
     serializer = ConversationSerializer(conversation)
     return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -70,7 +162,7 @@ def conversation_messages(request, conversation_id):
     """대화방의 메시지 목록 조회 (삭제되지 않은 메시지만) - 기존 API 유지"""
     conversation = get_object_or_404(Conversation, id=conversation_id)
     # 삭제되지 않은 메시지들만 시간순으로 조회
-    messages = conversation.messages.filter(is_deleted=False).order_by('created_at')
+    messages = conversation.messages.select_related('attachment').filter(is_deleted=False).order_by('created_at', 'id')
     
     serializer = MessageSerializer(messages, many=True)
     return Response(serializer.data)
@@ -96,9 +188,9 @@ def conversation_messages_paginated(request, conversation_id):
     
     # 메시지 쿼리 - 최신부터 역순
     # Prefetch로 delivery_receipts도 함께 가져와서 N+1 문제 해결
-    messages_queryset = conversation.messages.select_related('conversation').prefetch_related(
+    messages_queryset = conversation.messages.select_related('conversation', 'attachment').prefetch_related(
         Prefetch('delivery_receipts', queryset=DeliveryReceipt.objects.all())
-    ).filter(is_deleted=False).order_by('-created_at')
+    ).filter(is_deleted=False).order_by('-created_at', '-id')
     
     # 페이지네이션 적용
     paginator = Paginator(messages_queryset, page_size)
@@ -158,12 +250,11 @@ def conversation_messages_before(request, conversation_id):
         return Response({'error': '기준 메시지를 찾을 수 없습니다.'}, status=status.HTTP_404_NOT_FOUND)
     
     # 기준 메시지보다 이전 메시지들 조회
-    messages = conversation.messages.select_related('conversation').prefetch_related(
+    messages = conversation.messages.select_related('conversation', 'attachment').prefetch_related(
         'delivery_receipts'
     ).filter(
-        is_deleted=False,
-        created_at__lt=before_message.created_at  # 이전 시간
-    ).order_by('-created_at')[:limit]
+        is_deleted=False
+    ).before(before_message).order_by('-created_at', '-id')[:limit]  # 이전 시간 (같은 시각이면 id 순서)
     
     serializer = MessagePaginatedSerializer(messages, many=True)
     
@@ -196,12 +287,11 @@ def conversation_messages_after(request, conversation_id):
         return Response({'error': '기준 메시지를 찾을 수 없습니다.'}, status=status.HTTP_404_NOT_FOUND)
     
     # 기준 메시지보다 이후 메시지들 조회
-    messages = conversation.messages.select_related('conversation').prefetch_related(
+    messages = conversation.messages.select_related('conversation', 'attachment').prefetch_related(
         'delivery_receipts'
     ).filter(
-        is_deleted=False,
-        created_at__gt=after_message.created_at  # 이후 시간
-    ).order_by('created_at')[:limit]
+        is_deleted=False
+    ).after(after_message).order_by('created_at', 'id')[:limit]  # 이후 시간 (같은 시각이면 id 순서)
     
     serializer = MessagePaginatedSerializer(messages, many=True)
     
@@ -213,21 +303,61 @@ def conversation_messages_after(request, conversation_id):
 
 
 @api_view(['POST'])
+@read_from_primary()  # 방금 만든 대화방도 바로 찾을 수 있도록
 def send_message(request, conversation_id):
     """메시지 전송 (이벤트 발행 포함)"""
+    client_msg_id = request.data.get('client_msg_id') or None
+    sender_id = request.data.get('sender_id')
+    # 같은 client_msg_id로 다시 보낸 요청이면 새로 저장하지 않고 기존 메시지 반환
+    # 한도 확인보다 먼저 - 이미 저장된 메시지의 재전송은 예산을 쓰지 않고, 한도에 걸려도 응답을 받을 수 있음 (웹소켓과 동일)
+    if client_msg_id:
+        existing = Message.objects.filter(
+            conversation_id=conversation_id, sender_id=sender_id, client_msg_id=client_msg_id
+        ).select_related('attachment').first()
+        if existing is not None:
+            return Response(MessageSerializer(existing).data, status=status.HTTP_200_OK)
+    
+    # 새 메시지를 저장하기 전에 한도 확인 (웹소켓 chat_message와 같은 예산을 공유)
+    try:
+        get_rate_limiter().check('chat', sender_id, conversation_id)
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    
     conversation = get_object_or_404(Conversation, id=conversation_id)
     
     # 요청 데이터에 conversation 정보 추가
     data = request.data.copy()
     data['conversation'] = conversation.id
     
+    # 금칙어/금지 링크가 있으면 저장하지 않음 (웹소켓 chat_message와 같은 필터)
+    try:
+        check_content(data.get('content'))
+    except ContentBlocked as e:
+        return Response(e.as_dict(), status=status.HTTP_400_BAD_REQUEST)
+    
     serializer = MessageSerializer(data=data)
     if serializer.is_valid():
         # 메시지 저장
-        message = serializer.save(conversation=conversation)
+        try:
+            message = serializer.save(conversation=conversation)
+        except IntegrityError:
+            # 같은 client_msg_id가 동시에 들어온 경우 - 먼저 저장된 메시지 반환
+            existing = get_object_or_404(
+                Message, conversation=conversation, sender_id=sender_id, client_msg_id=client_msg_id
+            )
+            return Response(MessageSerializer(existing).data, status=status.HTTP_200_OK)
+        # 보낸 사람은 잠깐 동안 primary에서 읽도록 (자기 메시지가 바로 보이게)
+        record_write(message.sender_id)
         
+        # 웹소켓/SSE로 연결된 참여자에게 전달 (웹소켓 chat_message와 같은 이벤트, 받은 연결이 재전송 버퍼에 기록)
+        _broadcast_after_commit(conversation.id, {
+            'type': 'chat_message',
+            'message': serializer.data
+        })
         # MSA 이벤트 발행 (다른 서비스들이 구독할 수 있음)
         publish_message_created_event(message)
+        # 상대방이 이 대화방에 연결되어 있지 않으면 알림 다이제스트에 추가
+        notify_offline_recipients(message, (conversation.participant1_id, conversation.participant2_id))
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
@@ -235,6 +365,7 @@ def send_message(request, conversation_id):
 
 
 @api_view(['PUT'])
+@read_from_primary()
 def mark_message_as_read(request, message_id):
     """메시지를 읽음으로 표시 (읽음 확인 시스템)"""
     message = get_object_or_404(Message, id=message_id)
@@ -245,17 +376,246 @@ def mark_message_as_read(request, message_id):
         return Response({'error': 'user_id가 필요합니다.'}, 
                        status=status.HTTP_400_BAD_REQUEST)
     
+    try:
+        get_rate_limiter().check('read', user_id, message.conversation_id)
+    except RateLimited as e:
+        return _rate_limited_response(e)
+    
     # 기존 기록이 있으면 업데이트, 없으면 새로 생성
     receipt, created = DeliveryReceipt.objects.update_or_create(
         message=message,
         user_id=user_id,
         defaults={'status': 'read'}  # 상태를 'read'로 설정
     )
+    record_write(user_id)
+    
+    # 읽음 상태를 대화방에 알림 (웹소켓 mark_as_read와 같은 이벤트)
+    _broadcast_after_commit(message.conversation_id, {
+        'type': 'message_read',
+        'message_id': str(message.id),
+        'user_id': user_id
+    })
     
     serializer = DeliveryReceiptSerializer(receipt)
     return Response(serializer.data)
 
 
+def _broadcast_after_commit(conversation_id, event):
+    """커밋된 뒤 chat_{id} 그룹에 이벤트 전송 (롤백되면 보내지 않음, 전송 실패는 응답에 영향 없음)"""
+    def send():
+        try:
+            async_to_sync(get_channel_layer().group_send)(f'chat_{conversation_id}', event)
+        except Exception as e:
+            logger.warning(f"{event['type']} 이벤트 전송 실패: conversation={conversation_id}, {e!r}")
+    
+    transaction.on_commit(send)
+
+
+def _rate_limited_response(error):
+    """rate limit 초과 응답 (429 + Retry-After)"""
+    response = Response(error.as_dict(), status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+
+@api_view(['POST'])
+def create_attachment_upload(request):
+    """
+    분할 업로드 시작 - 업로드 id를 발급
+    이후 PATCH attachments/uploads/{id}/ 로 청크를 순서대로 전송
+    """
+    serializer = AttachmentUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    total_size = serializer.validated_data['total_size']
+    if total_size <= 0 or total_size > settings.ATTACHMENT_MAX_SIZE:
+        return Response({'error': f'파일 크기는 1~{settings.ATTACHMENT_MAX_SIZE} 바이트여야 합니다.'},
+                       status=status.HTTP_400_BAD_REQUEST)
+    
+    upload = serializer.save()
+    data = AttachmentUploadSerializer(upload).data
+    data['chunk_size'] = settings.ATTACHMENT_CHUNK_SIZE  # 권장 청크 크기
+    return Response(data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+def attachment_upload_chunk(request, upload_id):
+    """
+    분할 업로드 진행
+    - GET: 현재 오프셋 조회 (재연결 후 이어받을 위치 확인)
+    - PATCH: Upload-Offset 헤더 위치부터 본문(application/octet-stream)을 이어서 기록
+      본문은 메모리에 올리지 않고 디스크로 바로 스트리밍, 마지막 청크에서 자동 완료
+    - DELETE: 업로드 취소
+    """
+    upload = get_object_or_404(AttachmentUpload, id=upload_id)
+    
+    if request.method == 'GET':
+        return Response(AttachmentUploadSerializer(upload).data)
+    
+    if request.method == 'DELETE':
+        if upload.status == 'uploading':
+            attachments.discard_upload(upload.id)
+            upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return Response({'error': 'Upload-Offset 헤더가 필요합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # 잠금 없이 먼저 확인 - 이미 어긋난 요청은 본문을 받기 전에 돌려보냄
+    if upload.status != 'uploading':
+        return Response(AttachmentUploadSerializer(upload).data)
+    if offset != upload.received_size:
+        # 클라이언트가 알고 있는 위치와 다름 - 현재 오프셋을 알려주고 거기서부터 다시 보내게 함
+        return Response({'error': '오프셋이 일치하지 않습니다.', 'offset': upload.received_size},
+                       status=status.HTTP_409_CONFLICT)
+    
+    # 본문은 트랜잭션/행 잠금 없이 요청별 청크 파일로 받음 (느린 모바일 업로드가 DB 연결과 잠금을 잡고 있지 않도록)
+    max_bytes = min(settings.ATTACHMENT_CHUNK_SIZE, upload.total_size - offset)
+    chunk_path, written = attachments.receive_chunk(upload.id, request.stream, max_bytes)
+    
+    # 오프셋 반영은 짧은 잠금 안에서 compare-and-set - 같은 오프셋으로 동시에/재전송으로 들어온 요청 중
+    # 먼저 반영한 하나만 파일에 붙고 나머지는 바뀐 오프셋을 보고 409 (받은 청크는 버림)
+    # 완료 처리도 같은 잠금 안에서 (마지막 청크를 두 번 보내도 첨부파일은 하나)
+    try:
+        with transaction.atomic():
+            upload = AttachmentUpload.objects.select_for_update().get(id=upload.id)
+            if upload.status != 'uploading':
+                return Response(AttachmentUploadSerializer(upload).data)
+            if offset != upload.received_size:
+                return Response({'error': '오프셋이 일치하지 않습니다.', 'offset': upload.received_size},
+                               status=status.HTTP_409_CONFLICT)
+            
+            attachments.commit_chunk(upload.id, offset, chunk_path)
+            upload.received_size = offset + written
+            upload.save(update_fields=['received_size', 'updated_at'])
+            
+            if upload.received_size >= upload.total_size:
+                _complete_attachment_upload(upload)
+    finally:
+        # 반영하지 못한 청크 (오프셋 불일치/완료된 업로드/오류)
+        attachments.discard_chunk(chunk_path)
+    
+    return Response(AttachmentUploadSerializer(upload).data)
+
+
+def _complete_attachment_upload(upload):
+    """업로드 완료 - 해시 계산 후 중복 제거해서 첨부파일 생성"""
+    sha256, storage_path = attachments.finalize_upload(upload.id)
+    with transaction.atomic():
+        attachment = Attachment.objects.create(
+            uploaded_by=upload.uploader_id,
+            file_name=upload.file_name,
+            content_type=upload.content_type,
+            size=upload.total_size,
+            sha256=sha256,
+            storage_path=storage_path,
+            preview_status='pending' if is_previewable(upload.content_type) else 'skipped',
+        )
+        upload.status = 'completed'
+        upload.attachment = attachment
+        upload.save(update_fields=['status', 'attachment', 'updated_at'])
+        if attachment.preview_status == 'pending':
+            # 썸네일은 백그라운드 프로세스 풀에서 생성 (커밋 후 예약해야 워커가 행을 찾을 수 있음)
+            transaction.on_commit(lambda: get_pipeline().enqueue(attachment.id))
+    return attachment
+
+
+# 파일 응답은 DRF 뷰로 만들지 않음 - 콘텐츠 협상이 Accept: application/octet-stream, image/* 등을 406으로 거절함
+@require_GET
+def download_attachment(request, attachment_id):
+    """첨부파일 다운로드 (Range 요청으로 이어받기/부분 재생 가능)"""
+    attachment = get_object_or_404(Attachment, id=attachment_id)
+    return attachments.serve_attachment(request, attachment)
+
+
+@require_GET
+def attachment_thumbnail(request, attachment_id):
+    """이미지 첨부파일 썸네일 (미리보기가 아직 준비되지 않았으면 404)"""
+    attachment = get_object_or_404(Attachment, id=attachment_id, preview_status='ready')
+    return attachments.serve_thumbnail(request, attachment)
+
+
+def _parse_period_bound(value):
+    """ISO 날짜(그 날 자정, settings.TIME_ZONE) 또는 시각 → aware datetime (형식이 틀리면 None)"""
+    try:
+        moment = parse_datetime(value)
+        day = parse_date(value) if moment is None else None
+    except ValueError:
+        return None
+    if moment is None:
+        if day is None:
+            return None
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+    return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
+
+
+@api_view(['GET'])
+def activity_rollups(request):
+    """
+    대화방 활동 집계 조회 (chat/rollups.py) - messages/conversations를 직접 집계하지 않음
+    ?scope=all|type|brand|conversation&granularity=hour|day&key=...&since=...&until=...
+    since/until: ISO 날짜 또는 시각 (기본 최근 7일), key가 없으면 그 scope의 모든 대상
+    """
+    params = request.query_params
+    scope = params.get('scope', 'all')
+    granularity = params.get('granularity', 'day')
+    if scope not in dict(ActivityRollup.SCOPES):
+        return Response({'error': f"scope는 {', '.join(dict(ActivityRollup.SCOPES))} 중 하나입니다."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if granularity not in dict(ActivityRollup.GRANULARITIES):
+        return Response({'error': 'granularity는 hour 또는 day입니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    since, until = params.get('since'), params.get('until')
+    until = _parse_period_bound(until) if until else timezone.now()
+    since = _parse_period_bound(since) if since else until and until - datetime.timedelta(days=7)
+    if since is None or until is None:
+        return Response({'error': 'since/until은 ISO 날짜 또는 시각이어야 합니다.'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rollups = ActivityRollup.objects.filter(
+        scope=scope, granularity=granularity, period_start__gte=since, period_start__lt=until
+    )
+    if 'key' in params:
+        rollups = rollups.filter(key=params['key'])
+    limit = settings.ROLLUP_QUERY_MAX_ROWS
+    rows = list(rollups.order_by('period_start', 'key').values(
+        'key', 'period_start', 'message_count', 'active_conversations', 'new_conversations', 'last_message_at'
+    )[:limit + 1])
+    for row in rows:
+        row['period_start'] = timezone.localtime(row['period_start'])
+        if row['last_message_at'] is not None:
+            row['last_message_at'] = timezone.localtime(row['last_message_at'])
+    return Response({
+        'scope': scope,
+        'granularity': granularity,
+        'since': timezone.localtime(since),
+        'until': timezone.localtime(until),
+        'rows': rows[:limit],
+        'truncated': len(rows) > limit,  # 범위를 줄이거나 key를 지정해서 다시 조회
+    })
+
+
+@api_view(['GET'])
+def service_metrics(request):
+    """서비스 내부 지표 조회 (모니터링/운영용, 현재 프로세스 기준)"""
+    channel_layer = get_channel_layer()
+    return Response({
+        'db_pool': pool_stats(),  # alias별 연결 풀 상태
+        'channel_layer': getattr(channel_layer, 'stats', {}),  # 로컬 전달/Redis 전송 횟수
+        'previews': pipeline_stats(),  # 미리보기 대기열/처리 결과
+        'rate_limit': dict(get_rate_limiter().stats),  # 허용/거절 횟수 (동작/범위별)
+        'replay': replay_buffers.snapshot(),  # 재접속 복구 버퍼 적중/미스
+        'ws_auth': dict(get_verifier().stats),  # 토큰 검증/캐시 적중/거절 횟수
+        'logging': logging_stats(),  # 로그 큐 대기/버림/샘플링 횟수
+        'sse': dict(ChatEventStreamConsumer.stats),  # 열린 SSE 스트림/전송 이벤트 수
+        'notifications': notification_stats(),  # 오프라인 알림 대기/합침/전송 수
+        'moderation': dict(get_content_filter().stats),  # 금칙어 수, 검사/차단/시간 초과/재적용 횟수
+        'heartbeat': get_connection_monitor().snapshot(),  # 하트비트 대상 연결, ping/응답/정리한 연결 수
+        'rollups': rollup_stats(),  # 활동 집계 대기 행, 반영 횟수/행 수/실패
+    })
+
+
 def chat_index(request):
     """
     채팅 메인 화면 - 간단한 웹 UI 제공